@@ -0,0 +1,144 @@
+"""Perfect-play Tic Tac Toe bot backed by a solved-game table
+
+Every position reachable from the empty board is solved once by negamax
+and folded over the 8 symmetries of the board. The table maps a canonical
+(mover, opponent) bitboard pair to the mask of optimal moves, so picking
+a move is one lookup no matter how the board looks. Bigger boards fall
+back to a time-bounded alpha-beta search (see search.py).
+"""
+import random
+
+from engine import BOARD_SIZE, CELLS, FULL, Board, geometry, has_win, iter_cells
+from search import search_move
+
+# How often each difficulty plays a random move instead of the table's.
+# The default must be at least as strong as the old heuristic bot: against
+# random play "hard" loses 1.7% of games to its 2.8% (python selfplay.py).
+DIFFICULTIES = {
+    "easy": 0.6,
+    "medium": 0.3,
+    "hard": 0.05,
+    "perfect": 0.0,
+}
+DEFAULT_DIFFICULTY = "hard"
+
+SEARCH_TIME_BUDGET = 1.0  # seconds per move on boards bigger than 3×3
+
+
+def _symmetries():
+    def rotate(r, c):
+        return c, BOARD_SIZE - 1 - r
+
+    def mirror(r, c):
+        return r, BOARD_SIZE - 1 - c
+
+    perms = []
+    for flip in (False, True):
+        for turns in range(4):
+            perm = []
+            for cell in range(CELLS):
+                r, c = divmod(cell, BOARD_SIZE)
+                if flip:
+                    r, c = mirror(r, c)
+                for _ in range(turns):
+                    r, c = rotate(r, c)
+                perm.append(r * BOARD_SIZE + c)
+            perms.append(perm)
+    return perms
+
+
+def _bit_table(perm):
+    """Precompute the permuted value of every 9-bit board"""
+    table = []
+    for bits in range(FULL + 1):
+        out = 0
+        for cell in iter_cells(bits):
+            out |= 1 << perm[cell]
+        table.append(out)
+    return table
+
+
+_PERMS = _symmetries()
+_FORWARD = [_bit_table(perm) for perm in _PERMS]
+_INVERSE = [_bit_table([perm.index(cell) for cell in range(CELLS)]) for perm in _PERMS]
+
+_table = None  # {canonical key: optimal move mask in the canonical frame}
+
+
+def canonical(mover, opponent):
+    """Return (key, symmetry index) of the canonical form of a position"""
+    best_key, best_sym = None, 0
+    for sym, forward in enumerate(_FORWARD):
+        key = forward[mover] | forward[opponent] << CELLS
+        if best_key is None or key < best_key:
+            best_key, best_sym = key, sym
+    return best_key, best_sym
+
+
+def _solve(mover, opponent, table, values):
+    """Negamax value of a position for the side to move
+
+    Wins score higher the sooner they happen, so the table prefers quick
+    wins and drawn-out losses.
+    """
+    key, sym = canonical(mover, opponent)
+    if key in values:
+        return values[key]
+
+    empty = FULL & ~(mover | opponent)
+    best_value, best_moves = None, 0
+    for cell in iter_cells(empty):
+        bit = 1 << cell
+        if has_win(mover | bit):
+            value = 1 + bin(empty).count("1")
+        elif empty == bit:
+            value = 0
+        else:
+            value = -_solve(opponent, mover | bit, table, values)
+
+        if best_value is None or value > best_value:
+            best_value, best_moves = value, bit
+        elif value == best_value:
+            best_moves |= bit
+
+    values[key] = best_value
+    table[key] = _FORWARD[sym][best_moves]
+    return best_value
+
+
+def build_table():
+    """Solve every position reachable from the empty board"""
+    table, values = {}, {}
+    _solve(0, 0, table, values)
+    return table
+
+
+def solved_table():
+    """The solved table, built on first use"""
+    global _table
+    if _table is None:
+        _table = build_table()
+    return _table
+
+
+def best_moves(mover, opponent):
+    """Mask of every optimal move for the side to move"""
+    key, sym = canonical(mover, opponent)
+    return _INVERSE[sym][solved_table()[key]]
+
+
+def choose_move(board, side, difficulty=DEFAULT_DIFFICULTY, rng=random, time_budget=SEARCH_TIME_BUDGET):
+    """Pick a cell for `side` on an engine.Board at the given difficulty"""
+    empty = board.empty()
+    if rng.random() < DIFFICULTIES[difficulty]:
+        return rng.choice(list(iter_cells(empty)))
+
+    mover, opponent = board.bits(side), board.bits(1 - side)
+    if board.geometry.is_classic:
+        return rng.choice(list(iter_cells(best_moves(mover, opponent))))
+    return search_move(board.geometry, mover, opponent, time_budget)
+
+
+def pick_move(size, win_length, x, o, side, difficulty=DEFAULT_DIFFICULTY):
+    """choose_move for plain arguments, so it can run in a process pool"""
+    return choose_move(Board(x, o, geometry(size, win_length)), side, difficulty)
@@ -0,0 +1,251 @@
+"""Microbenchmarks for the paths every game pays for
+
+Runs without Discord:
+
+    python bench.py                          # print timings
+    python bench.py --save bench.json        # write a baseline
+    python bench.py --compare bench.json     # flag anything slower than the baseline
+    python bench.py --sizes 1000,100000      # skip the 1M-player stats runs
+
+Each benchmark reports the best of several runs in microseconds per call,
+so numbers from one machine can be compared between commits. Stats
+benchmarks run against synthetic stores of each size in a scratch
+directory; nothing touches the real stats files.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import timeit
+from datetime import datetime
+
+import search
+from ai import DIFFICULTIES, choose_move, solved_table
+from engine import Board, geometry
+from stats_store import JsonStatsStore, SqliteStatsStore, new_player_stats
+from ultimate import replay
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+DEFAULT_THRESHOLD = 0.25  # slower than the baseline by more than this counts as a regression
+
+
+def measure(fn, repeat=3):
+    """Best time per call of `fn`, in microseconds"""
+    timer = timeit.Timer(fn)
+    start = time.perf_counter()
+    fn()
+    if time.perf_counter() - start > 0.2:
+        # Slow enough that one call per run is plenty
+        return min(timer.repeat(min(repeat, 3), 1)) * 1e6
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def _midgame(board=None, moves=4, seed=1):
+    """A board a few random moves in, with nobody having won yet"""
+    rng = random.Random(seed)
+    while True:
+        engine = Board(geometry=board or geometry())
+        for turn in range(moves):
+            engine.play(rng.choice(engine.empty_cells()), turn % 2)
+            if engine.won:
+                break
+        else:
+            return engine
+
+
+def engine_benchmarks():
+    from main import TicTacToe
+
+    game = TicTacToe(1, 1, 1, 2)
+    game.engine = _midgame()
+    cell = game.engine.empty_cells()[0]
+    x, o = game.engine.x, game.engine.o
+
+    def play():
+        Board(x, o).play(cell, 0)
+
+    return {
+        "game.check_winner": game.check_winner,
+        "game.is_draw": game.is_draw,
+        "engine.play": play,
+        "engine.winning_cells": lambda: game.engine.winning_cells(0),
+        "engine.blocking_cells": lambda: game.engine.winning_cells(1),
+    }
+
+
+def ai_benchmarks():
+    solved_table()
+    engine = _midgame(moves=2)
+    rng = random.Random(1)
+    results = {
+        f"ai.choose_move[{difficulty}]": (lambda d=difficulty: choose_move(engine, 0, d, rng=rng))
+        for difficulty in DIFFICULTIES
+    }
+
+    # Few enough empty cells that the search finishes instead of running out of time
+    endgame = _midgame(geometry(4, 4), moves=10)
+
+    def search_endgame():
+        search._tables.clear()
+        search.search_move(endgame.geometry, endgame.x, endgame.o, time_budget=10.0)
+
+    results["search.search_move[4x4 endgame]"] = search_endgame
+    return results
+
+
+def view_benchmarks():
+    from main import TicTacToe, UltimateTicTacToe
+
+    classic = TicTacToe(1, 1, 1, 2)
+    classic.engine = _midgame()
+    big = TicTacToe(1, 1, 1, 2, board=geometry(5, 4))
+    big.engine = _midgame(geometry(5, 4), moves=8)
+    ultimate = UltimateTicTacToe(1, 1, 1, 2)
+    rng = random.Random(1)
+    for _ in range(20):
+        move = rng.choice(ultimate.state.legal_moves())
+        ultimate.state.play(move)
+        ultimate.moves.append(move)
+    ultimate.selected = ultimate.state.open_boards()[0]
+
+    return {
+        "view.classic": classic.make_view,
+        "view.classic+components": lambda: classic.make_view().to_components(),
+        "view.5x5": big.make_view,
+        "view.ultimate": lambda: (ultimate.make_view(), ultimate.render("status")),
+        "ultimate.replay[20 moves]": lambda: replay(ultimate.moves),
+    }
+
+
+def _synthetic_stats(count, seed=1):
+    rng = random.Random(seed)
+    stats = {}
+    for _ in range(count):
+        player_stats = new_player_stats()
+        wins, losses, draws = rng.randrange(50), rng.randrange(50), rng.randrange(10)
+        player_stats.update(
+            wins=wins, losses=losses, draws=draws, games_played=wins + losses + draws,
+            rating=round(rng.gauss(1500, 200), 2)
+        )
+        stats[str(rng.randrange(10**17, 10**18))] = player_stats
+    return stats
+
+
+def stats_benchmarks(sizes, workdir):
+    """Stats store benchmarks for each store size; yields (name, fn) as stores get built"""
+    for size in sizes:
+        stats = _synthetic_stats(size)
+        player_ids = [int(player_id) for player_id in stats]
+        rng = random.Random(size)
+
+        json_store = JsonStatsStore(os.path.join(workdir, f"stats-{size}.json"), flush_every=10**12)
+        json_store.replace(stats)
+
+        def record_json(store=json_store, ids=player_ids):
+            player1, player2 = rng.sample(ids, 2)
+            store.record_game(player1, player2, player1)
+
+        def flush_copy(store=json_store):
+            # The part of a flush that runs on the event loop
+            return {player_id: dict(s) for player_id, s in store.stats.items()}
+
+        yield f"stats.json.record_game[{size}]", record_json
+        yield f"stats.json.top10[{size}]", lambda store=json_store: store.top(10)
+        yield f"stats.json.rank[{size}]", lambda store=json_store, ids=player_ids: store.rank(rng.choice(ids))
+        yield f"stats.json.flush_copy[{size}]", flush_copy
+        yield f"stats.json.serialize[{size}]", lambda store=json_store: json.dumps(store.stats)
+
+        sqlite_store = SqliteStatsStore(os.path.join(workdir, f"stats-{size}.db"))
+        sqlite_store.load()
+        sqlite_store._replace_all(stats)
+        sqlite_store._index(stats)
+        when = datetime.now()
+
+        def record_sqlite(store=sqlite_store, ids=player_ids):
+            player1, player2 = (str(player_id) for player_id in rng.sample(ids, 2))
+            ratings = {player1: 1516.0, player2: 1484.0}
+            days = {player1: [[when.toordinal(), 1, 0, 0]], player2: [[when.toordinal(), 0, 1, 0]]}
+            store._write_results([(player1, True, False), (player2, False, False)], when, ratings, days)
+
+        yield f"stats.sqlite.record_game[{size}]", record_sqlite
+        yield f"stats.sqlite.top10[{size}]", lambda store=sqlite_store: store.top(10)
+        yield f"stats.sqlite.rank[{size}]", lambda store=sqlite_store, ids=player_ids: store.rank(rng.choice(ids))
+        sqlite_store._writer.close()
+        sqlite_store._reader.close()
+
+
+def run(sizes):
+    results = {}
+
+    def report(name, fn):
+        results[name] = round(measure(fn), 3)
+        print(f"{name:<40} {results[name]:>14,.3f} µs")
+
+    for group in (engine_benchmarks, ai_benchmarks, view_benchmarks):
+        for name, fn in group().items():
+            report(name, fn)
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, fn in stats_benchmarks(sizes, workdir):
+            report(name, fn)
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Names of the benchmarks more than `threshold` slower than the baseline"""
+    regressions = []
+    for name, micros in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        ratio = micros / before if before else 1.0
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<40} {before:>12,.3f} -> {micros:>12,.3f} µs  ({ratio:5.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the engine, AI, stats and rendering hot paths")
+    parser.add_argument("--save", metavar="FILE", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a saved baseline; exits 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before a benchmark counts as regressed (default 0.25 = 25%%)")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated player counts for the stats benchmarks")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    results = run(sizes)
+
+    if args.save:
+        baseline = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "created": datetime.now().isoformat(timespec="seconds"),
+            },
+            "results": results,
+        }
+        with open(args.save, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Saved {len(results)} results to {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        print()
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Bitboard Tic Tac Toe engine
+
+Each side's marks are an integer with cell `row * size + col` at bit
+`row * size + col`. Side 0 plays ❌ (player1) and side 1 plays ⭕. A
+`Geometry` holds the precomputed win masks for one board size and win
+length; the classic 3×3 board is `CLASSIC`.
+"""
+from functools import lru_cache
+
+MIN_SIZE = 3
+MAX_SIZE = 5  # Discord allows at most 5 rows of 5 buttons
+
+
+def _line(cells):
+    mask = 0
+    for cell in cells:
+        mask |= 1 << cell
+    return mask
+
+
+def _win_masks(size, win_length):
+    masks = []
+    for r in range(size):
+        for c in range(size):
+            for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_r = r + dr * (win_length - 1)
+                end_c = c + dc * (win_length - 1)
+                if 0 <= end_r < size and 0 <= end_c < size:
+                    masks.append(_line((r + dr * i) * size + c + dc * i for i in range(win_length)))
+    return tuple(masks)
+
+
+class Geometry:
+    """Board size, win length and the win masks they produce"""
+
+    __slots__ = ("size", "win_length", "cells", "full", "win_masks", "lines_through", "move_order")
+
+    def __init__(self, size, win_length):
+        self.size = size
+        self.win_length = win_length
+        self.cells = size * size
+        self.full = (1 << self.cells) - 1
+        self.win_masks = _win_masks(size, win_length)
+        # Only these lines can be completed by a move on the given cell
+        self.lines_through = tuple(
+            tuple(mask for mask in self.win_masks if mask >> cell & 1) for cell in range(self.cells)
+        )
+        # Cells on the most lines first; searching them first prunes best
+        self.move_order = tuple(sorted(range(self.cells), key=lambda cell: -len(self.lines_through[cell])))
+
+    def __reduce__(self):
+        return geometry, (self.size, self.win_length)
+
+    @property
+    def is_classic(self):
+        return self.size == 3 and self.win_length == 3
+
+
+@lru_cache(maxsize=None)
+def geometry(size=3, win_length=3):
+    """Shared Geometry for a board size and win length"""
+    if not MIN_SIZE <= size <= MAX_SIZE:
+        raise ValueError(f"board size must be between {MIN_SIZE} and {MAX_SIZE}")
+    if not MIN_SIZE <= win_length <= size:
+        raise ValueError(f"win length must be between {MIN_SIZE} and the board size")
+    return Geometry(size, win_length)
+
+
+CLASSIC = geometry(3, 3)
+BOARD_SIZE = CLASSIC.size
+CELLS = CLASSIC.cells
+FULL = CLASSIC.full
+WIN_MASKS = CLASSIC.win_masks
+LINES_THROUGH = CLASSIC.lines_through
+CENTER = 4
+CORNERS = 0b101_000_101
+
+
+def iter_cells(mask):
+    """Yield the cell index of every set bit, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def wins_through(bits, cell, lines_through=LINES_THROUGH):
+    """True if `bits` has a complete line running through `cell`"""
+    for mask in lines_through[cell]:
+        if bits & mask == mask:
+            return True
+    return False
+
+
+def has_win(bits, win_masks=WIN_MASKS):
+    """True if `bits` has any complete line"""
+    for mask in win_masks:
+        if bits & mask == mask:
+            return True
+    return False
+
+
+def completing_cells(bits, empty, win_masks=WIN_MASKS):
+    """Bitmask of empty cells that would complete a line for `bits`"""
+    cells = 0
+    for mask in win_masks:
+        rest = mask & ~bits
+        # Exactly one cell of the line missing, and it's free
+        if rest & empty and rest & (rest - 1) == 0:
+            cells |= rest
+    return cells
+
+
+class Board:
+    """Two bitboards plus the result of the last move"""
+
+    __slots__ = ("geometry", "x", "o", "last_move", "won")
+
+    def __init__(self, x=0, o=0, geometry=CLASSIC):
+        self.geometry = geometry
+        self.x = x
+        self.o = o
+        self.last_move = None
+        self.won = has_win(x, geometry.win_masks) or has_win(o, geometry.win_masks)
+
+    def bits(self, side):
+        return self.o if side else self.x
+
+    def empty(self):
+        """Bitmask of free cells"""
+        return self.geometry.full & ~(self.x | self.o)
+
+    def empty_cells(self):
+        return list(iter_cells(self.empty()))
+
+    def is_empty(self, cell):
+        return not (self.x | self.o) >> cell & 1
+
+    def is_full(self):
+        return (self.x | self.o) == self.geometry.full
+
+    def play(self, cell, side):
+        """Place `side`'s mark on `cell`; returns True if that move wins"""
+        bit = 1 << cell
+        if (self.x | self.o) & bit:
+            raise ValueError(f"cell {cell} is already taken")
+
+        if side:
+            self.o |= bit
+            bits = self.o
+        else:
+            self.x |= bit
+            bits = self.x
+
+        self.last_move = cell
+        self.won = wins_through(bits, cell, self.geometry.lines_through)
+        return self.won
+
+    def winning_cells(self, side):
+        """Bitmask of moves that would win on the spot for `side`"""
+        return completing_cells(self.bits(side), self.empty(), self.geometry.win_masks)
+
+    def side_at(self, cell):
+        """0 or 1 for the side owning `cell`, None if it's free"""
+        if self.x >> cell & 1:
+            return 0
+        if self.o >> cell & 1:
+            return 1
+        return None
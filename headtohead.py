@@ -0,0 +1,83 @@
+"""Head-to-head records for every pair of players who have met
+
+A pair is keyed by its two ids in order, lower first, packed into one
+int. Its record (the lower id's wins, the higher id's wins, draws) is
+packed into another, so in memory a pair costs a dict slot and two ints,
+and on disk RECORD.size bytes. Recording a game is one dict update.
+
+On disk the pairs are MAGIC followed by fixed-size RECORDs, rewritten
+whole like the stats file they sit next to; the stats store writes them
+with dump_pairs() through the same atomic write.
+"""
+import os
+import struct
+
+MAGIC = b"TTTH2H1\n"
+RECORD = struct.Struct("<QQIII")  # lower id, higher id, lower's wins, higher's wins, draws
+_ID_MASK = (1 << 64) - 1
+_COUNT_MASK = (1 << 32) - 1
+
+
+def pairs_path_for(stats_path):
+    """Where the pairs for a stats file live: player_stats.json -> player_stats.h2h"""
+    return os.path.splitext(stats_path)[0] + ".h2h"
+
+
+def pair_result(player1, player2, winner_id=None):
+    """(lower id, higher id, lower won, higher won, drawn) for one finished game, as ints"""
+    player1, player2 = int(player1), int(player2)
+    low, high = sorted((player1, player2))
+    if winner_id is None:
+        return low, high, 0, 0, 1
+    low_won = int(int(winner_id) == low)
+    return low, high, low_won, 1 - low_won, 0
+
+
+class HeadToHead:
+    """{pair key: packed record} for every pair that has played"""
+
+    def __init__(self, pairs=None):
+        self.pairs = pairs if pairs is not None else {}
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def record(self, player1, player2, winner_id=None):
+        low, high, low_won, high_won, drawn = pair_result(player1, player2, winner_id)
+        key = low << 64 | high
+        self.pairs[key] = self.pairs.get(key, 0) + (low_won | high_won << 32 | drawn << 64)
+
+    def get(self, player_id, opponent_id):
+        """(player's wins, opponent's wins, draws) in games between the two"""
+        player_id, opponent_id = int(player_id), int(opponent_id)
+        low, high = sorted((player_id, opponent_id))
+        packed = self.pairs.get(low << 64 | high, 0)
+        low_wins, high_wins, draws = packed & _COUNT_MASK, packed >> 32 & _COUNT_MASK, packed >> 64
+        return (low_wins, high_wins, draws) if player_id == low else (high_wins, low_wins, draws)
+
+    def rows(self):
+        """(lower id, higher id, lower's wins, higher's wins, draws) for every pair"""
+        for key, packed in self.pairs.items():
+            yield key >> 64, key & _ID_MASK, packed & _COUNT_MASK, packed >> 32 & _COUNT_MASK, packed >> 64
+
+
+def read_pairs(path):
+    """Load a pairs file; a missing file is empty, a damaged one raises ValueError"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return HeadToHead()
+    if not data.startswith(MAGIC) or (len(data) - len(MAGIC)) % RECORD.size:
+        raise ValueError(f"{path} is not a head-to-head file or was cut short")
+    return HeadToHead({
+        low << 64 | high: low_wins | high_wins << 32 | draws << 64
+        for low, high, low_wins, high_wins, draws in RECORD.iter_unpack(memoryview(data)[len(MAGIC):])
+    })
+
+
+def dump_pairs(head_to_head, f):
+    """Write every pair to a binary file object, in the format read_pairs() reads"""
+    f.write(MAGIC)
+    pack = RECORD.pack
+    f.write(b"".join(pack(*row) for row in head_to_head.rows()))
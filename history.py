@@ -0,0 +1,368 @@
+"""Move-level history of every finished game, in an append-only log
+
+Each finished game becomes one JSON line holding its players, moves,
+start and end times and how it ended:
+
+    {"game": 123, "kind": "classic", "size": 3, "win_length": 3, "bot": false,
+     "players": [111, 222], "first": 0, "moves": "04000802", "winner": 111,
+     "how": "won", "started": 1700000000.0, "ended": 1700000042.5}
+
+`players` is (❌, ⭕), `first` is the index of whoever moved first and
+`moves` is one hex byte per move. Games ended with !tttend or abandoned
+are logged too; only won and drawn games count toward stats.
+
+Appends are buffered on the event loop and written by one background
+thread, so the move path only pays for a json.dumps. Once the active log
+grows past `compact_bytes` it's rolled into a gzipped segment and folded
+into snapshot.json, so rebuilding stats never has to read more than one
+active log. The stats that existed before the log did are kept once in
+baseline.json, which is what a rebuild from scratch starts from.
+
+    python history.py replay <game id>        # print a game move by move
+    python history.py rebuild [--out FILE]     # stats from snapshot + newer games
+    python history.py rebuild --from-scratch   # stats from baseline + every game
+    python history.py verify player_stats.json # compare a stats file with the log
+    python history.py compact                  # roll the active log into a segment now
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+from datetime import datetime
+
+from engine import Board, geometry
+from headtohead import HeadToHead
+from stats_store import BackgroundWriter, apply_game, write_json_atomic
+from ultimate import UltimateState
+
+ACTIVE = "games.jsonl"
+SNAPSHOT = "snapshot.json"
+BASELINE = "baseline.json"
+SEGMENT_PATTERN = re.compile(r"games-(\d{6})\.jsonl(\.gz)?$")
+COUNTED = ("won", "drawn")  # endings that count toward stats
+
+
+def segment_path(directory, number, compressed=True):
+    return os.path.join(directory, f"games-{number:06d}.jsonl{'.gz' if compressed else ''}")
+
+
+def segments(directory):
+    """[(number, path)] of every compacted segment, oldest first
+
+    A segment still waiting to be compressed shows up with its plain path.
+    """
+    found = {}
+    for name in os.listdir(directory):
+        match = SEGMENT_PATTERN.match(name)
+        if match:
+            number = int(match[1])
+            # If both exist the gzip is complete; the plain file is left over
+            if match[2] or number not in found:
+                found[number] = os.path.join(directory, name)
+    return sorted(found.items())
+
+
+def read_entries(path):
+    """Stream the games in one log file, skipping a torn last line"""
+    opener = gzip.open if path.endswith(".gz") else open
+    try:
+        with opener(path, 'rt') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash mid-append leaves half a line at the end
+                    continue
+    except FileNotFoundError:
+        return
+
+
+def iter_games(directory, after_segment=0):
+    """Stream every logged game in the order they finished"""
+    for number, path in segments(directory):
+        if number > after_segment:
+            yield from read_entries(path)
+    yield from read_entries(os.path.join(directory, ACTIVE))
+
+
+def _load_json(path, default):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def apply_entry(stats, entry):
+    """Fold one logged game into a {player_id: stats} dict, ratings included"""
+    if entry["how"] not in COUNTED:
+        return
+    player1, player2 = entry["players"]
+    apply_game(stats, player1, player2, entry["winner"], datetime.fromtimestamp(entry["ended"]))
+
+
+def rebuild_stats(directory, from_scratch=False):
+    """Player stats as the log says they should be
+
+    Starts from the compacted snapshot, or from the baseline when
+    `from_scratch` is set, and replays every game logged after it.
+    """
+    if from_scratch:
+        stats, after = _load_json(os.path.join(directory, BASELINE), {}), 0
+    else:
+        snapshot = _load_json(os.path.join(directory, SNAPSHOT), None)
+        if snapshot is None:
+            return rebuild_stats(directory, from_scratch=True)
+        stats, after = snapshot["stats"], snapshot["segment"]
+    for entry in iter_games(directory, after):
+        apply_entry(stats, entry)
+    return stats
+
+
+def rebuild_head_to_head(directory):
+    """Head-to-head records of every counted game in the log, from the first segment on"""
+    pairs = HeadToHead()
+    for entry in iter_games(directory):
+        if entry["how"] in COUNTED:
+            pairs.record(*entry["players"], entry["winner"])
+    return pairs
+
+
+def find_game(directory, game_id):
+    """The last logged game played in message `game_id`, or None"""
+    found = None
+    for entry in iter_games(directory):
+        if entry["game"] == game_id:
+            found = entry
+    return found
+
+
+def replay(entry):
+    """Yield (player id, move, state) after each move of a logged game
+
+    State is an engine.Board for classic games and an UltimateState for
+    Ultimate ones.
+    """
+    if entry["kind"] == "ultimate":
+        state = UltimateState()
+    else:
+        state = Board(geometry=geometry(entry["size"], entry["win_length"]))
+    side = entry["first"]
+    for move in bytes.fromhex(entry["moves"]):
+        if entry["kind"] == "ultimate":
+            state.play(move)
+        else:
+            state.play(move, side)
+        yield entry["players"][side], move, state
+        side = 1 - side
+
+
+class GameLog:
+    """Buffered appends of finished games, written and compacted off the event loop
+
+    Lines are written once `flush_every` games are waiting, every
+    `flush_interval` seconds while any are, and on `close()`. All file
+    work runs in order on one worker thread.
+    """
+
+    def __init__(self, directory, flush_every=20, flush_interval=5.0, compact_bytes=16 * 2**20):
+        self.directory = directory
+        self.path = os.path.join(directory, ACTIVE)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.compact_bytes = compact_bytes
+        self.size = 0  # bytes in the active log
+        self._buffer = []
+        self._writes = BackgroundWriter("game-log", "write the game log")
+        self._timer_task = None
+
+    def open(self, baseline=None):
+        """Prepare the directory; a brand new log is seeded with the stats `baseline()` returns"""
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot_path = os.path.join(self.directory, SNAPSHOT)
+        if baseline is not None and not os.path.exists(snapshot_path) and not os.path.exists(self.path):
+            baseline = baseline()
+            write_json_atomic(os.path.join(self.directory, BASELINE), baseline, None)
+            write_json_atomic(snapshot_path, {"segment": 0, "games": 0, "stats": baseline}, None)
+        self.size = _trim_torn_line(self.path)
+        # Finish a compaction that was interrupted by a crash
+        self._fold_segments()
+
+    def append(self, entry):
+        self._buffer.append(json.dumps(entry, separators=(",", ":")))
+        if len(self._buffer) >= self.flush_every:
+            self._writes.submit(self._write, self._take())
+
+    def _take(self):
+        lines, self._buffer = self._buffer, []
+        return lines
+
+    def _write(self, lines):
+        data = ("\n".join(lines) + "\n").encode()
+        with open(self.path, 'ab') as f:
+            f.write(data)
+        self.size += len(data)
+        if self.size >= self.compact_bytes:
+            self._compact()
+
+    def _compact(self):
+        """Roll the active log into the next segment and fold it into the snapshot"""
+        if not os.path.exists(self.path):
+            return
+        existing = segments(self.directory)
+        number = existing[-1][0] + 1 if existing else 1
+        os.replace(self.path, segment_path(self.directory, number, compressed=False))
+        self.size = 0
+        self._fold_segments()
+
+    def _fold_segments(self):
+        for number, path in segments(self.directory):
+            if not path.endswith(".gz"):
+                compressed = segment_path(self.directory, number)
+                tmp_path = compressed + ".tmp"
+                with open(path, 'rb') as source, gzip.open(tmp_path, 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                os.replace(tmp_path, compressed)
+                os.remove(path)
+
+        snapshot_path = os.path.join(self.directory, SNAPSHOT)
+        snapshot = _load_json(snapshot_path, None)
+        if snapshot is None:
+            snapshot = {"segment": 0, "games": 0, "stats": _load_json(os.path.join(self.directory, BASELINE), {})}
+        folded = False
+        for number, path in segments(self.directory):
+            if number > snapshot["segment"]:
+                for entry in read_entries(path):
+                    apply_entry(snapshot["stats"], entry)
+                    snapshot["games"] += 1
+                snapshot["segment"] = number
+                folded = True
+        if folded:
+            write_json_atomic(snapshot_path, snapshot, None)
+
+    async def compact(self):
+        """Write what's buffered, then compact the active log now"""
+        self._writes.submit(self._write, self._take())
+        await asyncio.wrap_future(self._writes.submit(self._compact))
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._buffer:
+                self._writes.submit(self._write, self._take())
+
+    def start(self):
+        if self._timer_task is None:
+            self._timer_task = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def flush(self):
+        if self._buffer:
+            self._writes.submit(self._write, self._take())
+        await self._writes.flush()
+
+    async def close(self):
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            self._timer_task = None
+        await asyncio.gather(self.flush(), return_exceptions=True)
+        self._writes.shutdown()
+
+
+def _trim_torn_line(path):
+    """Cut a half-written last line off a log so the next append starts clean; returns its size"""
+    try:
+        with open(path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if not size:
+                return 0
+            f.seek(max(0, size - 65536))
+            tail = f.read()
+            if tail.endswith(b"\n"):
+                return size
+            size -= len(tail) - tail.rfind(b"\n") - 1
+            f.truncate(size)
+            return size
+    except FileNotFoundError:
+        return 0
+
+
+def _mark(side):
+    return "." if side is None else "XO"[side]
+
+
+def _render(entry, state):
+    """The board as text, one character per cell"""
+    if entry["kind"] == "ultimate":
+        rows = []
+        for big_row in range(3):
+            for small_row in range(3):
+                rows.append(" ".join(
+                    "".join(_mark(state.side_at((big_row * 3 + big_col) * 9 + small_row * 3 + col)) for col in range(3))
+                    for big_col in range(3)
+                ))
+        return "\n".join(rows)
+    size = state.geometry.size
+    marks = [_mark(state.side_at(cell)) for cell in range(state.geometry.cells)]
+    return "\n".join("".join(marks[row * size:(row + 1) * size]) for row in range(size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay, audit and compact the game history log")
+    parser.add_argument("--dir", default=os.getenv('GAME_LOG_DIR', "history"), help="log directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="print a game move by move")
+    replay_parser.add_argument("game_id", type=int)
+    rebuild_parser = commands.add_parser("rebuild", help="rebuild player stats from the log")
+    rebuild_parser.add_argument("--from-scratch", action="store_true", help="start from the baseline, not the snapshot")
+    rebuild_parser.add_argument("--out", help="write the stats here instead of printing a summary")
+    verify_parser = commands.add_parser("verify", help="compare a stats file with the log")
+    verify_parser.add_argument("stats_file")
+    commands.add_parser("compact", help="roll the active log into a segment")
+    args = parser.parse_args()
+
+    if args.command == "replay":
+        entry = find_game(args.dir, args.game_id)
+        if entry is None:
+            print(f"No game {args.game_id} in {args.dir}")
+            sys.exit(1)
+        print(f"{entry['kind']} game {entry['game']}: X={entry['players'][0]} O={entry['players'][1]}, "
+              f"{datetime.fromtimestamp(entry['started']):%Y-%m-%d %H:%M:%S}")
+        for number, (player_id, move, state) in enumerate(replay(entry), 1):
+            print(f"\n{number}. {player_id} plays {move}\n{_render(entry, state)}")
+        print(f"\n{entry['how']}" + (f", winner {entry['winner']}" if entry["winner"] else ""))
+
+    elif args.command == "rebuild":
+        stats = rebuild_stats(args.dir, args.from_scratch)
+        if args.out:
+            write_json_atomic(args.out, stats)
+            print(f"Wrote stats for {len(stats)} players to {args.out}")
+        else:
+            games = sum(s['games_played'] for s in stats.values()) // 2
+            print(f"{len(stats)} players, {games} games counted")
+
+    elif args.command == "verify":
+        expected = rebuild_stats(args.dir)
+        actual = _load_json(args.stats_file, {})
+        keys = ('wins', 'losses', 'draws', 'games_played', 'rating')
+        mismatched = [
+            player_id for player_id in expected.keys() | actual.keys()
+            if [expected.get(player_id, {}).get(key) for key in keys] != [actual.get(player_id, {}).get(key) for key in keys]
+        ]
+        for player_id in mismatched[:20]:
+            print(f"{player_id}: log {expected.get(player_id)} file {actual.get(player_id)}")
+        print(f"{len(mismatched)} of {len(expected.keys() | actual.keys())} players differ")
+        sys.exit(1 if mismatched else 0)
+
+    elif args.command == "compact":
+        log = GameLog(args.dir)
+        log.open()
+        log._compact()
+        print(f"Compacted {args.dir}: {len(segments(args.dir))} segment(s)")
+
+
+if __name__ == "__main__":
+    main()
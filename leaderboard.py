@@ -0,0 +1,63 @@
+"""Rendered leaderboard pages, kept until one of their rows changes
+
+The stats store reports every rank change as (old position, new
+position). A player moving from position 40 to 12 changes the rows of
+every page from 12 through 40 (everyone in between slides down one) and
+nothing else, so only those pages are dropped. Everything else is
+served from here without touching the store.
+"""
+PAGE_SIZE = 10  # rows per page
+
+
+def page_of(position, page_size=PAGE_SIZE):
+    """0-based page holding a 1-based position"""
+    return (position - 1) // page_size
+
+
+def page_count(total, page_size=PAGE_SIZE):
+    return max(1, -(-total // page_size))
+
+
+class PageCache:
+    """{page number: rendered page}, invalidated by store rank changes
+
+    Rendering can await (display names), and rows may change meanwhile;
+    `generation` goes up on every change, so a page rendered from rows
+    that have since moved is not stored.
+    """
+
+    def __init__(self, page_size=PAGE_SIZE):
+        self.page_size = page_size
+        self.pages = {}
+        self.generation = 0
+
+    def __len__(self):
+        return len(self.pages)
+
+    def get(self, page):
+        return self.pages.get(page)
+
+    def put(self, page, rendered, generation):
+        """Keep a page rendered when `generation` was current, unless rows changed since"""
+        if generation == self.generation:
+            self.pages[page] = rendered
+
+    def clear(self):
+        self.generation += 1
+        self.pages.clear()
+
+    def rows_changed(self, old_position, new_position):
+        """Store listener: drop the pages whose rows a rank change touched"""
+        self.generation += 1
+        if new_position is None:
+            self.clear()
+            return
+        if old_position is None:
+            # A new player pushes everyone below them down a row
+            first = page_of(new_position, self.page_size)
+            for page in [page for page in self.pages if page >= first]:
+                del self.pages[page]
+            return
+        low, high = sorted((old_position, new_position))
+        for page in range(page_of(low, self.page_size), page_of(high, self.page_size) + 1):
+            self.pages.pop(page, None)
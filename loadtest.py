@@ -0,0 +1,427 @@
+"""End-to-end load test: drive the bot in-process against a fake Discord
+
+Nothing connects to Discord. FakeWorld stands in for the gateway and the
+HTTP API: commands are invoked with fake contexts, clicks go through the
+same custom-id routing discord.py uses for dynamic items, and every API
+call the bot makes sleeps for a simulated round trip and is counted.
+
+    python loadtest.py --tables 500 --channels 250 --duration 30
+
+Each table is a pair of simulated players (or a player and the bot) who
+challenge, accept, click until the game ends, sometimes rematch and
+sometimes give up with !tttend. The run reports games per second,
+event-loop lag, API calls per game, click-to-edit latency and peak RSS.
+The bot's files go to a scratch directory.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import time
+import traceback
+from collections import Counter, deque
+
+TURN_PATTERN = re.compile(r"<@(\d+)>, it's your turn")
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class FakeUser:
+    def __init__(self, user_id, bot=False):
+        self.id = user_id
+        self.bot = bot
+        self.name = f"user{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{user_id}>"
+
+
+class FakeMessage:
+    def __init__(self, world, message_id, channel, content, view):
+        self.world = world
+        self.id = message_id
+        self.channel = channel
+        self.content = content
+        self.view = view
+
+    def apply(self, kwargs):
+        if kwargs.get('content') is not None:
+            self.content = kwargs['content']
+        if kwargs.get('view') is not None:
+            self.view = kwargs['view']
+
+    async def edit(self, **kwargs):
+        await self.world.api("message.edit")
+        self.apply(kwargs)
+        return self
+
+
+class FakeChannel:
+    def __init__(self, world, channel_id):
+        self.world = world
+        self.id = channel_id
+
+    async def send(self, content=None, view=None, embed=None, **kwargs):
+        await self.world.api("channel.send")
+        message = FakeMessage(self.world, next(self.world.snowflakes), self, content, view)
+        self.world.messages[message.id] = message
+        return message
+
+    def get_partial_message(self, message_id):
+        return self.world.messages.get(message_id) or FakeMessage(self.world, message_id, self, None, None)
+
+
+class FakeContext:
+    def __init__(self, author, channel):
+        self.author = author
+        self.channel = channel
+        self.sent = []
+
+    async def send(self, *args, **kwargs):
+        message = await self.channel.send(*args, **kwargs)
+        self.sent.append(message)
+        return message
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def send_message(self, content=None, ephemeral=False, **kwargs):
+        self.done = True
+        await self.interaction.world.api("interaction.response")
+        self.interaction.world.rejections += 1
+
+    async def edit_message(self, **kwargs):
+        self.done = True
+        await self.interaction.world.api("interaction.response")
+        self.interaction.rendered(kwargs)
+
+    async def defer(self, **kwargs):
+        self.done = True
+        await self.interaction.world.api("interaction.defer")
+
+
+class FakeInteraction:
+    def __init__(self, world, user, message):
+        self.world = world
+        self.id = self.token = next(world.snowflakes)
+        self.user = user
+        self.message = message
+        self.channel = message.channel
+        self.response = FakeResponse(self)
+        self.created = time.perf_counter()
+        self.measured = False
+
+    def rendered(self, kwargs):
+        self.message.apply(kwargs)
+        if not self.measured:
+            self.measured = True
+            self.world.click_latencies.append(time.perf_counter() - self.created)
+
+    async def edit_original_response(self, **kwargs):
+        await self.world.api("webhook.edit")
+        self.rendered(kwargs)
+
+
+class FakeWorld:
+    """The fake Discord: channels, messages, users and an API call counter"""
+
+    def __init__(self, bot, latency, jitter, seed):
+        self.bot = bot
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.snowflakes = itertools.count(10**17)
+        self.channels = {}
+        self.messages = {}
+        self.users = {}
+        self.calls = Counter()
+        self.click_latencies = []
+        self.rejections = 0
+        self.errors = 0
+
+    async def api(self, route):
+        self.calls[route] += 1
+        await asyncio.sleep(max(0.0, self.rng.gauss(self.latency, self.jitter)))
+
+    def channel(self, channel_id, **kwargs):
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            channel = self.channels[channel_id] = FakeChannel(self, channel_id)
+        return channel
+
+    def user(self, user_id):
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.users[user_id] = FakeUser(user_id)
+        return user
+
+    async def fetch_user(self, user_id):
+        await self.api("users.fetch")
+        return self.user(user_id)
+
+    async def click(self, user, message, custom_id):
+        """Route a click to the bot's dynamic items, like discord.py does"""
+        interaction = FakeInteraction(self, user, message)
+        for pattern, item_cls in self.bot._connection._view_store._dynamic_items.items():
+            match = pattern.fullmatch(custom_id)
+            if match is None:
+                continue
+            try:
+                item = await item_cls.from_custom_id(interaction, None, match)
+                await item.callback(interaction)
+            except Exception:
+                self.errors += 1
+                if self.errors <= 5:
+                    traceback.print_exc()
+            return interaction
+        raise ValueError(f"nothing handles {custom_id}")
+
+    async def command(self, command, author, channel, *args):
+        """Run a command's callback; returns the messages it sent"""
+        ctx = FakeContext(author, channel)
+        try:
+            await command.callback(ctx, *args)
+        except Exception:
+            self.errors += 1
+            if self.errors <= 5:
+                traceback.print_exc()
+        return ctx.sent
+
+
+def buttons(message, prefix):
+    """Custom ids of the enabled buttons on a message starting with `prefix`"""
+    if message.view is None:
+        return []
+    return [
+        child.item.custom_id for child in message.view.children
+        if child.item.custom_id.startswith(prefix) and not getattr(child.item, 'disabled', False)
+    ]
+
+
+class Table:
+    """Two simulated players (or one and the bot) playing game after game in one channel"""
+
+    def __init__(self, harness, channel):
+        self.harness = harness
+        self.world = harness.world
+        self.channel = channel
+        self.rng = random.Random(harness.rng.random())
+
+    async def think(self):
+        await asyncio.sleep(self.rng.expovariate(1 / self.harness.args.think))
+
+    async def run(self, deadline):
+        main, args = self.harness.main, self.harness.args
+        while time.monotonic() < deadline:
+            vs_bot = self.rng.random() < args.bot_share
+            players = self.harness.take_players(1 if vs_bot else 2)
+            if players is None:
+                await asyncio.sleep(0.05)
+                continue
+            try:
+                if vs_bot:
+                    sent = await self.world.command(main.tic_tac_toe_bot, players[0], self.channel, args.difficulty, args.size)
+                else:
+                    sent = await self.world.command(main.tic_tac_toe, players[0], self.channel, players[1], args.size)
+                challenge = sent[-1] if sent else None
+                accept = buttons(challenge, "ttt:challenge:accept") if challenge else []
+                if not accept:
+                    self.harness.refused += 1
+                    await asyncio.sleep(0.05)
+                    continue
+
+                await self.think()
+                await self.world.click(players[-1], challenge, accept[0])
+                await self.play(challenge, players, deadline)
+            finally:
+                self.harness.release_players(players)
+
+    async def play(self, message, players, deadline):
+        main, args = self.harness.main, self.harness.args
+        while True:
+            stalls = 0
+            while True:
+                cells = buttons(message, "ttt:cell")
+                if not cells:
+                    break
+                await self.think()
+                if self.rng.random() < args.end_rate:
+                    await self.world.command(main.end_game, self.rng.choice(players), self.channel)
+                    self.harness.ended += 1
+                    return
+
+                turn = TURN_PATTERN.search(message.content or "")
+                player = self.world.user(int(turn.group(1))) if turn else None
+                if player is None or player.id not in [p.id for p in players]:
+                    # The bot's reply hasn't landed yet
+                    stalls += 1
+                    if stalls > 50:
+                        self.harness.stalled += 1
+                        return
+                    continue
+
+                clicks = [self.world.click(player, message, self.rng.choice(cells))]
+                if len(players) > 1 and self.rng.random() < args.misclick:
+                    # The other player clicks at the same time
+                    other = players[0] if player is players[1] else players[1]
+                    clicks.append(self.world.click(other, message, self.rng.choice(cells)))
+                await asyncio.gather(*clicks)
+
+            rematch = buttons(message, "ttt:rematch")
+            if not rematch:
+                return
+            self.harness.finished += 1
+            if self.rng.random() < args.leaderboard_rate:
+                await self.world.command(main.leaderboard, players[0], self.channel)
+            if time.monotonic() >= deadline or self.rng.random() >= args.rematch_rate:
+                return
+            await self.think()
+            await self.world.click(self.rng.choice(players), message, rematch[0])
+
+
+class Harness:
+    def __init__(self, main, args):
+        self.main = main
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.world = FakeWorld(main.bot, args.latency, args.jitter, args.seed)
+        self.free_players = deque(self.world.user(10**6 + i) for i in range(args.players))
+        self.rng.shuffle(self.free_players)
+        self.finished = 0
+        self.ended = 0
+        self.refused = 0
+        self.stalled = 0  # games abandoned because the board stopped changing
+        self.lag = []
+
+    def take_players(self, count):
+        if len(self.free_players) < count:
+            return None
+        return [self.free_players.popleft() for _ in range(count)]
+
+    def release_players(self, players):
+        self.free_players.extend(players)
+
+    async def monitor_lag(self, interval=0.01):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.lag.append(time.perf_counter() - start - interval)
+
+    async def run(self):
+        main, bot, args = self.main, self.main.bot, self.args
+        bot._connection.user = FakeUser(999, bot=True)
+        bot.fetch_user = self.world.fetch_user
+        bot.get_partial_messageable = self.world.channel
+        bot.get_channel = self.world.channel
+        main.active_games.max_per_channel = max(main.active_games.max_per_channel, -(-args.tables // args.channels))
+
+        await bot.setup_hook()
+        monitor = asyncio.create_task(self.monitor_lag())
+        start = time.monotonic()
+        deadline = start + args.duration
+        tables = [
+            Table(self, self.world.channel(1000 + i % args.channels)).run(deadline)
+            for i in range(args.tables)
+        ]
+        await asyncio.gather(*tables)
+        elapsed = time.monotonic() - start
+        monitor.cancel()
+        await main.outbox.close()
+        await main.stats_store.close()
+        await main.game_log.close()
+        if bot.ai_pool is not None:
+            bot.ai_pool.shutdown(cancel_futures=True)
+        for pool in bot.mcts_pools:
+            pool.shutdown(cancel_futures=True)
+        return self.report(elapsed)
+
+    def report(self, elapsed):
+        main, world = self.main, self.world
+        games = self.finished + self.ended
+        api_calls = sum(world.calls.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "games_finished": self.finished,
+            "games_ended": self.ended,
+            "starts_refused": self.refused,
+            "games_stalled": self.stalled,
+            "games_per_s": round(games / elapsed, 2),
+            "api_calls": dict(world.calls),
+            "api_calls_per_game": round(api_calls / games, 2) if games else None,
+            "click_to_edit_ms": {
+                "p50": round(percentile(world.click_latencies, 0.50) * 1000, 2),
+                "p99": round(percentile(world.click_latencies, 0.99) * 1000, 2),
+                "max": round(max(world.click_latencies, default=0) * 1000, 2),
+                "samples": len(world.click_latencies),
+            },
+            "loop_lag_ms": {
+                "p50": round(percentile(self.lag, 0.50) * 1000, 2),
+                "p99": round(percentile(self.lag, 0.99) * 1000, 2),
+                "max": round(max(self.lag, default=0) * 1000, 2),
+            },
+            "rejected_clicks": world.rejections,
+            "outbox": {
+                "sent": main.outbox.sent,
+                "coalesced": main.outbox.coalesced,
+                "superseded": main.outbox.superseded,
+                "failed": main.outbox.failed,
+            },
+            "errors": world.errors,
+            "games_left_registered": len(main.active_games),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the bot against a fake Discord")
+    parser.add_argument("--tables", type=int, default=500, help="games played at once")
+    parser.add_argument("--channels", type=int, default=250)
+    parser.add_argument("--players", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to keep starting games")
+    parser.add_argument("--bot-share", type=float, default=0.5, help="fraction of games against the bot")
+    parser.add_argument("--difficulty", default="medium")
+    parser.add_argument("--size", type=int, default=3, help="board size for every game")
+    parser.add_argument("--think", type=float, default=0.2, help="mean seconds between a player's clicks")
+    parser.add_argument("--misclick", type=float, default=0.05, help="chance the other player clicks at the same time")
+    parser.add_argument("--end-rate", type=float, default=0.01, help="chance per turn that a player gives up with !tttend")
+    parser.add_argument("--rematch-rate", type=float, default=0.3)
+    parser.add_argument("--leaderboard-rate", type=float, default=0.02, help="chance per game of a !tttleaderboard")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean simulated API round trip in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="FILE", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    # The bot keeps its files in the working directory; keep them out of the real ones
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    workdir = tempfile.mkdtemp(prefix="ttt-load-")
+    os.chdir(workdir)
+    import main as bot_main
+
+    report = asyncio.run(Harness(bot_main, args).run())
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
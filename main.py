@@ -2,8 +2,31 @@ import discord
 from discord.ext import commands
 import random
 import os
+import asyncio
 import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import wraps
+from discord.webhook.async_ import async_context
+from ai import DEFAULT_DIFFICULTY, DIFFICULTIES, choose_move, pick_move, solved_table
+from engine import CLASSIC, MAX_SIZE, MIN_SIZE, Board, geometry
+from history import COUNTED, GameLog, rebuild_head_to_head, rebuild_stats
+from leaderboard import PAGE_SIZE, PageCache, page_count, page_of
+from matchmaking import MatchQueue
+from metrics import count_log_messages, counter, gauge, histogram, timed
+import metrics
+from names import DisplayNameCache, resolve_display_names
+from periods import PERIOD_ALIASES, PERIOD_NAMES, PERIODS, totals as period_totals
+from outbox import EditScheduler
+from profiling import MODES as PROFILE_MODES, Profiler
+from registry import GameRegistry
+from ratings import INITIAL_RATING, expected_score
+from stats_store import open_stats_store, win_rate, write_json_atomic
+from tournament import ELIMINATION, FORMATS, SWISS, Tournament
+from ultimate import FREE, UltimateState, replay as replay_ultimate
+from ultimate import forget as ultimate_forget, mcts_move as ultimate_move
 
 # Fun quotes for wins and ties
 win_quotes = [
@@ -48,163 +71,695 @@ tie_quotes = [
     "Tie game! You both deserve participation trophies."
 ]
 
+class TicTacToeBot(commands.Bot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Searches on big boards run here so they never block the event loop
+        self.ai_pool = None
+        # Single-worker pools, so each Ultimate game's search tree stays in one process
+        self.mcts_pools = []
+        self.maintenance_task = None
+        self.queue_task = None
+        self.metrics_server = None
+
+    async def setup_hook(self):
+        if PROFILE_ON_START:
+            seconds = profiler.start(PROFILE_ON_START, PROFILE_SECONDS)
+            print(f"Profiling ({PROFILE_ON_START}) for {seconds:g}s into {profiler.directory}/")
+        instrument_discord_api()
+        if METRICS_PORT:
+            self.metrics_server = await metrics.serve(METRICS_HOST, int(METRICS_PORT))
+            print(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        # Parse the stats file once; everything after this reads from memory
+        await asyncio.to_thread(stats_store.load)
+        await asyncio.to_thread(game_log.open, stats_store.all)
+        # Solve the game now so the bot's first move is just a lookup
+        await asyncio.to_thread(solved_table)
+        self.ai_pool = ProcessPoolExecutor(
+            max_workers=AI_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+        self.mcts_pools = [
+            ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+            for _ in range(MCTS_WORKERS)
+        ]
+        # Buttons find their game from the custom id, so clicks work across restarts
+        self.add_dynamic_items(
+            TicTacToeButton, RematchButton, ChallengeButton, UltimateCellButton, UltimateBoardSelect, LeaderboardButton,
+            TournamentButton
+        )
+        await asyncio.to_thread(load_game_snapshot)
+        self.maintenance_task = asyncio.create_task(maintain_games())
+        self.queue_task = asyncio.create_task(maintain_queue())
+        stats_store.start()
+        game_log.start()
+        outbox.start()
+
+    async def close(self):
+        await profiler.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+        if self.queue_task is not None:
+            self.queue_task.cancel()
+        if self.maintenance_task is not None:
+            self.maintenance_task.cancel()
+            await save_game_snapshot()
+        await outbox.close()
+        # Tournament games already in the game log belong in the stats too
+        for t in tournaments.values():
+            flush_tournament_results(t)
+        await stats_store.close()
+        await game_log.close()
+        if self.ai_pool is not None:
+            self.ai_pool.shutdown(cancel_futures=True)
+        for pool in self.mcts_pools:
+            pool.shutdown(cancel_futures=True)
+        await super().close()
+
+    def mcts_pool(self, game_id):
+        """The worker that owns an Ultimate game's search tree"""
+        return self.mcts_pools[game_id % len(self.mcts_pools)]
+
+# Game phases; every change happens before the handler making it first awaits
+PLAYING, BOT_THINKING, OVER = range(3)
+MARKS = ("❌", "⭕")  # player1's mark, player2's mark
+DIFFICULTY_CODES = {name[0]: name for name in DIFFICULTIES}
+CHALLENGE_TIMEOUT = 60  # seconds to accept a challenge
+GAMES_FILE = "active_games.json"  # running games, saved so a restart doesn't end them
+AI_WORKERS = int(os.getenv('AI_WORKERS', "2"))
+MCTS_WORKERS = int(os.getenv('MCTS_WORKERS', "2"))
+BOT_REPLY_DEADLINE = 2.0  # seconds to wait for a big-board search before acknowledging the click
+ULTIMATE_BOT_BUDGET = 1.5  # seconds of Monte Carlo search per bot move; fits inside BOT_REPLY_DEADLINE
+ULTIMATE_BOARD_NAMES = [
+    "Top left", "Top", "Top right",
+    "Left", "Center", "Right",
+    "Bottom left", "Bottom", "Bottom right"
+]
+
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
-
-active_games = {}  # {channel_id: TicTacToe instance}
+bot = TicTacToeBot(command_prefix="!", intents=intents)
+
+# Running games by message id, capped per channel and per player; idle ones are evicted
+active_games = GameRegistry(
+    max_per_channel=int(os.getenv('MAX_GAMES_PER_CHANNEL', "5")),
+    max_per_player=int(os.getenv('MAX_GAMES_PER_PLAYER', "1")),
+    idle_ttl=float(os.getenv('GAME_IDLE_TTL', "900")),
+    unpack=lambda game_id, packed: unpack_game(game_id, packed)
+)
+display_names = DisplayNameCache()  # leaderboard names for users outside the gateway cache
+# Edits that don't answer a click: coalesced per message, paced per channel
+outbox = EditScheduler(
+    rate=int(os.getenv('EDITS_PER_CHANNEL', "5")), per=float(os.getenv('EDIT_WINDOW', "5"))
+)
+
+# Matchmaking: !tttqueue pairs players by rating. Games start in QUEUE_CHANNEL_ID if set,
+# otherwise where the longer-waiting player queued; that channel's game cap still applies.
+QUEUE_CHANNEL_ID = int(os.getenv('QUEUE_CHANNEL_ID', "0")) or None
+QUEUE_TICK = 1.0  # seconds between the queue scheduler's passes
+match_queue = MatchQueue(timeout=float(os.getenv('QUEUE_TIMEOUT', "300")))
+queue_wakeup = asyncio.Event()  # set when someone joins an idle queue
+tables_reserved = {}  # {channel_id: matched games whose message isn't up yet}
+starting_games = set()  # keeps the background tasks of the queue and tournaments alive
+
+# Tournaments: one open !ttttournament per channel, each match played in its own thread.
+# Finished games are written to the stats store TOURNAMENT_STATS_BATCH at a time.
+TOURNAMENT_STARTS = int(os.getenv('TOURNAMENT_STARTS', "4"))  # matches being set up with Discord at once
+TOURNAMENT_STATS_BATCH = int(os.getenv('TOURNAMENT_STATS_BATCH', "25"))
+tournaments = {}  # {channel_id: Tournament}
+tournament_games = {}  # {game_id: (Tournament, Match)} for every running tournament game
+tournament_starts = asyncio.Semaphore(TOURNAMENT_STARTS)
 
 # Stats storage
+# STATS_BACKEND=sqlite keeps stats in STATS_DB, importing STATS_FILE on first start
 STATS_FILE = "player_stats.json"
-
-def load_stats():
-    """Load player statistics from JSON file"""
+STATS_DB = os.getenv('STATS_DB', "player_stats.db")
+# Every finished game, move by move; a corrupt stats file is rebuilt from it
+GAME_LOG_DIR = os.getenv('GAME_LOG_DIR', "history")
+game_log = GameLog(GAME_LOG_DIR)
+stats_store = open_stats_store(
+    os.getenv('STATS_BACKEND', "json"), STATS_FILE, STATS_DB,
+    recover=lambda: rebuild_stats(GAME_LOG_DIR), recover_pairs=lambda: rebuild_head_to_head(GAME_LOG_DIR)
+)
+# Rendered pages of each leaderboard: all-time by rating, then the day, week and month by wins.
+# A page is dropped when a game moves one of its rows.
+LEADERBOARDS = ("all",) + PERIODS
+leaderboard_pages = {board: PageCache() for board in LEADERBOARDS}
+stats_store.listeners.append(leaderboard_pages["all"].rows_changed)
+stats_store.periods.listeners.append(lambda period, old, new: leaderboard_pages[period].rows_changed(old, new))
+
+# Metrics, served in the Prometheus text format when METRICS_PORT is set
+METRICS_HOST = os.getenv('METRICS_HOST', "127.0.0.1")
+METRICS_PORT = os.getenv('METRICS_PORT')
+COMMAND_SECONDS = histogram("ttt_command_seconds", "Time to run a command", ["command"])
+INTERACTION_SECONDS = histogram("ttt_interaction_seconds", "Time to handle a click on a game component", ["component"])
+API_SECONDS = histogram(
+    "ttt_discord_api_seconds", "Discord API requests by route, including time spent waiting on rate limits", ["route"]
+)
+API_ERRORS = counter("ttt_discord_api_errors_total", "Discord API requests that failed", ["route", "status"])
+RATE_LIMITS = counter("ttt_discord_rate_limits_total", "429 responses from Discord", ["source"])
+GAMES_STARTED = counter("ttt_games_started_total", "Games started", ["mode"])
+QUEUE_WAIT_SECONDS = histogram(
+    "ttt_queue_wait_seconds", "Time players spent in the matchmaking queue, by how they left it", ["outcome"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600)
+)
+GAMES_FINISHED = counter("ttt_games_finished_total", "Games that ended: won, drawn, ended or abandoned", ["how"])
+BOT_MOVES = counter("ttt_bot_moves_total", "Moves the bot has played", ["game"])
+BOT_MOVE_SECONDS = histogram("ttt_bot_move_seconds", "Time for the bot to pick a move", ["game"])
+TOURNAMENT_MATCHES = counter(
+    "ttt_tournament_matches_total", "Tournament matches settled: won, drawn, forfeit, walkover or void", ["how"]
+)
+LEADERBOARD_PAGES = counter(
+    "ttt_leaderboard_pages_total", "Leaderboard pages shown, by board and whether they were cached", ["board", "cache"]
+)
+gauge("ttt_active_games", "Games registered right now", fn=lambda: len(active_games))
+gauge("ttt_tournament_games", "Tournament games running right now", fn=lambda: len(tournament_games))
+gauge("ttt_queue_waiting", "Players waiting in the matchmaking queue", fn=lambda: len(match_queue))
+gauge("ttt_live_views", "Persistent views the bot is listening to", fn=lambda: len(bot.persistent_views))
+gauge("ttt_outbox_pending", "Message edits waiting to be sent", fn=lambda: len(outbox))
+gauge("ttt_stats_file_bytes", "Size of the stats file or database", fn=lambda: stats_file_size())
+gauge(
+    "ttt_leaderboard_cached_pages", "Rendered leaderboard pages in the cache",
+    fn=lambda: sum(len(pages) for pages in leaderboard_pages.values())
+)
+count_log_messages(RATE_LIMITS, "discord.http", ["We are being rate limited", "Global rate limit"], source="bot")
+count_log_messages(RATE_LIMITS, "discord.webhook.async_", ["Webhook ID %s is rate limited"], source="webhook")
+
+# Profiling: !tttprofile for the owner, or PROFILE_ON_START=sample|cprofile from startup
+PROFILE_ON_START = os.getenv('PROFILE_ON_START')
+PROFILE_SECONDS = float(os.getenv('PROFILE_SECONDS', "60"))
+profiler = Profiler(
+    os.getenv('PROFILE_DIR', "profiles"),
+    slow_callback=float(os.getenv('SLOW_CALLBACK_MS', "100")) / 1000,
+    max_seconds=float(os.getenv('PROFILE_MAX_SECONDS', "600")),
+)
+
+def stats_file_size():
+    path = STATS_DB if os.getenv('STATS_BACKEND', "json") == "sqlite" else STATS_FILE
+    return os.path.getsize(path)
+
+def instrument_discord_api():
+    """Time every request discord.py makes, labelled by route template"""
+    def wrap(request):
+        @wraps(request)
+        async def timed_request(route, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await request(route, *args, **kwargs)
+            except discord.HTTPException as e:
+                API_ERRORS.inc(route=f"{route.method} {route.path}", status=e.status)
+                raise
+            finally:
+                API_SECONDS.observe(time.perf_counter() - start, route=f"{route.method} {route.path}")
+        return timed_request
+
+    bot.http.request = wrap(bot.http.request)
+    # Interaction responses and followups go through the webhook adapter instead
+    adapter = async_context.get()
+    adapter.request = wrap(adapter.request)
+
+@bot.before_invoke
+async def start_command_timer(ctx):
+    ctx.started = time.perf_counter()
+
+@bot.after_invoke
+async def stop_command_timer(ctx):
+    COMMAND_SECONDS.observe(time.perf_counter() - ctx.started, command=ctx.command.name)
+
+def record_game_result(player1, player2, winner_id=None):
+    """Update statistics for both players of a finished game in one write"""
+    stats_store.record_game(player1, player2, winner_id)
+
+def register_game(game):
+    """Track a newly started game under the message it's played in"""
+    players = [player_id for player_id in (game.player1, game.player2) if player_id != bot.user.id]
+    active_games.add(game.game_id, game.channel_id, game, players)
+    # Someone who found a game on their own doesn't need one from the queue
+    for player_id in players:
+        entry = match_queue.leave(player_id)
+        if entry is not None:
+            QUEUE_WAIT_SECONDS.observe(time.monotonic() - entry.joined, outcome="left")
+    GAMES_STARTED.inc(mode="bot" if game.is_bot_game else "pvp")
+
+def finish_game(game, how, winner_id=None):
+    """Forget a game that has ended, log it and count it; `how` is won, drawn, ended (by !tttend) or abandoned"""
+    active_games.remove(game.game_id)
+    GAMES_FINISHED.inc(how=how)
+    game_log.append(game.log_entry(how, winner_id))
+    match = tournament_games.pop(game.game_id, None)
+    if match is not None:
+        settle_tournament_game(*match, game, how, winner_id)
+    elif how in COUNTED:
+        record_game_result(game.player1, game.player2, winner_id)
+
+def game_running(game_id):
+    game = active_games.get(game_id)
+    return game is not None and game.phase != OVER
+
+def unpack_game(game_id, packed):
+    """Rebuild a game from the list its pack() method produced"""
+    return GAME_KINDS[packed[0]].unpack(game_id, packed)
+
+def load_game_snapshot():
+    """Register the games saved at the last shutdown; they're unpacked when someone clicks"""
     try:
-        with open(STATS_FILE, 'r') as f:
-            return json.load(f)
+        with open(GAMES_FILE, 'r') as f:
+            snapshot = json.load(f)
     except (FileNotFoundError, json.JSONDecodeError):
-        return {}
-
-def save_stats(stats):
-    """Save player statistics to JSON file"""
-    with open(STATS_FILE, 'w') as f:
-        json.dump(stats, f, indent=2)
-
-def update_player_stats(player_id, won=False, draw=False):
-    """Update statistics for a player"""
-    stats = load_stats()
-    player_id = str(player_id)
-
-    if player_id not in stats:
-        stats[player_id] = {
-            'wins': 0,
-            'losses': 0,
-            'draws': 0,
-            'games_played': 0,
-            'last_played': None
-        }
-
-    stats[player_id]['games_played'] += 1
-    stats[player_id]['last_played'] = datetime.now().isoformat()
+        return
 
-    if won:
-        stats[player_id]['wins'] += 1
-    elif draw:
-        stats[player_id]['draws'] += 1
+    for game_id, packed in snapshot.items():
+        # Every packed game starts with [kind, channel_id, player1, player2, ...]
+        players = [player_id for player_id in packed[2:4] if player_id != bot.user.id]
+        active_games.restore(int(game_id), packed[1], packed, players)
+
+async def save_game_snapshot():
+    """Write every running game to GAMES_FILE without blocking the event loop"""
+    snapshot = active_games.snapshot()
+    await asyncio.to_thread(write_json_atomic, GAMES_FILE, snapshot, None)
+
+async def maintain_games():
+    """Close games nobody has touched for the registry's idle TTL and snapshot the rest"""
+    while True:
+        await asyncio.sleep(30)
+        for game in active_games.evict_idle():
+            game.phase = OVER
+            finish_game(game, "abandoned")
+            close_board(game, "⌛ This game was abandoned.")
+
+        if active_games.dirty:
+            try:
+                await save_game_snapshot()
+            except OSError as e:
+                print(f"Failed to save running games: {e}")
+
+def queue_channel(entry):
+    return QUEUE_CHANNEL_ID or entry.channel_id
+
+def reserve_table(first, second):
+    """Hold a place for a matched pair's game, if its channel has room for one more"""
+    channel_id = queue_channel(first)
+    reserved = tables_reserved.get(channel_id, 0)
+    if len(active_games.by_channel.get(channel_id, ())) + reserved >= active_games.max_per_channel:
+        return False
+    tables_reserved[channel_id] = reserved + 1
+    return True
+
+def release_table(channel_id):
+    reserved = tables_reserved.pop(channel_id, 0) - 1
+    if reserved > 0:
+        tables_reserved[channel_id] = reserved
+
+async def post_game(where, intro, player1, player2, status):
+    """Send `intro` to a channel or thread and start a classic game in it, `status` ({player} moves first) under the board"""
+    # The buttons need the message id, so the board goes in once the message exists
+    message = await where.send(intro)
+    game = create_game(message.id, where.id, player1, player2)
+    register_game(game)
+    status = status.format(player=mention(game.current_player))
+    outbox.schedule(game.game_id, where.id, message.edit, content=game.render(status), view=game.make_view())
+    return game
+
+async def start_queued_game(first, second):
+    """Start a classic game for a matched pair at the table reserve_table held for them"""
+    channel_id = queue_channel(first)
+    try:
+        channel = bot.get_channel(channel_id) or await bot.fetch_channel(channel_id)
+        await post_game(
+            channel,
+            f"⚔️ Match found: {mention(first.player_id)} ({first.rating:.0f}) vs "
+            f"{mention(second.player_id)} ({second.rating:.0f})! Setting up the board...",
+            first.player_id, second.player_id, "Matched by the queue! {player}, it's your turn!"
+        )
+    except discord.HTTPException as e:
+        print(f"Failed to start a queued game in channel {channel_id}: {e}")
+        # Back to waiting where they were; anyone who found a game meanwhile stays out
+        for entry in (first, second):
+            if entry.player_id not in match_queue and not active_games.is_playing(entry.player_id):
+                match_queue.requeue(entry)
+        queue_wakeup.set()
+        return
+    finally:
+        release_table(channel_id)
+
+    now = time.monotonic()
+    for entry in (first, second):
+        QUEUE_WAIT_SECONDS.observe(now - entry.joined, outcome="matched")
+
+def keep_task(coro):
+    """Run a coroutine in the background, holding on to its task until it's done"""
+    task = asyncio.create_task(coro)
+    starting_games.add(task)
+    task.add_done_callback(starting_games.discard)
+
+def start_queued_games(pairs):
+    for first, second in pairs:
+        keep_task(start_queued_game(first, second))
+
+async def announce_timeouts(expired):
+    """Tell everyone who waited too long, one message per channel"""
+    by_channel = {}
+    for entry in expired:
+        by_channel.setdefault(entry.channel_id, []).append(entry.player_id)
+    for channel_id, player_ids in by_channel.items():
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            continue
+        # Keep each message well under Discord's 2000 characters
+        for start in range(0, len(player_ids), 50):
+            mentions = ", ".join(mention(player_id) for player_id in player_ids[start:start + 50])
+            try:
+                await channel.send(f"⌛ No match found in time for {mentions}. Use `!tttqueue` to try again.")
+            except discord.HTTPException as e:
+                print(f"Failed to announce queue timeouts in channel {channel_id}: {e}")
+
+async def maintain_queue():
+    """The one timer behind the queue: pairs players as their tolerance widens and times them out"""
+    while True:
+        if not match_queue:
+            queue_wakeup.clear()
+            await queue_wakeup.wait()
+        await asyncio.sleep(QUEUE_TICK)
+
+        start_queued_games(match_queue.match_waiting(allowed=reserve_table))
+        expired = match_queue.expire()
+        if expired:
+            for entry in expired:
+                QUEUE_WAIT_SECONDS.observe(match_queue.timeout, outcome="timeout")
+            await announce_timeouts(expired)
+
+def end_running_game(game, player_id, status):
+    """End a game the way !tttend does, on behalf of one of its players"""
+    game.players_used_tttend.add(player_id)
+    # Mark the game as over; its buttons stop working once it's unregistered
+    game.phase = OVER
+    finish_game(game, "ended")
+    close_board(game, status)
+
+def enter_tournament(t, user, action):
+    """Join or leave a tournament; returns what to tell the player"""
+    if action == "join":
+        if user.bot:
+            return "Bots can't enter tournaments!"
+        if t.started:
+            return "This tournament has already started!"
+        if user.id in t.ratings:
+            return f"You're already in this tournament, with {plural(len(t) - 1, 'other')}."
+        t.join(user.id, stats_store.ranks.get(str(user.id)))
+        display_names.put(user.id, user.display_name)
+        return f"✅ {user.display_name} joined the tournament ({plural(len(t), 'player')})."
+
+    if user.id not in t.ratings or user.id in t.withdrawn:
+        return "You're not in this tournament."
+    t.leave(user.id)
+    if not t.started:
+        return f"{user.display_name} left the tournament ({plural(len(t), 'player')})."
+    # A match already on the board is forfeited; one still being set up is a walkover
+    match = t.current(user.id)
+    if match is not None and match.game_id is not None and game_running(match.game_id):
+        end_running_game(active_games.get(match.game_id), user.id, f"🏳️ {mention(user.id)} withdrew from the tournament.")
+    return f"🏳️ {user.display_name} withdrew from the tournament."
+
+def flush_tournament_results(t):
+    """Write a tournament's finished games to the stats store in one batch"""
+    if t.results:
+        stats_store.record_games(t.results)
+        t.results = []
+
+def start_matches(t, matches, new_round):
+    """Set up games for matches in the background; nothing here waits on Discord"""
+    if new_round:
+        keep_task(announce_round(t, len(matches)))
+    for match in matches:
+        keep_task(start_tournament_game(t, match))
+
+def report_match(t, match, winner_id):
+    """Settle a match and start whatever comes of it: a replay, the next round or the final standings"""
+    advance_tournament(t, t.report(match, winner_id), match.round)
+
+def advance_tournament(t, matches, round_before):
+    """Start the matches a settled match led to; round_before is the round it was played in"""
+    if t.finished or t.round != round_before or len(t.results) >= TOURNAMENT_STATS_BATCH:
+        flush_tournament_results(t)
+    if t.finished:
+        if tournaments.get(t.channel_id) is t:
+            del tournaments[t.channel_id]
+        keep_task(announce_standings(t))
+        return
+    start_matches(t, matches, t.round != round_before)
+
+def settle_tournament_game(t, match, game, how, winner_id):
+    """Count a finished game toward its match; a game ended by !tttend or abandoned is a forfeit"""
+    if how == "ended":
+        # Whoever used !tttend (or withdrew) gives the match away
+        winner_id = match.opponent(next(iter(game.players_used_tttend)))
+        how = "forfeit"
+    elif how == "abandoned":
+        # Nobody moved for the whole idle TTL; the player whose turn it was forfeits
+        winner_id = match.opponent(game.current_player)
+        how = "forfeit"
     else:
-        stats[player_id]['losses'] += 1
-
-    save_stats(stats)
-
-def get_win_rate(stats):
-    """Calculate win rate percentage"""
-    if stats['games_played'] == 0:
-        return 0.0
-    return (stats['wins'] / stats['games_played']) * 100
-
-class TicTacToeButton(discord.ui.Button):
-    def __init__(self, row, col, game):
-        super().__init__(label="⬛", style=discord.ButtonStyle.secondary, row=row)
-        self.row = row
-        self.col = col
-        self.game = game
-
-    async def callback(self, interaction: discord.Interaction):
-        if self.game.game_over:
-            await interaction.response.send_message("Game is already over!", ephemeral=True)
+        t.results.append((game.player1, game.player2, winner_id))
+    TOURNAMENT_MATCHES.inc(how=how)
+    report_match(t, match, winner_id)
+
+def cancel_tournament(t):
+    """Stop a tournament: games already finished keep their stats, running ones end unrated"""
+    del tournaments[t.channel_id]
+    flush_tournament_results(t)
+    for game_id, (owner, _) in list(tournament_games.items()):
+        if owner is not t:
+            continue
+        del tournament_games[game_id]
+        game = active_games.get(game_id)
+        if game is not None:
+            game.phase = OVER
+            finish_game(game, "ended")
+            close_board(game, "🛑 The tournament was cancelled.")
+
+def withdrawn_from(t, match):
+    return [player_id for player_id in (match.player1, match.player2) if player_id in t.withdrawn]
+
+async def start_tournament_game(t, match):
+    """Open a thread for a match and start its game there, TOURNAMENT_STARTS at a time"""
+    async with tournament_starts:
+        if tournaments.get(t.channel_id) is not t or match.done:
+            return  # cancelled while waiting
+        withdrawn = withdrawn_from(t, match)
+        if withdrawn:
+            TOURNAMENT_MATCHES.inc(how="walkover")
+            report_match(t, match, match.opponent(withdrawn[0]))
             return
 
-        # Check if the user is one of the players in this game
-        if interaction.user.id not in [self.game.player1, self.game.player2]:
-            await interaction.response.send_message("This isn't your game!", ephemeral=True)
+        names = await resolve_display_names(bot, [match.player1, match.player2], display_names)
+        title = f"Round {match.round}: {names[match.player1]} vs {names[match.player2]}"
+        try:
+            channel = bot.get_channel(t.channel_id) or await bot.fetch_channel(t.channel_id)
+            where = channel
+            # A thread per game keeps the channel's game cap and edit pacing from holding the round up
+            if hasattr(channel, "create_thread"):
+                try:
+                    where = await channel.create_thread(
+                        name=title[:100], type=discord.ChannelType.public_thread, auto_archive_duration=60
+                    )
+                except discord.HTTPException as e:
+                    # No thread permission: play in the channel itself
+                    print(f"Failed to open a thread for a tournament match in channel {t.channel_id}: {e}")
+            game = await post_game(
+                where, f"🏆 {title}! {mention(match.player1)} vs {mention(match.player2)}. Setting up the board...",
+                match.player1, match.player2, "{player}, it's your turn! `!tttend` forfeits the match."
+            )
+        except discord.HTTPException as e:
+            # Not worth stalling the round over; the match is void
+            print(f"Failed to start a tournament game in channel {t.channel_id}: {e}")
+            TOURNAMENT_MATCHES.inc(how="void")
+            advance_tournament(t, t.void(match), match.round)
             return
 
-        # Check if user has used !tttend (makes board unclickable for them)
-        if interaction.user.id in self.game.players_used_tttend:
-            await interaction.response.send_message("You ended this game and cannot play on it anymore!", ephemeral=True)
-            return
+        match.game_id = game.game_id
+        tournament_games[game.game_id] = (t, match)
+
+    # Someone may have withdrawn while the message was going up
+    for player_id in withdrawn_from(t, match):
+        if game_running(game.game_id):
+            end_running_game(game, player_id, f"🏳️ {mention(player_id)} withdrew from the tournament.")
+
+async def tournament_standings(t, limit=10):
+    """Embed with where a tournament is at and its top `limit` players"""
+    standings = t.standings()[:limit]
+    names = await resolve_display_names(bot, [player_id for player_id, _ in standings], display_names)
+    if t.finished:
+        state = f"Final standings of {plural(len(t), 'player')}"
+    elif t.started:
+        of = f" of {t.rounds}" if t.format == SWISS else ""
+        playing = sum(not match.done for match in t.matches)
+        state = f"Round {t.round}{of}: {playing} of {plural(len(t.matches), 'match', 'matches')} still playing • {plural(len(t), 'player')}"
+    else:
+        state = f"Waiting for the host to start it • {plural(len(t), 'player')}"
+
+    embed = discord.Embed(title=f"🏆 {t.format.title()} Tournament", description=state, color=discord.Color.gold())
+    for place, (player_id, score) in enumerate(standings, 1):
+        if not t.started:
+            value = f"**{t.ratings[player_id]:.0f}** rating"
+        elif t.format == SWISS:
+            value = f"**{score:g}** points"
+        elif player_id in t.eliminated:
+            value = f"Out in round {score}"
+        else:
+            value = "**Champion**" if t.finished else "Still in"
+        if player_id in t.withdrawn:
+            value += " • withdrew"
+        embed.add_field(name=f"{MEDALS.get(place, f'{place}.')} {names[player_id]}", value=value, inline=False)
+    return embed
+
+async def announce_round(t, count):
+    channel = bot.get_channel(t.channel_id)
+    if channel is None:
+        return
+    of = f" of {t.rounds}" if t.format == SWISS else ""
+    try:
+        await channel.send(
+            f"🏁 Round {t.round}{of} is starting: {plural(count, 'match', 'matches')}, "
+            f"{'in its own thread' if count == 1 else 'each in its own thread'}. `!tttend` in yours forfeits it."
+        )
+    except discord.HTTPException as e:
+        print(f"Failed to announce a tournament round in channel {t.channel_id}: {e}")
 
-        if interaction.user.id != self.game.current_player and not self.game.is_bot_game:
-            await interaction.response.send_message("Not your turn!", ephemeral=True)
-            return
+async def announce_standings(t):
+    channel = bot.get_channel(t.channel_id)
+    if channel is None:
+        return
+    champion = t.champion()
+    try:
+        await channel.send(
+            f"🎉 The tournament is over! Congratulations, {mention(champion)}!",
+            embed=await tournament_standings(t)
+        )
+    except discord.HTTPException as e:
+        print(f"Failed to announce tournament standings in channel {t.channel_id}: {e}")
+
+def settings_code(is_bot_game=False, difficulty=DEFAULT_DIFFICULTY, board=CLASSIC, ultimate=False):
+    """Pack game settings into five characters for custom ids and snapshots"""
+    return f"{'b' if is_bot_game else 'p'}{'u' if ultimate else 'n'}{board.size}{board.win_length}{difficulty[0]}"
+
+def parse_settings(code):
+    """Unpack settings_code() into create_game keyword arguments"""
+    return {
+        'is_bot_game': code[0] == 'b',
+        'ultimate': code[1] == 'u',
+        'board': geometry(int(code[2]), int(code[3])),
+        'difficulty': DIFFICULTY_CODES[code[4]]
+    }
+
+def plural(count, noun, nouns=None):
+    """A count and its noun: 1 match, 2 matches; `nouns` is the plural if it isn't noun + s"""
+    return f"{count:,} {noun if count == 1 else nouns or noun + 's'}"
+
+def mention(user_id):
+    """Mention a user by id; no need to fetch them from the API just for this"""
+    return f"<@{user_id}>"
+
+async def edit_game_message(interaction, **kwargs):
+    """Edit the message a component lives on, whether or not the click was acknowledged yet"""
+    if interaction.response.is_done():
+        # Deferred: the edit goes out through the webhook whenever its budget allows
+        outbox.schedule(interaction.message.id, interaction.token, interaction.edit_original_response, **kwargs)
+    else:
+        ticket = outbox.answering(interaction.message.id, kwargs)
+        landed = False
+        try:
+            await interaction.response.edit_message(**kwargs)
+            landed = True
+        finally:
+            newest = outbox.answered(interaction.message.id, ticket, landed)
+            if newest is not None:
+                # Racing clicks: this older board may have landed over a newer one, or the answer failed
+                outbox.schedule(interaction.message.id, interaction.channel.id, interaction.message.edit, **newest)
+
+def close_board(game, status):
+    """Disable a finished game's buttons without waiting for the edit"""
+    message = bot.get_partial_messageable(game.channel_id).get_partial_message(game.game_id)
+    outbox.schedule(game.game_id, game.channel_id, message.edit, content=game.render(status), view=game.make_view(disabled=True))
+
+async def wait_for_bot(interaction, search):
+    """Wait for the bot's move from a worker, acknowledging the click first if it outlasts BOT_REPLY_DEADLINE"""
+    try:
+        return await asyncio.wait_for(asyncio.shield(search), BOT_REPLY_DEADLINE)
+    except asyncio.TimeoutError:
+        # Discord wants an answer within 3 seconds; the turn then goes out with edit_original_response
+        await interaction.response.defer()
+        return await search
 
-        if self.game.is_bot_game and interaction.user.id == bot.user.id:
-            await interaction.response.send_message("It's the bot's turn!", ephemeral=True)
+BOT_FAILED = "⚠️ The bot couldn't pick a move. Click any square to make it try again."
+
+async def bot_search(game, interaction, pool, fn, *args):
+    """Run a game's bot search in a worker pool and wait_for_bot() on it; None if it failed"""
+    try:
+        # A broken pool already raises when the search is handed to it
+        return await wait_for_bot(interaction, asyncio.get_running_loop().run_in_executor(pool, fn, *args))
+    except (Exception, asyncio.CancelledError) as e:
+        # Back in PLAYING with the bot to move, the next click asks the bot again (see check_turn)
+        if game.phase == BOT_THINKING:
+            game.phase = PLAYING
+        if isinstance(e, asyncio.CancelledError):
+            raise
+        print(f"The bot's search failed in game {game.game_id}: {e!r}")
+        return None
+
+async def with_bot_reply(game, interaction, turn):
+    """What to show after a human's move: `turn`, or the bot's reply if it moves next"""
+    # Against the bot, answer with its reply too: one edit for the whole turn
+    if game.is_bot_game and game.current_player == bot.user.id:
+        return await game.bot_turn(interaction)
+    return turn
+
+def count_bot_move(game, started):
+    BOT_MOVES.inc(game=game)
+    BOT_MOVE_SECONDS.observe(time.perf_counter() - started, game=game)
+
+class TicTacToeButton(discord.ui.DynamicItem[discord.ui.Button], template=r"ttt:cell:(?P<game_id>[0-9]+):(?P<cell>[0-9]+)"):
+    def __init__(self, game_id, cell, label="⬛", disabled=False, row=None):
+        super().__init__(discord.ui.Button(
+            label=label, style=discord.ButtonStyle.secondary, disabled=disabled, row=row,
+            custom_id=f"ttt:cell:{game_id}:{cell}"
+        ))
+        self.game_id = game_id
+        self.cell = cell
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match['game_id']), int(match['cell']))
+
+    @timed(INTERACTION_SECONDS, component="cell")
+    async def callback(self, interaction: discord.Interaction):
+        game = active_games.get(self.game_id)
+        if not await check_turn(game, interaction):
             return
 
-        if self.label != "⬛":
+        if not game.engine.is_empty(self.cell):
             await interaction.response.send_message("That space is taken!", ephemeral=True)
             return
 
-        mark = "❌" if self.game.current_player == self.game.player1 else "⭕"
-        self.label = mark
-        self.disabled = True
-        self.game.board[self.row][self.col] = mark
-
-        if self.game.check_winner():
-            self.view.disable_all_items()
-            winner_id = self.game.current_player
-            loser_id = self.game.player2 if winner_id == self.game.player1 else self.game.player1
-
-            # Update stats
-            update_player_stats(winner_id, won=True)
-            update_player_stats(loser_id, won=False)
-
-            # Get random win quote
-            win_quote = random.choice(win_quotes)
-
-            # Add rematch button
-            rematch_view = discord.ui.View(timeout=None)
-            rematch_view.add_item(RematchButton(self.game.player1, self.game.player2, self.game.is_bot_game))
-
-            await interaction.response.edit_message(
-                content=f"{interaction.user.mention} wins! 🎉\n*{win_quote}*", view=rematch_view
-            )
-
-            self.game.game_over = True
-            if interaction.channel.id in active_games:
-                del active_games[interaction.channel.id]
-        elif self.game.is_draw():
-            self.view.disable_all_items()
-
-            # Update stats for both players (draw)
-            update_player_stats(self.game.player1, draw=True)
-            update_player_stats(self.game.player2, draw=True)
-
-            # Get random tie quote
-            tie_quote = random.choice(tie_quotes)
-
-            # Add rematch button
-            rematch_view = discord.ui.View(timeout=None)
-            rematch_view.add_item(RematchButton(self.game.player1, self.game.player2, self.game.is_bot_game))
-
-            await interaction.response.edit_message(content=f"It's a draw! 🤝\n*{tie_quote}*", view=rematch_view)
-            self.game.game_over = True
-            if interaction.channel.id in active_games:
-                del active_games[interaction.channel.id]
-        else:
-            self.game.switch_turn()
-
-            if self.game.current_player == bot.user.id:
-                next_player = bot.user
-            else:
-                next_player = await bot.fetch_user(self.game.current_player)
-
-            await interaction.response.edit_message(
-                content=f"{next_player.mention}, it's your turn!", view=self.view
-            )
-
-            # If it's the bot's turn, make a move
-            if self.game.is_bot_game and self.game.current_player == bot.user.id:
-                await self.game.make_bot_move(interaction)
-
-class RematchButton(discord.ui.Button):
-    def __init__(self, player1, player2, is_bot_game=False):
-        super().__init__(label="Rematch", style=discord.ButtonStyle.primary, emoji="🔄")
+        game.play(self.cell)
+        active_games.touch(game.game_id)
+        content, view = await with_bot_reply(game, interaction, game.end_turn(interaction.user.mention))
+        await edit_game_message(interaction, content=content, view=view)
+
+class RematchButton(discord.ui.DynamicItem[discord.ui.Button], template=r"ttt:rematch:(?P<player1>[0-9]+):(?P<player2>[0-9]+):(?P<settings>\w+)"):
+    def __init__(self, player1, player2, settings):
+        super().__init__(discord.ui.Button(
+            label="Rematch", style=discord.ButtonStyle.primary, emoji="🔄",
+            custom_id=f"ttt:rematch:{player1}:{player2}:{settings}"
+        ))
         self.player1 = player1
         self.player2 = player2
-        self.is_bot_game = is_bot_game
+        self.settings = settings
+        self.is_bot_game = parse_settings(settings)['is_bot_game']
 
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match['player1']), int(match['player2']), match['settings'])
+
+    @timed(INTERACTION_SECONDS, component="rematch")
     async def callback(self, interaction: discord.Interaction):
         # For bot games, only the human player can start rematch
         if self.is_bot_game:
@@ -217,51 +772,115 @@ class RematchButton(discord.ui.Button):
                 await interaction.response.send_message("Only the players can start a rematch!", ephemeral=True)
                 return
 
-        # Start a new game
-        new_game = TicTacToe(self.player1, self.player2, is_bot_game=self.is_bot_game)
-        active_games[interaction.channel.id] = new_game
+        # Both players may click Rematch at once; the first click wins
+        if game_running(interaction.message.id):
+            await interaction.response.send_message("The rematch has already started!", ephemeral=True)
+            return
 
-        if self.is_bot_game:
-            if new_game.current_player == bot.user.id:
-                current_user = bot.user
-            else:
-                current_user = await bot.fetch_user(new_game.current_player)
-            await interaction.response.edit_message(
-                content=f"Rematch started! {current_user.mention}, it's your turn!",
-                view=new_game
-            )
-            # If bot goes first in rematch, make a move
-            if new_game.current_player == bot.user.id:
-                await new_game.make_bot_move(interaction)
-        else:
-            current_user = await bot.fetch_user(new_game.current_player)
-            await interaction.response.edit_message(
-                content=f"Rematch started! {current_user.mention}, it's your turn!",
-                view=new_game
-            )
+        players = [player_id for player_id in (self.player1, self.player2) if player_id != bot.user.id]
+        reason = active_games.check_limits(interaction.channel.id, players)
+        if reason:
+            await interaction.response.send_message(reason, ephemeral=True)
+            return
 
-class TicTacToe(discord.ui.View):
-    def __init__(self, player1, player2, is_bot_game=False):
-        super().__init__(timeout=None)
+        # Start a new game in the same message
+        new_game = create_game(
+            interaction.message.id, interaction.channel.id, self.player1, self.player2, **parse_settings(self.settings)
+        )
+        register_game(new_game)
+
+        status = f"Rematch started! {mention(new_game.current_player)}, it's your turn!"
+        view = new_game.make_view()
+
+        # If bot goes first in rematch, make a move
+        if self.is_bot_game and new_game.current_player == bot.user.id:
+            status, view = await new_game.bot_turn(interaction)
+
+        await edit_game_message(interaction, content=new_game.render(status), view=view)
+
+class TicTacToe:
+    """One classic or N×N game; its buttons are rebuilt by make_view() for every render"""
+
+    __slots__ = (
+        "game_id", "channel_id", "player1", "player2", "current_player", "engine", "moves",
+        "phase", "is_bot_game", "difficulty", "players_used_tttend", "started"
+    )
+
+    def __init__(self, game_id, channel_id, player1, player2, is_bot_game=False, difficulty=DEFAULT_DIFFICULTY, board=CLASSIC):
+        self.game_id = game_id  # the id of the message the game is played in
+        self.channel_id = channel_id
         self.player1 = player1
         self.player2 = player2
         self.current_player = random.choice([player1, player2])
-        self.board = [["" for _ in range(3)] for _ in range(3)]
-        self.game_over = False
+        self.engine = Board(geometry=board)
+        self.moves = bytearray()  # cells in the order they were played, for the game log
+        self.phase = PLAYING
         self.is_bot_game = is_bot_game
+        self.difficulty = difficulty  # only used by the bot
         self.players_used_tttend = set()
-
-        for i in range(3):
-            for j in range(3):
-                self.add_item(TicTacToeButton(i, j, self))
-
-    def disable_all_items(self):
-        """Disable all buttons in this view"""
-        for item in self.children:
-            item.disabled = True
+        self.started = time.time()
+
+    def make_view(self, disabled=False):
+        """Build the board's buttons from the engine"""
+        view = discord.ui.View(timeout=None)
+        size = self.engine.geometry.size
+        for cell in range(self.engine.geometry.cells):
+            side = self.engine.side_at(cell)
+            view.add_item(TicTacToeButton(
+                self.game_id, cell,
+                label=MARKS[side] if side is not None else "⬛",
+                disabled=disabled or side is not None,
+                row=cell // size
+            ))
+        return view
+
+    def settings(self):
+        return settings_code(self.is_bot_game, self.difficulty, self.engine.geometry)
+
+    def rematch_view(self):
+        """The Rematch button, except on tournament matches: a rematch would be played outside the bracket"""
+        view = discord.ui.View(timeout=None)
+        if self.game_id not in tournament_games:
+            view.add_item(RematchButton(self.player1, self.player2, self.settings()))
+        return view
+
+    def pack(self):
+        """Compact snapshot of the game: a short list of ints and a settings code"""
+        return [
+            GAME_CLASSIC, self.channel_id, self.player1, self.player2, self.current_player,
+            self.engine.x, self.engine.o, self.settings(), self.moves.hex(), self.started
+        ]
+
+    @classmethod
+    def unpack(cls, game_id, packed):
+        _, channel_id, player1, player2, current_player, x, o, code, *logged = packed
+        settings = parse_settings(code)
+        game = cls(game_id, channel_id, player1, player2, settings['is_bot_game'], settings['difficulty'], settings['board'])
+        game.current_player = current_player
+        game.engine = Board(x, o, settings['board'])
+        # Snapshots from before the game log have no move list
+        if logged:
+            game.moves = bytearray.fromhex(logged[0])
+            game.started = logged[1]
+        return game
+
+    def log_entry(self, how, winner_id=None):
+        """The game log's record of this game"""
+        geo = self.engine.geometry
+        return {
+            "game": self.game_id, "kind": "classic", "size": geo.size, "win_length": geo.win_length,
+            "bot": self.is_bot_game, "players": [self.player1, self.player2],
+            "first": self.engine.side_at(self.moves[0]) if self.moves else self.current_side(),
+            "moves": self.moves.hex(), "winner": winner_id, "how": how,
+            "started": round(self.started, 3), "ended": round(time.time(), 3)
+        }
 
     def get_current_mention(self):
-        return f"<@{self.current_player}>" if self.current_player != bot.user.id else f"{bot.user.mention} (Bot)"
+        return mention(self.current_player) if self.current_player != bot.user.id else f"{bot.user.mention} (Bot)"
+
+    def current_side(self):
+        """0 if player1 (❌) is to move, 1 for player2 (⭕)"""
+        return 0 if self.current_player == self.player1 else 1
 
     def switch_turn(self):
         if self.current_player == self.player1:
@@ -269,261 +888,455 @@ class TicTacToe(discord.ui.View):
         else:
             self.current_player = self.player1
 
-    def check_winner(self):
-        # Check rows
-        for row in self.board:
-            if row[0] == row[1] == row[2] and row[0] != "":
-                return True
-
-        # Check columns
-        for col in range(3):
-            if self.board[0][col] == self.board[1][col] == self.board[2][col] and self.board[0][col] != "":
-                return True
-
-        # Check diagonals
-        if self.board[0][0] == self.board[1][1] == self.board[2][2] and self.board[0][0] != "":
-            return True
-        if self.board[0][2] == self.board[1][1] == self.board[2][0] and self.board[0][2] != "":
-            return True
+    def play(self, cell):
+        """Place the current player's mark on a cell"""
+        self.engine.play(cell, self.current_side())
+        self.moves.append(cell)
 
-        return False
+    def check_winner(self):
+        # Only the lines through the last move can have just been completed
+        return self.engine.won
 
     def is_draw(self):
-        for row in self.board:
-            for cell in row:
-                if cell == "":
-                    return False
-        return True
-
-    def find_winning_move(self, symbol):
-        """Find a move that would win the game"""
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == "":
-                    # Try this move
-                    self.board[i][j] = symbol
-                    if self.check_winner():
-                        self.board[i][j] = ""  # Undo the move
-                        return (i, j)
-                    self.board[i][j] = ""  # Undo the move
-        return None
+        return self.engine.is_full()
 
-    def find_blocking_move(self, opponent_symbol):
-        """Find a move that would block the opponent from winning"""
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == "":
-                    # Try opponent's move
-                    self.board[i][j] = opponent_symbol
-                    if self.check_winner():
-                        self.board[i][j] = ""  # Undo the move
-                        return (i, j)
-                    self.board[i][j] = ""  # Undo the move
-        return None
+    def render(self, status):
+        """Message content for this game; the buttons show the whole board"""
+        return status
 
-    def get_center_move(self):
-        """Take center if available"""
-        if self.board[1][1] == "":
-            return (1, 1)
-        return None
+    def end_turn(self, mover_mention):
+        """Settle the move just played; returns the message content and view to show"""
+        if self.check_winner():
+            self.phase = OVER
+            winner_id = self.current_player
+            # Before finish_game, while a tournament match is still known as one
+            view = self.rematch_view()
+            finish_game(self, "won", winner_id)
 
-    def get_corner_move(self):
-        """Take a corner if available"""
-        corners = [(0, 0), (0, 2), (2, 0), (2, 2)]
-        available_corners = [corner for corner in corners if self.board[corner[0]][corner[1]] == ""]
-        if available_corners:
-            return random.choice(available_corners)
-        return None
+            # Get random win quote
+            win_quote = random.choice(win_quotes)
+            return f"{mover_mention} wins! 🎉\n*{win_quote}*", view
 
-    def get_random_move(self):
-        """Get any available move"""
-        available_moves = []
-        for i in range(3):
-            for j in range(3):
-                if self.board[i][j] == "":
-                    available_moves.append((i, j))
-        if available_moves:
-            return random.choice(available_moves)
-        return None
+        if self.is_draw():
+            self.phase = OVER
+            view = self.rematch_view()
+            finish_game(self, "drawn")
 
-    async def make_bot_move(self, interaction: discord.Interaction):
-        # Get bot's symbol and human's symbol
-        bot_symbol = "❌" if self.current_player == self.player1 else "⭕"
-        human_symbol = "⭕" if bot_symbol == "❌" else "❌"
-
-        # Always prioritize winning and blocking (these are critical)
-        move = self.find_winning_move(bot_symbol) or self.find_blocking_move(human_symbol)
-        
-        if not move:
-            # Add randomization to make the bot less predictable
-            available_strategies = []
-            
-            # Add center strategy (60% chance to include it)
-            if self.get_center_move() and random.random() < 0.6:
-                available_strategies.append(self.get_center_move())
-            
-            # Add corner strategy (always include if corners available)
-            corner_move = self.get_corner_move()
-            if corner_move:
-                available_strategies.append(corner_move)
-            
-            # Add random moves to the pool (add 2-3 random options)
-            for _ in range(random.randint(2, 3)):
-                random_move = self.get_random_move()
-                if random_move:
-                    available_strategies.append(random_move)
-            
-            # Choose randomly from available strategies
-            if available_strategies:
-                move = random.choice(available_strategies)
-            else:
-                move = self.get_random_move()
-
-        if move:
-            row, col = move
-            button = None
-            for item in self.children:
-                if isinstance(item, TicTacToeButton) and item.row == row and item.col == col:
-                    button = item
-                    break
-
-            if button:
-                mark = "❌" if self.current_player == self.player1 else "⭕"
-                button.label = mark
-                button.disabled = True
-                self.board[row][col] = mark
-
-                if self.check_winner():
-                    self.disable_all_items()
-                    winner_id = self.current_player
-                    loser_id = self.player2 if winner_id == self.player1 else self.player1
-
-                    # Update stats
-                    update_player_stats(winner_id, won=True)
-                    update_player_stats(loser_id, won=False)
-
-                    # Get random win quote
-                    win_quote = random.choice(win_quotes)
-
-                    # Add rematch button
-                    rematch_view = discord.ui.View(timeout=None)
-                    rematch_view.add_item(RematchButton(self.player1, self.player2, self.is_bot_game))
-
-                    await interaction.followup.edit_message(
-                        interaction.message.id,
-                        content=f"{bot.user.mention} wins! 🎉\n*{win_quote}*", view=rematch_view
-                    )
+            # Get random tie quote
+            tie_quote = random.choice(tie_quotes)
+            return f"It's a draw! 🤝\n*{tie_quote}*", view
+
+        self.switch_turn()
+        return f"{mention(self.current_player)}, it's your turn!", self.make_view()
+
+    async def bot_turn(self, interaction: discord.Interaction):
+        """Play the bot's move; returns the content and view for the whole turn, which the caller sends"""
+        self.phase = BOT_THINKING
+        started = time.perf_counter()
+        if self.engine.geometry.is_classic:
+            # One lookup in the solved table, mixed with random moves below "perfect"
+            move = choose_move(self.engine, self.current_side(), self.difficulty)
+        else:
+            geo = self.engine.geometry
+            move = await bot_search(
+                self, interaction, bot.ai_pool, pick_move,
+                geo.size, geo.win_length, self.engine.x, self.engine.o, self.current_side(), self.difficulty
+            )
+            if self.phase == OVER:
+                return "🛑 Game ended.", self.make_view(disabled=True)
+            if move is None:
+                return BOT_FAILED, self.make_view()
+
+        count_bot_move(f"{self.engine.geometry.size}x{self.engine.geometry.size}", started)
+        self.phase = PLAYING
+        self.play(move)
+        active_games.touch(self.game_id)
+        return self.end_turn(bot.user.mention)
+
+class UltimateCellButton(discord.ui.DynamicItem[discord.ui.Button], template=r"uttt:cell:(?P<game_id>[0-9]+):(?P<cell>[0-8])"):
+    def __init__(self, game_id, cell, label="⬛", disabled=False):
+        super().__init__(discord.ui.Button(
+            label=label, style=discord.ButtonStyle.secondary, disabled=disabled, row=cell // 3,
+            custom_id=f"uttt:cell:{game_id}:{cell}"
+        ))
+        self.game_id = game_id
+        self.cell = cell
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match['game_id']), int(match['cell']))
+
+    @timed(INTERACTION_SECONDS, component="ultimate_cell")
+    async def callback(self, interaction: discord.Interaction):
+        game = active_games.get(self.game_id)
+        if not await check_turn(game, interaction):
+            return
 
-                    # Send ephemeral congratulations to winner
-                    #await interaction.followup.send(f"🎉 Congratulations! {win_quote}", ephemeral=True) #Bot doesn't need to be congratulated
-                    self.game_over = True
-                    if interaction.channel.id in active_games:
-                        del active_games[interaction.channel.id]
-                elif self.is_draw():
-                    self.disable_all_items()
+        if game.selected is None:
+            await interaction.response.send_message("Pick a board first!", ephemeral=True)
+            return
 
-                    # Update stats for both players (draw)
-                    update_player_stats(self.player1, draw=True)
-                    update_player_stats(self.player2, draw=True)
+        move = game.selected * 9 + self.cell
+        if not game.state.is_legal(move):
+            await interaction.response.send_message("That space is taken!", ephemeral=True)
+            return
 
-                    # Get random tie quote
-                    tie_quote = random.choice(tie_quotes)
+        await game.play_move(interaction, move)
 
-                    # Add rematch button
-                    rematch_view = discord.ui.View(timeout=None)
-                    rematch_view.add_item(RematchButton(self.player1, self.player2, self.is_bot_game))
+class UltimateBoardSelect(discord.ui.DynamicItem[discord.ui.Select], template=r"uttt:board:(?P<game_id>[0-9]+)"):
+    def __init__(self, game_id, options=None):
+        super().__init__(discord.ui.Select(
+            placeholder="Pick a board to play in", options=options or [discord.SelectOption(label="-")],
+            row=3, custom_id=f"uttt:board:{game_id}"
+        ))
+        self.game_id = game_id
 
-                    await interaction.followup.edit_message(
-                        interaction.message.id,
-                        content=f"It's a draw! 🤝\n*{tie_quote}*", view=rematch_view
-                    )
-                    self.game_over = True
-                    if interaction.channel.id in active_games:
-                        del active_games[interaction.channel.id]
-                else:
-                    self.switch_turn()
-                    if self.current_player == bot.user.id:
-                        next_player = bot.user
-                    else:
-                        next_player = await bot.fetch_user(self.current_player)
-                    await interaction.followup.edit_message(
-                        interaction.message.id,
-                        content=f"{next_player.mention}, it's your turn!", view=self
-                    )
-class ChallengeView(discord.ui.View):
-    def __init__(self, challenger, opponent, is_bot_game=False):
-        super().__init__(timeout=60)
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Select, match):
+        return cls(int(match['game_id']))
+
+    @timed(INTERACTION_SECONDS, component="ultimate_board")
+    async def callback(self, interaction: discord.Interaction):
+        game = active_games.get(self.game_id)
+        if not await check_turn(game, interaction):
+            return
+
+        board = int(self.item.values[0])
+        if board not in game.state.open_boards():
+            await interaction.response.send_message("You can't play in that board!", ephemeral=True)
+            return
+
+        game.selected = board
+        await edit_game_message(
+            interaction, content=game.render(f"{mention(game.current_player)}, it's your turn!"), view=game.make_view()
+        )
+
+async def check_turn(game, interaction):
+    """Reject clicks that aren't a legal turn; True if the click may proceed"""
+    # Handlers change the phase before their first await, so a racing click sees it here
+    if game is None or game.phase == OVER:
+        await interaction.response.send_message("Game is already over!", ephemeral=True)
+        return False
+    if interaction.user.id not in [game.player1, game.player2]:
+        await interaction.response.send_message("This isn't your game!", ephemeral=True)
+        return False
+    # Check if user has used !tttend (makes board unclickable for them)
+    if interaction.user.id in game.players_used_tttend:
+        await interaction.response.send_message("You ended this game and cannot play on it anymore!", ephemeral=True)
+        return False
+    # The bot may still be thinking about a big board
+    if game.phase == BOT_THINKING:
+        await interaction.response.send_message("It's the bot's turn!", ephemeral=True)
+        return False
+    if game.current_player == bot.user.id:
+        # The bot's turn, but it isn't thinking: the bot restarted mid-turn
+        status, view = await game.bot_turn(interaction)
+        await edit_game_message(interaction, content=game.render(status), view=view)
+        return False
+    if interaction.user.id != game.current_player:
+        await interaction.response.send_message("Not your turn!", ephemeral=True)
+        return False
+    return True
+
+class UltimateTicTacToe:
+    """Ultimate Tic Tac Toe: the 9×9 board is drawn in the message, the buttons show one small board"""
+
+    __slots__ = (
+        "game_id", "channel_id", "player1", "player2", "current_player", "first_player",
+        "state", "moves", "selected", "phase", "is_bot_game", "players_used_tttend", "started"
+    )
+
+    def __init__(self, game_id, channel_id, player1, player2, is_bot_game=False):
+        self.game_id = game_id  # the id of the message the game is played in
+        self.channel_id = channel_id
+        self.player1 = player1
+        self.player2 = player2
+        self.current_player = random.choice([player1, player2])
+        # Whoever moves first plays ❌
+        self.first_player = self.current_player
+        self.state = UltimateState()
+        self.moves = bytearray()
+        self.selected = None  # the small board shown on the buttons
+        self.phase = PLAYING
+        self.is_bot_game = is_bot_game
+        self.players_used_tttend = set()
+        self.started = time.time()
+
+    @property
+    def sides(self):
+        """(❌ player, ⭕ player)"""
+        return self.first_player, self.player2 if self.first_player == self.player1 else self.player1
+
+    def pack(self):
+        """Compact snapshot of the game: the move list is enough to rebuild the board"""
+        return [
+            GAME_ULTIMATE, self.channel_id, self.player1, self.player2, self.current_player,
+            self.first_player, self.moves.hex(), settings_code(self.is_bot_game, ultimate=True), self.started
+        ]
+
+    @classmethod
+    def unpack(cls, game_id, packed):
+        _, channel_id, player1, player2, current_player, first_player, moves, code, *logged = packed
+        game = cls(game_id, channel_id, player1, player2, parse_settings(code)['is_bot_game'])
+        game.current_player = current_player
+        game.first_player = first_player
+        game.moves = bytearray.fromhex(moves)
+        game.state = replay_ultimate(game.moves)
+        if game.state.forced != FREE:
+            game.selected = game.state.forced
+        if logged:
+            game.started = logged[0]
+        return game
+
+    def log_entry(self, how, winner_id=None):
+        """The game log's record of this game; ❌ always moves first"""
+        return {
+            "game": self.game_id, "kind": "ultimate", "bot": self.is_bot_game,
+            "players": list(self.sides), "first": 0, "moves": self.moves.hex(), "winner": winner_id,
+            "how": how, "started": round(self.started, 3), "ended": round(time.time(), 3)
+        }
+
+    def switch_turn(self):
+        if self.current_player == self.player1:
+            self.current_player = self.player2
+        else:
+            self.current_player = self.player1
+
+    def rematch_view(self):
+        view = discord.ui.View(timeout=None)
+        view.add_item(RematchButton(self.player1, self.player2, settings_code(self.is_bot_game, ultimate=True)))
+        return view
+
+    def make_view(self, disabled=False):
+        """Build the components for the small board that's being played"""
+        view = discord.ui.View(timeout=None)
+        for cell in range(9):
+            label, taken = "⬛", False
+            if self.selected is not None:
+                side = self.state.side_at(self.selected * 9 + cell)
+                if side is not None:
+                    label, taken = MARKS[side], True
+            view.add_item(UltimateCellButton(
+                self.game_id, cell, label=label, disabled=disabled or taken or self.selected is None
+            ))
+
+        if self.state.forced == FREE and not self.state.over and not disabled:
+            options = [
+                discord.SelectOption(label=ULTIMATE_BOARD_NAMES[board], value=str(board), default=board == self.selected)
+                for board in self.state.open_boards()
+            ]
+            view.add_item(UltimateBoardSelect(self.game_id, options))
+        return view
+
+    def render(self, status):
+        """Message content: the status line above the whole 9×9 board"""
+        playable = set(self.state.open_boards())
+        lines = [status, ""]
+        for big_row in range(3):
+            for small_row in range(3):
+                blocks = []
+                for big_col in range(3):
+                    board = big_row * 3 + big_col
+                    winner = self.state.board_winner(board)
+                    cells = ""
+                    for small_col in range(3):
+                        side = self.state.side_at(board * 9 + small_row * 3 + small_col)
+                        if winner is not None:
+                            cells += MARKS[winner]
+                        elif side is not None:
+                            cells += MARKS[side]
+                        else:
+                            cells += "⬜" if board in playable else "⬛"
+                    blocks.append(cells)
+                lines.append(" ".join(blocks))
+            lines.append("")
+
+        if self.selected is not None and not self.state.over:
+            lines.append(f"Playing in: **{ULTIMATE_BOARD_NAMES[self.selected]}**")
+        return "\n".join(lines)
+
+    def apply(self, move):
+        self.state.play(move)
+        self.moves.append(move)
+        # Forced into a board, or free to pick one
+        self.selected = None if self.state.forced == FREE else self.state.forced
+        active_games.touch(self.game_id)
+
+    async def play_move(self, interaction, move):
+        self.apply(move)
+        status, view = await with_bot_reply(self, interaction, self.end_turn())
+        await edit_game_message(interaction, content=self.render(status), view=view)
+
+    def end_turn(self, note=""):
+        """Settle the move just played; returns the status line and view to show"""
+        if not self.state.over:
+            self.switch_turn()
+            return f"{mention(self.current_player)}, it's your turn!{note}", self.make_view()
+
+        winner_side = self.state.winner
+        winner_id = self.sides[winner_side] if winner_side is not None else None
+        self.phase = OVER
+        finish_game(self, "drawn" if winner_id is None else "won", winner_id)
+        if self.is_bot_game:
+            bot.mcts_pool(self.game_id).submit(ultimate_forget, self.game_id)
+
+        if winner_id is not None:
+            status = f"{mention(winner_id)} wins Ultimate Tic Tac Toe! 🎉\n*{random.choice(win_quotes)}*"
+        else:
+            status = f"It's a draw! 🤝\n*{random.choice(tie_quotes)}*"
+        return status, self.rematch_view()
+
+    async def bot_turn(self, interaction: discord.Interaction):
+        """Play the bot's move; returns the status line and view for the whole turn"""
+        self.phase = BOT_THINKING
+        started = time.perf_counter()
+        # Monte Carlo search in a worker that keeps this game's tree between turns
+        found = await bot_search(
+            self, interaction, bot.mcts_pool(self.game_id), ultimate_move, self.game_id, tuple(self.moves), ULTIMATE_BOT_BUDGET
+        )
+        if self.phase == OVER:
+            return "🛑 Game ended.", self.make_view(disabled=True)
+        if found is None:
+            return BOT_FAILED, self.make_view()
+        move, playouts = found
+
+        count_bot_move("ultimate", started)
+        self.phase = PLAYING
+        self.apply(move)
+        return self.end_turn(f" (bot ran {playouts} playouts)")
+
+GAME_CLASSIC, GAME_ULTIMATE = 0, 1
+GAME_KINDS = {GAME_CLASSIC: TicTacToe, GAME_ULTIMATE: UltimateTicTacToe}
+
+def create_game(game_id, channel_id, player1, player2, is_bot_game=False, difficulty=DEFAULT_DIFFICULTY, board=CLASSIC, ultimate=False):
+    """Create a new game with the given settings"""
+    if ultimate:
+        return UltimateTicTacToe(game_id, channel_id, player1, player2, is_bot_game=is_bot_game)
+    return TicTacToe(game_id, channel_id, player1, player2, is_bot_game=is_bot_game, difficulty=difficulty, board=board)
+
+class ChallengeButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"ttt:challenge:(?P<action>accept|decline):(?P<challenger>[0-9]+):(?P<opponent>[0-9]+):(?P<settings>\w+):(?P<expires>[0-9]+)"
+):
+    def __init__(self, action, challenger, opponent, settings, expires, disabled=False):
+        accept = action == "accept"
+        super().__init__(discord.ui.Button(
+            label="Accept" if accept else "Decline",
+            style=discord.ButtonStyle.green if accept else discord.ButtonStyle.red,
+            emoji="✅" if accept else "❌",
+            disabled=disabled,
+            custom_id=f"ttt:challenge:{action}:{challenger}:{opponent}:{settings}:{expires}"
+        ))
+        self.action = action
         self.challenger = challenger
         self.opponent = opponent
-        self.is_bot_game = is_bot_game
+        self.settings = settings
+        self.expires = expires
+        self.is_bot_game = parse_settings(settings)['is_bot_game']
 
-    def disable_buttons(self):
-        """Disable all buttons in this view"""
-        for item in self.children:
-            item.disabled = True
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match['action'], int(match['challenger']), int(match['opponent']), match['settings'], int(match['expires']))
 
-    @discord.ui.button(label="Accept", style=discord.ButtonStyle.green, emoji="✅")
-    async def accept(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.opponent.id and not self.is_bot_game:
+    def disabled_view(self):
+        return ChallengeView(self.challenger, self.opponent, self.settings, expires=self.expires, disabled=True)
+
+    @timed(INTERACTION_SECONDS, component="challenge")
+    async def callback(self, interaction: discord.Interaction):
+        if interaction.user.id != self.opponent and not self.is_bot_game:
             await interaction.response.send_message("This challenge is not for you!", ephemeral=True)
             return
 
-        if self.is_bot_game and interaction.user.id != self.challenger.id:
+        if self.is_bot_game and interaction.user.id != self.challenger:
             await interaction.response.send_message("This challenge is not for you!", ephemeral=True)
             return
 
-        self.disable_buttons()
-        game = TicTacToe(self.challenger.id, self.opponent.id, is_bot_game=self.is_bot_game)
-        active_games[interaction.channel.id] = game
+        if time.time() > self.expires:
+            await interaction.response.edit_message(view=self.disabled_view())
+            return
 
-        if game.current_player == bot.user.id:
-            next_player = bot.user
+        if self.action == "accept":
+            await self.accept(interaction)
         else:
-            next_player = await bot.fetch_user(game.current_player)
+            await self.decline(interaction)
+
+    async def accept(self, interaction: discord.Interaction):
+        if game_running(interaction.message.id):
+            await interaction.response.send_message("This game has already started!", ephemeral=True)
+            return
+
+        players = [self.challenger] if self.is_bot_game else [self.challenger, self.opponent]
+        reason = active_games.check_limits(interaction.channel.id, players)
+        if reason:
+            await interaction.response.send_message(reason, ephemeral=True)
+            return
 
-        await interaction.response.edit_message(
-            content=f"Game started! {next_player.mention}, it's your turn!", 
-            view=game
+        game = create_game(
+            interaction.message.id, interaction.channel.id, self.challenger, self.opponent, **parse_settings(self.settings)
         )
+        register_game(game)
+
+        status = f"Game started! {mention(game.current_player)}, it's your turn!"
+        view = game.make_view()
 
         #If bot goes first make the first move
         if self.is_bot_game and game.current_player == bot.user.id:
-            await game.make_bot_move(interaction)
+            status, view = await game.bot_turn(interaction)
 
-    @discord.ui.button(label="Decline", style=discord.ButtonStyle.red, emoji="❌")
-    async def decline(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.opponent.id and not self.is_bot_game:
-            await interaction.response.send_message("This challenge is not for you!", ephemeral=True)
-            return
-
-        if self.is_bot_game and interaction.user.id != self.challenger.id:
-            await interaction.response.send_message("This challenge is not for you!", ephemeral=True)
-            return
+        await edit_game_message(interaction, content=game.render(status), view=view)
 
-        self.disable_buttons()
+    async def decline(self, interaction: discord.Interaction):
         if not self.is_bot_game:
             await interaction.response.edit_message(
-                content=f"{self.opponent.mention} declined the challenge.", 
-                view=self
+                content=f"{mention(self.opponent)} declined the challenge.",
+                view=self.disabled_view()
             )
         else:
             await interaction.response.edit_message(
-                content=f"{self.challenger.mention} declined to play against the bot.",
-                view = self
+                content=f"{mention(self.challenger)} declined to play against the bot.",
+                view=self.disabled_view()
             )
 
-    async def on_timeout(self):
-        self.disable_buttons()
-        # Note: The message won't auto-update on timeout, but buttons will be disabled
+class ChallengeView(discord.ui.View):
+    """Accept/Decline buttons; everything they need is in their custom ids, including when the challenge expires"""
+
+    def __init__(self, challenger, opponent, settings, expires=None, disabled=False):
+        super().__init__(timeout=None)
+        if expires is None:
+            expires = int(time.time()) + CHALLENGE_TIMEOUT
+        for action in ("accept", "decline"):
+            self.add_item(ChallengeButton(action, challenger, opponent, settings, expires, disabled=disabled))
 
 @bot.event
 async def on_ready():
     print(f'{bot.user} has connected to Discord!')
 
+def parse_board(size, win_length):
+    """Return the board geometry for command arguments, or None if they're invalid"""
+    if win_length is None:
+        win_length = min(size, 4)
+    try:
+        return geometry(size, win_length)
+    except ValueError:
+        return None
+
+def describe_board(board):
+    """Short description of a non-classic board for challenge messages"""
+    if board.is_classic:
+        return ""
+    return f" ({board.size}×{board.size}, {board.win_length} in a row)"
+
+BOARD_USAGE = f"Board size is {MIN_SIZE}-{MAX_SIZE} and win length is {MIN_SIZE} up to the board size."
+
 @bot.command(name="ttt")
-async def tic_tac_toe(ctx, opponent: discord.Member = None):
+async def tic_tac_toe(ctx, opponent: discord.Member = None, size: int = 3, win_length: int = None):
     if opponent is None:
-        await ctx.send("Please mention a user to challenge! Usage: `!ttt @username`")
+        await ctx.send("Please mention a user to challenge! Usage: `!ttt @username [size] [win length]`")
+        return
+
+    board = parse_board(size, win_length)
+    if board is None:
+        await ctx.send(BOARD_USAGE)
         return
 
     if opponent.bot:
@@ -534,45 +1347,84 @@ async def tic_tac_toe(ctx, opponent: discord.Member = None):
         await ctx.send("You can't challenge yourself!")
         return
 
-    if ctx.channel.id in active_games:
-        await ctx.send("There's already a game running in this channel!")
+    reason = active_games.check_limits(ctx.channel.id, [ctx.author.id, opponent.id])
+    if reason:
+        await ctx.send(reason)
         return
 
-    view = ChallengeView(ctx.author, opponent)
+    view = ChallengeView(ctx.author.id, opponent.id, settings_code(board=board))
     await ctx.send(
-        f"{opponent.mention}, you've been challenged to a game of Tic Tac Toe by {ctx.author.mention}!",
+        f"{opponent.mention}, you've been challenged to a game of Tic Tac Toe{describe_board(board)} by {ctx.author.mention}!",
         view=view
     )
 
 @bot.command(name="tttbot")
-async def tic_tac_toe_bot(ctx):
+async def tic_tac_toe_bot(ctx, difficulty: str = DEFAULT_DIFFICULTY, size: int = 3, win_length: int = None):
     """Challenge the bot to a game of Tic Tac Toe"""
-    if ctx.channel.id in active_games:
-        await ctx.send("There's already a game running in this channel!")
+    difficulty = difficulty.lower()
+    if difficulty not in DIFFICULTIES:
+        await ctx.send(f"Unknown difficulty! Usage: `!tttbot [{'|'.join(DIFFICULTIES)}] [size] [win length]`")
+        return
+
+    board = parse_board(size, win_length)
+    if board is None:
+        await ctx.send(BOARD_USAGE)
         return
 
-    view = ChallengeView(ctx.author, bot.user, is_bot_game=True)
+    reason = active_games.check_limits(ctx.channel.id, [ctx.author.id])
+    if reason:
+        await ctx.send(reason)
+        return
+
+    view = ChallengeView(ctx.author.id, bot.user.id, settings_code(True, difficulty, board))
     await ctx.send(
-        f"{ctx.author.mention}, you've challenged the bot to a game of Tic Tac Toe!",
+        f"{ctx.author.mention}, you've challenged the bot to a game of Tic Tac Toe{describe_board(board)} on **{difficulty}**!",
         view=view
     )
 
+@bot.command(name="tttultimate")
+async def ultimate_tic_tac_toe(ctx, opponent: discord.Member = None):
+    """Challenge a user, or the bot if nobody is mentioned, to Ultimate Tic Tac Toe"""
+    if opponent is not None:
+        if opponent.bot:
+            await ctx.send("You can't challenge a bot! Leave out the mention to play against me.")
+            return
+
+        if opponent.id == ctx.author.id:
+            await ctx.send("You can't challenge yourself!")
+            return
+
+    players = [ctx.author.id] if opponent is None else [ctx.author.id, opponent.id]
+    reason = active_games.check_limits(ctx.channel.id, players)
+    if reason:
+        await ctx.send(reason)
+        return
+
+    if opponent is None:
+        view = ChallengeView(ctx.author.id, bot.user.id, settings_code(True, ultimate=True))
+        await ctx.send(
+            f"{ctx.author.mention}, you've challenged the bot to a game of Ultimate Tic Tac Toe!",
+            view=view
+        )
+    else:
+        view = ChallengeView(ctx.author.id, opponent.id, settings_code(ultimate=True))
+        await ctx.send(
+            f"{opponent.mention}, you've been challenged to a game of Ultimate Tic Tac Toe by {ctx.author.mention}!",
+            view=view
+        )
+
 @bot.command(name="tttstats")
 async def player_stats(ctx, player: discord.Member = None):
     """Show statistics for a player"""
     if player is None:
         player = ctx.author
 
-    stats = load_stats()
-    player_id = str(player.id)
+    player_stats = stats_store.get(player.id)
 
-    if player_id not in stats:
+    if player_stats is None:
         await ctx.send(f"{player.display_name} hasn't played any games yet!")
         return
 
-    player_stats = stats[player_id]
-    win_rate = get_win_rate(player_stats)
-
     embed = discord.Embed(
         title=f"📊 {player.display_name}'s Tic Tac Toe Stats",
         color=discord.Color.blue()
@@ -582,7 +1434,19 @@ async def player_stats(ctx, player: discord.Member = None):
     embed.add_field(name="🏆 Wins", value=player_stats['wins'], inline=True)
     embed.add_field(name="💔 Losses", value=player_stats['losses'], inline=True)
     embed.add_field(name="🤝 Draws", value=player_stats['draws'], inline=True)
-    embed.add_field(name="📈 Win Rate", value=f"{win_rate:.1f}%", inline=True)
+    embed.add_field(name="📈 Win Rate", value=f"{win_rate(player_stats):.1f}%", inline=True)
+
+    # O(log n) in the store's rank index, however many players there are
+    rank = stats_store.rank(player.id)
+    rating = f"{player_stats.get('rating', INITIAL_RATING):.0f}"
+    if rank is not None:
+        rating += f" (#{rank[0]:,} of {rank[1]:,})"
+    embed.add_field(name="⭐ Rating", value=rating, inline=True)
+
+    # At most a month of day buckets to add up, however long they've played
+    for period in PERIODS:
+        wins, losses, draws = period_totals(player_stats.get('days', []), period)
+        embed.add_field(name=f"📅 {PERIOD_NAMES[period]}", value=f"{wins}W {losses}L {draws}D", inline=True)
 
     if player_stats['last_played']:
         last_played = datetime.fromisoformat(player_stats['last_played'])
@@ -592,86 +1456,396 @@ async def player_stats(ctx, player: discord.Member = None):
 
     await ctx.send(embed=embed)
 
+MEDALS = {1: "🥇", 2: "🥈", 3: "🥉"}
+
+def leaderboard_size(board):
+    return len(stats_store.ranks) if board == "all" else stats_store.periods.count(board)
+
+def leaderboard_rank(board, player_id):
+    """1-based position on a leaderboard, or None if the player isn't on it"""
+    if board == "all":
+        rank = stats_store.rank(player_id)
+        return None if rank is None else rank[0]
+    return stats_store.periods.rank(board, str(player_id))
+
+async def render_leaderboard_page(board, page):
+    """(embed without the footer, whether it may be cached) for one page of a leaderboard"""
+    offset = page * PAGE_SIZE
+    settled = True
+    # A slice of the store's rating index or period board, not a sort over every player
+    if board == "all":
+        # Checked before the read: rows still queued for the writer would go stale in the cache
+        settled = stats_store.settled(player_id for player_id, _ in stats_store.ranks.top(PAGE_SIZE, offset))
+        rows = [
+            (player_id, player_stats['wins'], player_stats['losses'], player_stats['draws'],
+             f"**{stats_store.ranks.get(player_id):.0f}** rating • ")
+            for player_id, player_stats in stats_store.top(PAGE_SIZE, offset)
+        ]
+        title, description = "🏆 Tic Tac Toe Leaderboard", "Top players ranked by Elo rating"
+    else:
+        rows = [
+            (player_id, wins, losses, draws, "")
+            for player_id, (wins, losses, draws) in stats_store.periods.top(board, PAGE_SIZE, offset)
+        ]
+        title = f"🏆 Tic Tac Toe Leaderboard: {PERIOD_NAMES[board]}"
+        description = f"Most wins {PERIOD_NAMES[board].lower()}, then fewest losses"
+    # Only the rows being shown need names
+    names = await resolve_display_names(bot, [int(row[0]) for row in rows], display_names)
+
+    embed = discord.Embed(title=title, description=description, color=discord.Color.gold())
+    for position, (player_id, wins, losses, draws, rating) in enumerate(rows, offset + 1):
+        games = wins + losses + draws
+        embed.add_field(
+            name=f"{MEDALS.get(position, f'{position}.')} {names[int(player_id)]}",
+            value=f"{rating}**{wins}** wins • **{wins / games * 100:.1f}%** win rate • **{games}** games",
+            inline=False
+        )
+    return embed, settled
+
+async def leaderboard_page(board, page):
+    """(embed, view) for a 0-based page of a leaderboard, clamped to the pages there are"""
+    total = leaderboard_size(board)
+    last = page_count(total) - 1
+    page = min(max(page, 0), last)
+
+    pages = leaderboard_pages[board]
+    embed = pages.get(page)
+    LEADERBOARD_PAGES.inc(board=board, cache="miss" if embed is None else "hit")
+    if embed is None:
+        generation = pages.generation
+        embed, settled = await render_leaderboard_page(board, page)
+        if settled:
+            pages.put(page, embed, generation)
+
+    # The footer depends on how many players there are, so it goes on a copy
+    embed = embed.copy()
+    embed.set_footer(text=f"Page {page + 1:,} of {last + 1:,} • {total:,} ranked players")
+    return embed, LeaderboardView(board, page, last)
+
+class LeaderboardButton(
+    discord.ui.DynamicItem[discord.ui.Button],
+    template=r"ttt:lb:(?P<board>all|day|week|month):(?P<action>prev|next|me):(?P<page>[0-9]+)"
+):
+    """Previous/next page, or the page with whoever clicked; the board and page shown are in the custom id"""
+
+    def __init__(self, board, action, page, disabled=False):
+        label, emoji = {"prev": ("Previous", "◀️"), "next": ("Next", "▶️"), "me": ("My rank", "📍")}[action]
+        super().__init__(discord.ui.Button(
+            label=label, emoji=emoji, disabled=disabled,
+            style=discord.ButtonStyle.primary if action == "me" else discord.ButtonStyle.secondary,
+            custom_id=f"ttt:lb:{board}:{action}:{page}"
+        ))
+        self.board = board
+        self.action = action
+        self.page = page
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match['board'], match['action'], int(match['page']))
+
+    @timed(INTERACTION_SECONDS, component="leaderboard")
+    async def callback(self, interaction: discord.Interaction):
+        if self.action == "me":
+            position = leaderboard_rank(self.board, interaction.user.id)
+            if position is None:
+                await interaction.response.send_message("You're not on this leaderboard yet!", ephemeral=True)
+                return
+            page = page_of(position)
+        else:
+            page = self.page + (1 if self.action == "next" else -1)
+
+        embed, view = await leaderboard_page(self.board, page)
+        await interaction.response.edit_message(embed=embed, view=view)
+
+class LeaderboardView(discord.ui.View):
+    def __init__(self, board, page, last_page):
+        super().__init__(timeout=None)
+        self.add_item(LeaderboardButton(board, "prev", page, disabled=page <= 0))
+        self.add_item(LeaderboardButton(board, "next", page, disabled=page >= last_page))
+        self.add_item(LeaderboardButton(board, "me", page))
+
+LEADERBOARD_USAGE = "Usage: `!tttleaderboard [day|week|month] [page|me]`"
+
 @bot.command(name="tttleaderboard")
-async def leaderboard(ctx):
-    """Show the top players leaderboard"""
-    stats = load_stats()
+async def leaderboard(ctx, *options: str):
+    """Show a page of the all-time, daily, weekly or monthly leaderboard; `me` for the page you're on"""
+    board, page = "all", "1"
+    for option in (option.lower() for option in options):
+        if option in PERIOD_ALIASES:
+            board = PERIOD_ALIASES[option]
+        elif option == "me" or option.isdigit():
+            page = option
+        else:
+            await ctx.send(LEADERBOARD_USAGE)
+            return
 
-    if not stats:
-        await ctx.send("No games have been played yet!")
+    if not leaderboard_size(board):
+        when = "" if board == "all" else f" {PERIOD_NAMES[board].lower()}"
+        await ctx.send(f"No games have been played{when} yet!")
         return
 
-    # Filter players with at least 1 game and sort by wins, then by win rate
-    player_list = []
-    for player_id, player_stats in stats.items():
-        if player_stats['games_played'] > 0:
-            try:
-                user = await bot.fetch_user(int(player_id))
-                win_rate = get_win_rate(player_stats)
-                player_list.append({
-                    'name': user.display_name,
-                    'wins': player_stats['wins'],
-                    'games': player_stats['games_played'],
-                    'win_rate': win_rate
-                })
-            except:
-                # Skip if user not found
-                continue
-
-    # Sort by wins (descending), then by win rate (descending)
-    player_list.sort(key=lambda x: (x['wins'], x['win_rate']), reverse=True)
+    if page == "me":
+        position = leaderboard_rank(board, ctx.author.id)
+        if position is None:
+            await ctx.send(f"{ctx.author.display_name} isn't on this leaderboard yet!")
+            return
+        number = page_of(position)
+    else:
+        number = int(page) - 1
+
+    embed, view = await leaderboard_page(board, number)
+    await ctx.send(embed=embed, view=view)
+
+@bot.command(name="tttvs")
+async def versus(ctx, opponent: discord.Member, player: discord.Member = None):
+    """Show the head-to-head record between you (or `player`) and `opponent`"""
+    if player is None:
+        player = ctx.author
+    if opponent.id == player.id:
+        await ctx.send("Pick someone other than yourself!")
+        return
+
+    # One lookup in the pairwise index, however many games either has played
+    wins, losses, draws = stats_store.head_to_head(player.id, opponent.id)
+    games = wins + losses + draws
+    if not games:
+        await ctx.send(f"{player.display_name} and {opponent.display_name} haven't played each other yet!")
+        return
 
     embed = discord.Embed(
-        title="🏆 Tic Tac Toe Leaderboard",
-        description="Top players ranked by wins and win rate",
-        color=discord.Color.gold()
+        title=f"⚔️ {player.display_name} vs {opponent.display_name}",
+        color=discord.Color.purple()
     )
+    embed.add_field(name="🎮 Games", value=games, inline=True)
+    embed.add_field(name=f"🏆 {player.display_name}'s Wins", value=wins, inline=True)
+    embed.add_field(name=f"🏆 {opponent.display_name}'s Wins", value=losses, inline=True)
+    embed.add_field(name="🤝 Draws", value=draws, inline=True)
 
-    # Show top 10 players
-    for i, player in enumerate(player_list[:10], 1):
-        medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
+    chance = expected_score(stats_store.ranks.get(str(player.id)), stats_store.ranks.get(str(opponent.id)))
+    embed.add_field(
+        name="🔮 Next game",
+        value=f"Ratings give {player.display_name} a {chance:.0%} expected score",
+        inline=False
+    )
 
-        embed.add_field(
-            name=f"{medal} {player['name']}",
-            value=f"**{player['wins']}** wins • **{player['win_rate']:.1f}%** win rate • **{player['games']}** games",
-            inline=False
+    await ctx.send(embed=embed)
+
+@versus.error
+async def versus_error(ctx, error):
+    if isinstance(error, (commands.MissingRequiredArgument, commands.BadArgument)):
+        await ctx.send("Usage: `!tttvs @opponent [@player]`")
+    else:
+        raise error
+
+@bot.command(name="tttqueue")
+async def join_queue(ctx, action: str = "join"):
+    """Join the matchmaking queue, see how it's going, or `leave` it"""
+    action = action.lower()
+    entry = match_queue.get(ctx.author.id)
+
+    if action == "leave":
+        if match_queue.leave(ctx.author.id) is None:
+            await ctx.send("You're not in the queue.")
+            return
+        QUEUE_WAIT_SECONDS.observe(time.monotonic() - entry.joined, outcome="left")
+        await ctx.send(f"{ctx.author.display_name} left the queue.")
+        return
+
+    if action != "join":
+        await ctx.send("Usage: `!tttqueue` to find a game, `!tttqueue leave` to stop looking")
+        return
+
+    if entry is not None:
+        waited = time.monotonic() - entry.joined
+        await ctx.send(
+            f"You've been in the queue for {waited:.0f}s with {len(match_queue) - 1} others; "
+            f"looking for opponents within {match_queue.tolerance(entry):.0f} rating of your {entry.rating:.0f}."
         )
+        return
 
-    if not player_list:
-        embed.description = "No players found!"
+    # A full channel only means waiting a little longer for a table
+    reason = active_games.check_limits(None, [ctx.author.id])
+    if reason:
+        await ctx.send(reason)
+        return
 
-    await ctx.send(embed=embed)
+    rating = stats_store.ranks.get(str(ctx.author.id))
+    pair = match_queue.join(ctx.author.id, rating, ctx.channel.id, allowed=reserve_table)
+    if pair is not None:
+        start_queued_games([pair])
+        opponent = pair[0]
+        where = f" in <#{queue_channel(opponent)}>" if queue_channel(opponent) != ctx.channel.id else ""
+        await ctx.send(
+            f"⚔️ {ctx.author.display_name} joined the queue and was matched straight away "
+            f"(rating {rating:.0f} vs {opponent.rating:.0f}). The board is coming up{where}!"
+        )
+        return
 
-@bot.command(name="tttend")
-async def end_game(ctx):
-    """Force-end the current game in this channel"""
-    if ctx.channel.id not in active_games:
-        await ctx.send("There's no active game in this channel to end.")
+    queue_wakeup.set()
+    where = f" in <#{QUEUE_CHANNEL_ID}>" if QUEUE_CHANNEL_ID else ""
+    await ctx.send(
+        f"🔎 {ctx.author.display_name} is looking for a game (rating {rating:.0f}); "
+        f"{len(match_queue) - 1} others waiting. You'll be pinged{where} when a match is found, "
+        f"or after {match_queue.timeout / 60:g} minutes without one."
+    )
+
+class TournamentButton(
+    discord.ui.DynamicItem[discord.ui.Button], template=r"ttt:tour:(?P<action>join|leave):(?P<tournament_id>[0-9]+)"
+):
+    """Join or leave the tournament a sign-up message announced"""
+
+    def __init__(self, tournament_id, action):
+        super().__init__(discord.ui.Button(
+            label="Join" if action == "join" else "Leave",
+            style=discord.ButtonStyle.success if action == "join" else discord.ButtonStyle.secondary,
+            custom_id=f"ttt:tour:{action}:{tournament_id}"
+        ))
+        self.tournament_id = tournament_id
+        self.action = action
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match['tournament_id']), match['action'])
+
+    @timed(INTERACTION_SECONDS, component="tournament")
+    async def callback(self, interaction: discord.Interaction):
+        t = tournaments.get(interaction.channel.id)
+        if t is None or t.tournament_id != self.tournament_id:
+            await interaction.response.send_message("This tournament is over.", ephemeral=True)
+            return
+        # Only the player hears back; hundreds of sign-ups shouldn't flood the channel
+        await interaction.response.send_message(enter_tournament(t, interaction.user, self.action), ephemeral=True)
+
+class TournamentView(discord.ui.View):
+    def __init__(self, t):
+        super().__init__(timeout=None)
+        self.add_item(TournamentButton(t.tournament_id, "join"))
+        self.add_item(TournamentButton(t.tournament_id, "leave"))
+
+TOURNAMENT_USAGE = (
+    "Usage: `!ttttournament create [swiss|elimination] [rounds]`, then "
+    "`!ttttournament join|leave|start|status|cancel`"
+)
+
+@bot.command(name="ttttournament")
+async def tournament(ctx, action: str = "status", *options: str):
+    """Run a Swiss or single-elimination tournament in this channel"""
+    action = action.lower()
+    t = tournaments.get(ctx.channel.id)
+
+    if action == "create":
+        if t is not None:
+            await ctx.send("There's already a tournament in this channel! See `!ttttournament status`.")
+            return
+        format, rounds = SWISS, None
+        for option in (option.lower() for option in options):
+            if option in FORMATS:
+                format = option
+            elif option.isdigit() and int(option) > 0:
+                rounds = int(option)
+            else:
+                await ctx.send(TOURNAMENT_USAGE)
+                return
+        t = tournaments[ctx.channel.id] = Tournament(ctx.message.id, ctx.channel.id, ctx.author.id, format, rounds)
+        if format == ELIMINATION:
+            length = "single elimination"
+        else:
+            length = plural(rounds, 'round') if rounds else "rounds to suit the field"
+        article = "an" if format[0] in "aeiou" else "a"
+        await ctx.send(
+            f"🏆 {ctx.author.display_name} is running {article} {format} tournament ({length})! "
+            f"Join with the button or `!ttttournament join`; the host starts it with `!ttttournament start`.",
+            view=TournamentView(t)
+        )
+        return
+
+    if t is None:
+        await ctx.send("There's no tournament in this channel. " + TOURNAMENT_USAGE)
         return
 
-    game = active_games[ctx.channel.id]
+    if action in ("join", "leave"):
+        await ctx.send(enter_tournament(t, ctx.author, action))
+    elif action in ("start", "cancel"):
+        if ctx.author.id != t.host_id:
+            await ctx.send(f"Only the host can {action} the tournament!")
+            return
+        if action == "cancel":
+            cancel_tournament(t)
+            await ctx.send("🛑 The tournament was cancelled.")
+            return
+        try:
+            matches = t.start()
+        except ValueError as e:
+            await ctx.send(str(e))
+            return
+        start_matches(t, matches, True)
+    elif action == "status":
+        await ctx.send(embed=await tournament_standings(t))
+    else:
+        await ctx.send(TOURNAMENT_USAGE)
 
-    # Check if the user is one of the players in the game
-    if ctx.author.id not in [game.player1, game.player2]:
-        await ctx.send("Only players in the current game can end it!")
+@bot.command(name="tttend")
+async def end_game(ctx):
+    """Force-end your current game in this channel, or forfeit your tournament match from anywhere"""
+    channel_games = active_games.in_channel(ctx.channel.id)
+
+    # Check if the user is one of the players in a game here
+    game = next((g for g in channel_games if ctx.author.id in [g.player1, g.player2]), None)
+    if game is None:
+        # Tournament matches run in their own threads
+        game = next((g for g in active_games.for_player(ctx.author.id) if g.game_id in tournament_games), None)
+    if game is None:
+        if not channel_games:
+            await ctx.send("There's no active game in this channel to end.")
+        else:
+            await ctx.send("Only players in a game can end it!")
         return
 
     if ctx.author.id in game.players_used_tttend:
         await ctx.send("You have already ended this game!")
         return
 
-    # Add the player to the set of players who have used !tttend
-    game.players_used_tttend.add(ctx.author.id)
+    if game.game_id in tournament_games:
+        end_running_game(game, ctx.author.id, f"🏳️ {ctx.author.mention} forfeited the match.")
+        await ctx.send(f"🏳️ {ctx.author.mention} forfeited their tournament match.")
+        return
 
-    # Disable the game board and mark it as over
-    game.disable_all_items()
-    game.game_over = True
-    
-    # Remove the game from active games
-    del active_games[ctx.channel.id]
-    
+    end_running_game(game, ctx.author.id, f"🛑 Game ended by {ctx.author.mention}.")
     await ctx.send(f"🛑 Game ended by {ctx.author.mention}. You can start a new game now!")
 
+@bot.command(name="tttprofile")
+@commands.is_owner()
+async def profile(ctx, action: str = "status", mode: str = "sample", seconds: float = PROFILE_SECONDS):
+    """Profile the running bot: start [sample|cprofile] [seconds], stop or dump"""
+    action = action.lower()
+    if action == "start":
+        try:
+            seconds = profiler.start(mode.lower(), seconds)
+        except (RuntimeError, ValueError) as e:
+            await ctx.send(str(e))
+            return
+        await ctx.send(f"🔬 Profiling ({profiler.mode}) for {seconds:g}s. Use `!tttprofile stop` to finish early.")
+    elif action in ("stop", "dump"):
+        if not profiler.running:
+            await ctx.send("No profile is running. Start one with `!tttprofile start [sample|cprofile] [seconds]`.")
+            return
+        paths = await (profiler.stop() if action == "stop" else profiler.dump())
+        await ctx.send("📝 Wrote " + ", ".join(f"`{path}`" for path in paths))
+    elif profiler.running:
+        elapsed = (datetime.now() - profiler.started).total_seconds()
+        await ctx.send(f"A {profiler.mode} profile has been running for {elapsed:.0f}s.")
+    else:
+        await ctx.send(f"No profile is running. Modes: {', '.join(PROFILE_MODES)}.")
+
+@profile.error
+async def profile_error(ctx, error):
+    if isinstance(error, commands.NotOwner):
+        await ctx.send("Only the bot's owner can profile it.")
+    elif isinstance(error, commands.BadArgument):
+        await ctx.send("Usage: `!tttprofile start [sample|cprofile] [seconds]`, `!tttprofile stop` or `!tttprofile dump`")
+    else:
+        raise error
+
 @bot.command(name="ttthelp")
 async def tic_tac_toe_help(ctx):
     """Show help information for the Tic Tac Toe bot"""
@@ -683,34 +1857,40 @@ async def tic_tac_toe_help(ctx):
 
     embed.add_field(
         name="🎯 How to Play",
-        value="Challenge someone to a game and take turns clicking squares to get 3 in a row!",
+        value="Challenge someone to a game and take turns clicking squares to get 3 in a row!\n"
+              "Add a board size (3-5) and win length for bigger games, e.g. `!ttt @username 5 4`",
         inline=False
     )
 
     embed.add_field(
         name="📋 Commands",
-        value="`!ttt @username` - Challenge a user to play\n"
-              "`!tttbot` - Challenge the bot to play\n"
+        value="`!ttt @username [size] [win length]` - Challenge a user to play\n"
+              "`!tttbot [easy|medium|hard|perfect] [size] [win length]` - Challenge the bot to play\n"
+              "`!tttultimate [@user]` - Play Ultimate Tic Tac Toe (against the bot if nobody is mentioned)\n"
               "`!tttstats [@user]` - View your stats or another player's\n"
-              "`!tttleaderboard` - See the top players\n"
-              "`!tttend` - Force-end the current game\n"
+              "`!tttleaderboard [day|week|month] [page|me]` - See the top players, all-time or lately\n"
+              "`!tttvs @user` - Your head-to-head record against someone\n"
+              "`!tttqueue [leave]` - Get matched with someone near your rating\n"
+              "`!ttttournament create [swiss|elimination] [rounds]` - Run a tournament; then `join`, `leave`, "
+              "`start`, `status` or `cancel`\n"
+              "`!tttend` - Force-end your current game (forfeits a tournament match)\n"
               "`!ttthelp` - Show this help message",
         inline=False
     )
 
     embed.add_field(
         name="🎮 Game Rules",
-        value="• One game per channel at a time\n"
+        value="• Several games can run in a channel at once\n"
               "• Random player goes first (❌ or ⭕)\n"
               "• Click Accept/Decline within 60 seconds\n"
               "• Click empty squares to make your move\n"
-              "• First to get 3 in a row wins!",
+              "• First to get 3 in a row (or the chosen win length) wins!",
         inline=False
     )
 
     embed.add_field(
         name="📊 Statistics",
-        value="The bot tracks your wins, losses, draws, and win rate automatically!\n"
+        value="The bot tracks your wins, losses, draws, win rate and Elo rating automatically!\n"
               "Check your progress with `!tttstats` or compete on the `!tttleaderboard`",
         inline=False
     )
@@ -719,7 +1899,8 @@ async def tic_tac_toe_help(ctx):
         name="🚫 Restrictions",
         value="• Can't challenge bots (except with !tttbot)\n"
               "• Can't challenge yourself\n"
-              "• Can't start multiple games in same channel",
+              f"• Can't play more than {active_games.max_per_player} game(s) at a time\n"
+              f"• Games left alone for {int(active_games.idle_ttl // 60)} minutes are closed",
         inline=False
     )
 
@@ -727,5 +1908,6 @@ async def tic_tac_toe_help(ctx):
 
     await ctx.send(embed=embed)
 
-# Use environment variable for bot token
-bot.run(os.getenv('DISCORD_TOKEN'))
+if __name__ == "__main__":
+    # Use environment variable for bot token
+    bot.run(os.getenv('DISCORD_TOKEN'))
@@ -0,0 +1,164 @@
+"""Matchmaking queue: waiting players paired by rating
+
+Waiting players sit in buckets `bucket_width` rating points wide, and
+the non-empty bucket numbers are kept sorted, so finding someone close
+in rating is a range lookup over a bounded number of buckets rather
+than a scan of everyone waiting. A pair matches when their ratings are
+within the tolerance of whichever of them has waited longer; tolerance
+starts at `base_tolerance` and widens by `widen_per_second` up to
+`max_tolerance`, so nobody waits forever for a perfect opponent.
+
+Nothing here keeps time by itself. The owner calls `match_waiting()`
+and `expire()` from one periodic task; `waiting` is in join order, so
+timeouts come off the front.
+"""
+import time
+from collections import OrderedDict
+
+from sortedcontainers import SortedList
+
+
+def _by_wait(entry, other):
+    """The two entries, whoever joined first first"""
+    return (entry, other) if entry.joined <= other.joined else (other, entry)
+
+
+class Waiting:
+    """One player in the queue, and where they asked to play"""
+
+    __slots__ = ("player_id", "rating", "channel_id", "joined")
+
+    def __init__(self, player_id, rating, channel_id, joined):
+        self.player_id = player_id
+        self.rating = rating
+        self.channel_id = channel_id
+        self.joined = joined
+
+
+class MatchQueue:
+    def __init__(self, bucket_width=50, base_tolerance=100, widen_per_second=5, max_tolerance=400, timeout=300):
+        self.bucket_width = bucket_width
+        self.base_tolerance = base_tolerance
+        self.widen_per_second = widen_per_second
+        self.max_tolerance = max_tolerance
+        self.timeout = timeout
+        self.waiting = OrderedDict()  # {player_id: Waiting}, longest waiting first
+        self.buckets = {}  # {bucket: OrderedDict of {player_id: Waiting}}, longest waiting first
+        self._bucket_order = SortedList()  # non-empty buckets
+
+    def __len__(self):
+        return len(self.waiting)
+
+    def __contains__(self, player_id):
+        return player_id in self.waiting
+
+    def get(self, player_id):
+        return self.waiting.get(player_id)
+
+    def tolerance(self, entry, now=None):
+        """How far from their own rating a player will accept an opponent right now"""
+        waited = (time.monotonic() if now is None else now) - entry.joined
+        return min(self.base_tolerance + self.widen_per_second * waited, self.max_tolerance)
+
+    def _bucket(self, rating):
+        return int(rating // self.bucket_width)
+
+    def _add(self, entry):
+        self.waiting[entry.player_id] = entry
+        bucket = self._bucket(entry.rating)
+        members = self.buckets.get(bucket)
+        if members is None:
+            members = self.buckets[bucket] = OrderedDict()
+            self._bucket_order.add(bucket)
+        members[entry.player_id] = entry
+
+    def leave(self, player_id):
+        """Take a player out of the queue; returns their entry, or None if they weren't in it"""
+        entry = self.waiting.pop(player_id, None)
+        if entry is None:
+            return None
+        bucket = self._bucket(entry.rating)
+        members = self.buckets[bucket]
+        del members[player_id]
+        if not members:
+            del self.buckets[bucket]
+            self._bucket_order.remove(bucket)
+        return entry
+
+    def requeue(self, entry):
+        """Put back a matched player whose game couldn't start, keeping their place in line
+
+        The entry keeps its `joined` time, so it goes back ahead of
+        everyone who joined after it; rare enough that the O(n) reorder
+        is fine.
+        """
+        self._add(entry)
+        for members in (self.waiting, self.buckets[self._bucket(entry.rating)]):
+            for player_id in [player_id for player_id, other in members.items() if other.joined > entry.joined]:
+                members.move_to_end(player_id)
+
+    def _find(self, entry, now, allowed):
+        """The closest-rated acceptable opponent for `entry`, or None
+
+        Only the longest-waiting player of each bucket is considered; they
+        have the widest tolerance there and are owed the next game.
+        """
+        own = self.tolerance(entry, now)
+        best = None
+        low = self._bucket(entry.rating - self.max_tolerance)
+        high = self._bucket(entry.rating + self.max_tolerance)
+        for bucket in self._bucket_order.irange(low, high):
+            for candidate in self.buckets[bucket].values():
+                if candidate is not entry:
+                    break
+            else:
+                continue
+            gap = abs(candidate.rating - entry.rating)
+            if gap > max(own, self.tolerance(candidate, now)):
+                continue
+            if best is None or gap < abs(best.rating - entry.rating):
+                best = candidate
+        if best is not None and allowed is not None and not allowed(*_by_wait(best, entry)):
+            return None
+        return best
+
+    def join(self, player_id, rating, channel_id, now=None, allowed=None):
+        """Queue a player, or match them straight away
+
+        Returns (opponent, player) entries if someone waiting fits, else
+        None and the player waits. `allowed(first, second)` can veto a
+        pair, e.g. when there's no room to start their game.
+        """
+        now = time.monotonic() if now is None else now
+        entry = Waiting(player_id, rating, channel_id, now)
+        opponent = self._find(entry, now, allowed)
+        if opponent is not None:
+            self.leave(opponent.player_id)
+            return opponent, entry
+        self._add(entry)
+        return None
+
+    def match_waiting(self, now=None, allowed=None):
+        """Pair whoever now fits, longest waiting first; returns [(first, second)] entries, all removed from the queue"""
+        now = time.monotonic() if now is None else now
+        pairs = []
+        for entry in list(self.waiting.values()):
+            if entry.player_id not in self.waiting:
+                continue
+            opponent = self._find(entry, now, allowed)
+            if opponent is not None:
+                self.leave(entry.player_id)
+                self.leave(opponent.player_id)
+                pairs.append(_by_wait(entry, opponent))
+        return pairs
+
+    def expire(self, now=None):
+        """Remove and return everyone who has waited `timeout` seconds"""
+        now = time.monotonic() if now is None else now
+        expired = []
+        while self.waiting:
+            entry = next(iter(self.waiting.values()))
+            if now - entry.joined < self.timeout:
+                break
+            expired.append(self.leave(entry.player_id))
+        return expired
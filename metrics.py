@@ -0,0 +1,228 @@
+"""Counters, gauges and histograms served in the Prometheus text format
+
+Recording is a dict update (plus a bisect for histograms), so metrics
+are cheap to keep on hot paths. Gauges can take a function instead of
+being set, which is only called when something scrapes. Nothing is
+formatted until a scrape asks for it.
+
+    from metrics import counter
+    GAMES = counter("ttt_games_started_total", "Games started", ["mode"])
+    GAMES.inc(mode="bot")
+
+`serve(host, port)` starts a tiny HTTP server answering GET /metrics.
+"""
+import asyncio
+import bisect
+import logging
+import time
+from functools import wraps
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics = []  # every metric, in the order they were created
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        _metrics.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _label_text(self, key, extra=None):
+        pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self):
+        """Lines of the exposition format for this metric's values"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(self._key(labels), 0)
+
+    def samples(self):
+        return [f"{self.name}{self._label_text(key)} {value}" for key, value in self.values.items()]
+
+
+class Gauge(Metric):
+    """A value that goes up and down; `fn` computes it at scrape time instead"""
+
+    type = "gauge"
+
+    def __init__(self, name, help, labels=(), fn=None):
+        super().__init__(name, help, labels)
+        self.values = {}
+        self.fn = fn
+
+    def set(self, value, **labels):
+        self.values[self._key(labels)] = value
+
+    def samples(self):
+        if self.fn is not None:
+            try:
+                return [f"{self.name} {self.fn()}"]
+            except Exception:
+                # A gauge that can't be read right now is left out of this scrape
+                return []
+        return [f"{self.name}{self._label_text(key)} {value}" for key, value in self.values.items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self.values = {}  # {label key: [per-bucket counts..., +Inf count, sum]}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        counts = self.values.get(key)
+        if counts is None:
+            counts = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def time(self, **labels):
+        """Context manager observing how long its block takes"""
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        counts = self.values.get(self._key(labels))
+        return sum(counts[:-1]) if counts else 0
+
+    def samples(self):
+        lines = []
+        for key, counts in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {counts[-1]}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def counter(name, help, labels=()):
+    return Counter(name, help, labels)
+
+
+def gauge(name, help, labels=(), fn=None):
+    return Gauge(name, help, labels, fn)
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return Histogram(name, help, labels, buckets)
+
+
+def timed(histogram, **labels):
+    """Decorator observing how long each call of an async function takes"""
+    def decorate(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+        return wrapper
+    return decorate
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in _metrics) + "\n"
+
+
+class _MatchCounter(logging.Handler):
+    """Counts log records whose unformatted message starts with one of `prefixes`"""
+
+    def __init__(self, counter, prefixes, **labels):
+        super().__init__(logging.WARNING)
+        self.counter = counter
+        self.prefixes = tuple(prefixes)
+        self.labels = labels
+
+    def emit(self, record):
+        if isinstance(record.msg, str) and record.msg.startswith(self.prefixes):
+            self.counter.inc(**self.labels)
+
+
+def count_log_messages(counter, logger_name, prefixes, **labels):
+    """Increment `counter` whenever a logger warns with a matching message"""
+    logging.getLogger(logger_name).addHandler(_MatchCounter(counter, prefixes, **labels))
+
+
+async def _handle(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        # Skip the headers; nothing in them matters here
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            body = render().encode()
+            status = "200 OK"
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = b"Not found\n"
+            status = "404 Not Found"
+            content_type = "text/plain"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host="127.0.0.1", port=9464):
+    """Serve GET /metrics; returns the asyncio server"""
+    return await asyncio.start_server(_handle, host, port)
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import discord
+
+
+class DisplayNameCache:
+    """Bounded LRU cache of display names that expire after `ttl` seconds"""
+
+    def __init__(self, maxsize=2048, ttl=600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._names = OrderedDict()  # {user_id: (name, expires_at)}
+
+    def __len__(self):
+        return len(self._names)
+
+    def get(self, user_id):
+        entry = self._names.get(user_id)
+        if entry is None:
+            return None
+        name, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._names[user_id]
+            return None
+        self._names.move_to_end(user_id)
+        return name
+
+    def put(self, user_id, name):
+        self._names[user_id] = (name, time.monotonic() + self.ttl)
+        self._names.move_to_end(user_id)
+        while len(self._names) > self.maxsize:
+            self._names.popitem(last=False)
+
+
+async def resolve_display_names(bot, user_ids, cache, concurrency=4):
+    """Return {user_id: display name} for every id in user_ids
+
+    Names come from the gateway's user cache first, then from `cache`, and
+    only the rest are fetched over REST, at most `concurrency` at a time.
+    Users that can't be fetched still get an entry so callers never lose
+    a row because of a failed lookup.
+    """
+    names = {}
+    missing = []
+    for user_id in user_ids:
+        user = bot.get_user(user_id)
+        if user is not None:
+            names[user_id] = user.display_name
+            cache.put(user_id, user.display_name)
+            continue
+
+        name = cache.get(user_id)
+        if name is not None:
+            names[user_id] = name
+        else:
+            missing.append(user_id)
+
+    if not missing:
+        return names
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(user_id):
+        async with semaphore:
+            try:
+                user = await bot.fetch_user(user_id)
+            except discord.NotFound:
+                # Deleted accounts stay deleted; remember that too
+                cache.put(user_id, "Deleted User")
+                return user_id, "Deleted User"
+            except discord.HTTPException as e:
+                print(f"Could not fetch user {user_id}: {e}")
+                return user_id, f"Player {user_id}"
+        cache.put(user_id, user.display_name)
+        return user_id, user.display_name
+
+    for user_id, name in await asyncio.gather(*(fetch(user_id) for user_id in missing)):
+        names[user_id] = name
+    return names
@@ -0,0 +1,284 @@
+"""Outbound message edits, coalesced per message and paced per route
+
+Edits that aren't the direct answer to a click (a deferred bot turn,
+boards closed by !tttend or by eviction) go through an EditScheduler
+instead of being awaited on the spot. Each message has at most one edit
+in flight and one waiting; a newer render replaces the waiting one, so a
+burst of state changes costs one request for the latest board. Every
+route (a channel, or one interaction's webhook) gets its own token
+bucket, and routes take turns, so a busy channel can't hold up edits
+everywhere else.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+
+import discord
+
+
+class RouteBudget:
+    """Token bucket for one rate-limit route"""
+
+    __slots__ = ("rate", "per", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # set from a 429's retry_after
+
+    def idle(self, now):
+        """True once the bucket is full and unblocked again, so a fresh one would do the same"""
+        self._refill(now)
+        return self.tokens >= self.rate and now >= self.blocked_until
+
+    def _refill(self, now):
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Seconds until a request may go out on this route"""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.per / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class _Pending:
+    __slots__ = ("route", "edit", "kwargs", "waiters", "queued_at")
+
+    def __init__(self, route, edit, kwargs, queued_at):
+        self.route = route
+        self.edit = edit
+        self.kwargs = kwargs
+        self.waiters = []
+        self.queued_at = queued_at
+
+
+class EditScheduler:
+    """Send message edits in the background, newest render per message
+
+    `rate` edits per `per` seconds is Discord's usual budget for editing
+    messages in one channel. Stats: `sent`, `coalesced` (renders replaced
+    before they were sent), `superseded` (dropped because a click answer
+    already showed a newer board) and `failed`.
+    """
+
+    def __init__(self, rate=5, per=5.0, max_in_flight=16):
+        self.rate = rate
+        self.per = per
+        self.max_in_flight = max_in_flight
+        self.pending = {}  # {message_id: _Pending} waiting to be sent
+        self.in_flight = set()  # message_ids with a request out
+        self.routes = {}  # {route: RouteBudget}; budgets back to full are dropped
+        self.sending = set()  # tasks of the edits in flight
+        self.ready = OrderedDict()  # {route: deque of message_ids}, in turn order
+        self.answers = {}  # {message_id: [answers in flight, newest started, newest landed, newest kwargs]}
+        self.sent = 0
+        self.coalesced = 0
+        self.superseded = 0
+        self.failed = 0
+        self._wake = None
+        self._task = None
+        self._pruned = time.monotonic()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop sending and wait for edits already out; edits still waiting are dropped"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for pending in self.pending.values():
+            _resolve(pending.waiters, False)
+        self.pending.clear()
+        self.ready.clear()
+        if self.sending:
+            await asyncio.gather(*self.sending, return_exceptions=True)
+
+    def schedule(self, message_id, route, edit, **kwargs):
+        """Queue `edit(**kwargs)` for a message, replacing any edit still waiting
+
+        Returns a future that resolves to True once an edit at least this
+        new has gone out, or False if it was dropped or failed.
+        """
+        self.start()
+        waiter = asyncio.get_running_loop().create_future()
+        pending = self.pending.get(message_id)
+        if pending is None:
+            pending = self.pending[message_id] = _Pending(route, edit, kwargs, time.monotonic())
+            if message_id not in self.in_flight:
+                self._enqueue(message_id, route)
+        else:
+            # Only the latest render matters
+            pending.edit = edit
+            pending.kwargs = kwargs
+            self.coalesced += 1
+        pending.waiters.append(waiter)
+        self._wake.set()
+        return waiter
+
+    def supersede(self, message_id):
+        """Drop the waiting edit for a message that was just updated another way"""
+        pending = self.pending.pop(message_id, None)
+        if pending is None:
+            return
+        self.superseded += 1
+        _resolve(pending.waiters, True)
+        queue = self.ready.get(pending.route)
+        if queue is not None and message_id in queue:
+            queue.remove(message_id)
+            if not queue:
+                del self.ready[pending.route]
+
+    def answering(self, message_id, kwargs):
+        """Note a click answer about to render a message; returns its ticket for answered()
+
+        Whatever is queued for the message is older than this render, so
+        it's dropped.
+        """
+        self.supersede(message_id)
+        entry = self.answers.get(message_id)
+        if entry is None:
+            entry = self.answers[message_id] = [0, 0, 0, None]
+        entry[0] += 1
+        entry[1] += 1
+        entry[3] = kwargs
+        return entry[1]
+
+    def answered(self, message_id, ticket, landed=True):
+        """Note a click answer has landed, or failed if not `landed`
+
+        Discord doesn't promise to apply two answers for one message in the
+        order they were sent. If a newer answer landed first, this older one
+        may be what's showing now; returns the newest render's kwargs so
+        the caller can put it back, else None. A failed answer showed
+        nothing, so if it was the newest render that is returned too.
+        """
+        entry = self.answers[message_id]
+        entry[0] -= 1
+        if landed:
+            put_back = entry[2] > ticket
+            entry[2] = max(entry[2], ticket)
+        else:
+            put_back = ticket == entry[1]
+        newest = entry[3]
+        if not entry[0]:
+            del self.answers[message_id]
+        return newest if put_back else None
+
+    def _enqueue(self, message_id, route):
+        self.ready.setdefault(route, deque()).append(message_id)
+
+    def _budget(self, route):
+        budget = self.routes.get(route)
+        if budget is None:
+            budget = self.routes[route] = RouteBudget(self.rate, self.per)
+        return budget
+
+    def _prune(self, now):
+        """Drop budgets that have refilled, at most once per `per` seconds
+
+        Routes include interaction tokens, each used for a few edits and
+        never again, so without this the table would grow for as long as
+        the bot runs. A full budget is what _budget() would create anyway.
+        """
+        if now - self._pruned < self.per:
+            return
+        self._pruned = now
+        for route in [route for route, budget in self.routes.items() if budget.idle(now)]:
+            del self.routes[route]
+
+    async def _run(self):
+        while True:
+            delay = self._dispatch()
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self):
+        """Start every edit the budgets allow; returns how long to sleep (None: until woken)"""
+        now = time.monotonic()
+        self._prune(now)
+        delay = None
+        more = False
+        # One edit per route per pass, then the route goes to the back of the line
+        for route in list(self.ready):
+            if len(self.in_flight) >= self.max_in_flight:
+                break
+            wait = self._budget(route).wait_time(now)
+            if wait > 0:
+                delay = wait if delay is None else min(delay, wait)
+                continue
+
+            queue = self.ready[route]
+            message_id = queue.popleft()
+            if queue:
+                self.ready.move_to_end(route)
+                more = True
+            else:
+                del self.ready[route]
+
+            self._budget(route).take(now)
+            pending = self.pending.pop(message_id)
+            self.in_flight.add(message_id)
+            task = asyncio.create_task(self._send(message_id, pending))
+            self.sending.add(task)
+            task.add_done_callback(self.sending.discard)
+
+        if more and len(self.in_flight) < self.max_in_flight:
+            delay = 0  # routes served this pass may have budget for another edit
+        return delay
+
+    async def _send(self, message_id, pending):
+        ok = False
+        try:
+            await pending.edit(**pending.kwargs)
+            ok = True
+            self.sent += 1
+        except discord.HTTPException as e:
+            self.failed += 1
+            if e.status == 429:
+                self._budget(pending.route).block(getattr(e, "retry_after", self.per))
+                # Try again once the route opens up, unless a newer render is waiting
+                self.pending.setdefault(message_id, pending)
+                pending.waiters = [waiter for waiter in pending.waiters if not waiter.done()]
+            elif e.status != 404:
+                print(f"Failed to edit message {message_id}: {e}")
+        except Exception as e:
+            self.failed += 1
+            print(f"Failed to edit message {message_id}: {e!r}")
+        finally:
+            self.in_flight.discard(message_id)
+            if self.pending.get(message_id) is not pending:
+                _resolve(pending.waiters, ok)
+            # A newer render arrived while this one was out
+            newer = self.pending.get(message_id)
+            if newer is not None:
+                self._enqueue(message_id, newer.route)
+            if self._wake is not None:
+                self._wake.set()
+
+
+def _resolve(waiters, result):
+    for waiter in waiters:
+        if not waiter.done():
+            waiter.set_result(result)
@@ -0,0 +1,153 @@
+"""Daily, weekly and monthly results from per-player day buckets
+
+Every player's stats carry `days`: [[day, wins, losses, draws], ...], one
+bucket per day they played, oldest first, where day is the date's
+ordinal. A result adds to today's bucket or starts a new one, and
+buckets KEEP_DAYS old fall off the front, so no player ever holds more
+than KEEP_DAYS buckets however long the bot runs. A period's totals sum
+at most that many buckets.
+
+PeriodBoards ranks the players of the current day, week and month by
+wins in that period. Each board is updated as results are recorded and
+simply emptied when its period rolls over, so answering a query never
+reads old results.
+"""
+from datetime import date
+
+from sortedcontainers import SortedList
+
+PERIODS = ("day", "week", "month")
+PERIOD_NAMES = {"day": "Today", "week": "This Week", "month": "This Month"}
+PERIOD_ALIASES = {
+    "day": "day", "today": "day", "daily": "day",
+    "week": "week", "weekly": "week",
+    "month": "month", "monthly": "month",
+}
+KEEP_DAYS = 31  # the longest month; no period reaches back further
+
+
+def today():
+    return date.today().toordinal()
+
+
+def period_start(period, day):
+    """First day of the day, week (from Monday) or month holding `day`"""
+    if period == "day":
+        return day
+    if period == "week":
+        return day - date.fromordinal(day).weekday()
+    if period == "month":
+        return day - date.fromordinal(day).day + 1
+    raise ValueError(f"Unknown period: {period!r}")
+
+
+def roll(days, day, won=False, draw=False):
+    """A new bucket list with one result added on `day`, dropping buckets too old to matter
+
+    Returns a new list rather than changing `days`, so a copy of the
+    stats being written out elsewhere never sees it half-updated.
+    """
+    first = 0
+    while first < len(days) and days[first][0] <= day - KEEP_DAYS:
+        first += 1
+    days = days[first:]
+    result = (int(won), int(not won and not draw), int(draw))
+    if days and days[-1][0] == day:
+        days[-1] = [day] + [count + added for count, added in zip(days[-1][1:], result)]
+    else:
+        days.append([day, *result])
+    return days
+
+
+def totals(days, period, day=None):
+    """(wins, losses, draws) in the period holding `day` (default today)"""
+    if day is None:
+        day = today()
+    start = period_start(period, day)
+    wins = losses = draws = 0
+    for bucket_day, bucket_wins, bucket_losses, bucket_draws in reversed(days):
+        if bucket_day < start:
+            break
+        if bucket_day <= day:
+            wins += bucket_wins
+            losses += bucket_losses
+            draws += bucket_draws
+    return wins, losses, draws
+
+
+class PeriodBoards:
+    """Players in the current day, week and month, by wins then fewest losses
+
+    `listeners` are called with (period, old position, new position) when
+    a row on that period's board changes, and (period, None, None) when
+    the board is rebuilt or its period rolls over.
+    """
+
+    def __init__(self):
+        self.listeners = []
+        self._boards = {}  # {period: (first day, {player_id: key}, SortedList of keys)}
+        self._starts = (None, {})  # (day, {period: first day}) for the last day asked about
+        self.build(())
+
+    def build(self, players, day=None):
+        """Index (player_id, days) pairs from scratch"""
+        if day is None:
+            day = today()
+        players = list(players)
+        for period in PERIODS:
+            keys = {}
+            for player_id, days in players:
+                wins, losses, draws = totals(days, period, day)
+                if wins or losses or draws:
+                    keys[player_id] = (-wins, losses, -draws, player_id)
+            self._boards[period] = (period_start(period, day), keys, SortedList(keys.values()))
+            self._notify(period, None, None)
+
+    def _board(self, period, day):
+        if self._starts[0] != day:
+            self._starts = (day, {period: period_start(period, day) for period in PERIODS})
+        start = self._starts[1][period]
+        board = self._boards[period]
+        if board[0] != start:
+            # A new day, week or month starts with nobody on it
+            board = self._boards[period] = (start, {}, SortedList())
+            self._notify(period, None, None)
+        return board
+
+    def _notify(self, period, old_position, new_position):
+        for listener in self.listeners:
+            listener(period, old_position, new_position)
+
+    def update(self, player_id, days, day=None):
+        """Re-rank a player on every board after a result was added to `days`"""
+        if day is None:
+            day = today()
+        for period in PERIODS:
+            _, keys, order = self._board(period, day)
+            old_position = None
+            old = keys.get(player_id)
+            if old is not None:
+                old_position = order.bisect_left(old)
+                del order[old_position]
+                old_position += 1
+            wins, losses, draws = totals(days, period, day)
+            key = keys[player_id] = (-wins, losses, -draws, player_id)
+            order.add(key)
+            self._notify(period, old_position, order.bisect_left(key) + 1)
+
+    def top(self, period, limit, offset=0, day=None):
+        """[(player_id, (wins, losses, draws))] for `limit` players from 0-based `offset`"""
+        _, _, order = self._board(period, today() if day is None else day)
+        return [
+            (player_id, (-wins, losses, -draws))
+            for wins, losses, draws, player_id in order.islice(offset, offset + limit)
+        ]
+
+    def rank(self, period, player_id, day=None):
+        """1-based position on a period's board, or None if they haven't played in it"""
+        _, keys, order = self._board(period, today() if day is None else day)
+        key = keys.get(player_id)
+        return None if key is None else order.index(key) + 1
+
+    def count(self, period, day=None):
+        return len(self._board(period, today() if day is None else day)[1])
@@ -0,0 +1,286 @@
+"""On-demand profiling of the running bot
+
+A Profiler runs for a bounded window and then writes what it saw to
+disk, so a slowdown that only shows up in production can be looked at
+without redeploying. Two ways to capture:
+
+- "cprofile": deterministic cProfile of the event loop thread. Exact call
+  counts, but every Python call gets slower while it runs.
+- "sample": a background thread records the loop thread's stack every few
+  milliseconds. Cheap enough to leave on for a while; written as folded
+  stacks that flamegraph tools read directly.
+
+Either way a StallMonitor watches the event loop. Whenever one callback
+holds it longer than the threshold, it records how long and which
+function was running, sampled from the loop thread's stack so plain
+functions such as stats updates are named as well as coroutines.
+"""
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+MODES = ("cprofile", "sample")
+
+# Named in the stall report when they're on the stack of a blocked loop
+WATCHED = (
+    "TicTacToeButton.callback",
+    "UltimateCellButton.callback",
+    "TicTacToe.bot_turn",
+    "UltimateTicTacToe.bot_turn",
+    "leaderboard",
+    "finish_game",
+    "record_game_result",
+    "JsonStatsStore.record_game",
+    "SqliteStatsStore.record_game",
+)
+
+
+def _stack(frame, limit=64):
+    """[(qualified name, "file:line")] for a frame and its callers, innermost first"""
+    stack = []
+    while frame is not None and len(stack) < limit:
+        code = frame.f_code
+        stack.append((code.co_qualname, f"{os.path.basename(code.co_filename)}:{frame.f_lineno}"))
+        frame = frame.f_back
+    return stack
+
+
+class StallMonitor:
+    """Records every stretch the event loop was blocked for at least `threshold` seconds
+
+    The loop bumps a heartbeat every `interval` seconds; a watcher thread
+    notices when it stops and samples the loop thread's stack for as long
+    as it's stuck. When the heartbeat comes back late, the stall is
+    recorded with those samples.
+    """
+
+    def __init__(self, threshold=0.1, interval=0.01, watched=WATCHED):
+        self.threshold = threshold
+        self.interval = interval
+        self.watched = set(watched)
+        self.stalls = []  # [(wall time, seconds blocked, [stack samples])]
+        self._last_beat = 0.0
+        self._samples = []  # stacks sampled during the current stall
+        self._loop = None
+        self._loop_thread = None
+        self._handle = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._handle = self._loop.call_later(self.interval, self._beat)
+        threading.Thread(target=self._watch, name="stall-monitor", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._handle is not None:
+            self._handle.cancel()
+
+    def _beat(self):
+        now = time.monotonic()
+        blocked = now - self._last_beat - self.interval
+        if blocked >= self.threshold:
+            self.stalls.append((datetime.now(), blocked, self._samples))
+        self._samples = []
+        self._last_beat = now
+        self._handle = self._loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        while not self._stopped.wait(self.interval):
+            if time.monotonic() - self._last_beat > self.interval + self.threshold:
+                frame = sys._current_frames().get(self._loop_thread)
+                self._samples.append(_stack(frame))
+
+    def culprit(self, stack):
+        """The innermost watched function on a stack, else the innermost frame"""
+        for name, where in stack:
+            if name in self.watched:
+                return name
+        return f"{stack[0][0]} ({stack[0][1]})" if stack else "unknown"
+
+    def _held_by(self, samples):
+        """(culprit seen in most samples, one of its stacks, {culprit: samples})"""
+        if not samples:
+            return "unknown (stall ended before the stack was sampled)", [], {}
+        seen = Counter(self.culprit(stack) for stack in samples)
+        name = seen.most_common(1)[0][0]
+        return name, next(stack for stack in samples if self.culprit(stack) == name), seen
+
+    def report(self):
+        """Text report: totals per culprit, then every stall, longest first"""
+        lines = [f"Event loop stalls of {self.threshold * 1000:.0f} ms or more: {len(self.stalls)}", ""]
+        if not self.stalls:
+            return "\n".join(lines) + "\n"
+
+        totals = {}
+        for _, blocked, samples in self.stalls:
+            name = self._held_by(samples)[0]
+            count, total, worst = totals.get(name, (0, 0.0, 0.0))
+            totals[name] = (count + 1, total + blocked, max(worst, blocked))
+        lines.append(f"{'count':>6} {'total ms':>10} {'worst ms':>10}  held by")
+        for name, (count, total, worst) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{count:>6} {total * 1000:>10.1f} {worst * 1000:>10.1f}  {name}")
+
+        for when, blocked, samples in sorted(self.stalls, key=lambda stall: -stall[1]):
+            name, stack, seen = self._held_by(samples)
+            lines.append("")
+            lines.append(f"{when:%H:%M:%S.%f} blocked {blocked * 1000:.1f} ms in {name}")
+            if len(seen) > 1:
+                total = sum(seen.values())
+                lines.append("    samples: " + ", ".join(f"{culprit} {count / total:.0%}" for culprit, count in seen.most_common()))
+            for frame_name, where in stack:
+                lines.append(f"    {frame_name} ({where})")
+        return "\n".join(lines) + "\n"
+
+
+class StackSampler:
+    """Samples one thread's stack every `interval` seconds into folded-stack counts"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()  # {"outer;...;inner": count}
+        self._stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="stack-sampler", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[";".join(name for name, _ in reversed(_stack(frame, limit=128)))] += 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.copy().most_common())
+
+    def summary(self, limit=40):
+        """Functions by share of samples: self (innermost) and total (anywhere on the stack)"""
+        samples = self.samples.copy()  # the sampler thread may still be adding to it
+        own, total = Counter(), Counter()
+        count = sum(samples.values())
+        if not count:
+            return "No samples yet\n"
+        for stack, hits in samples.items():
+            names = stack.split(";")
+            own[names[-1]] += hits
+            for name in set(names):
+                total[name] += hits
+        lines = [f"{count} samples every {self.interval * 1000:g} ms", "", f"{'self %':>7} {'total %':>8}  function"]
+        for name, hits in own.most_common(limit):
+            lines.append(f"{hits / count:>7.1%} {total[name] / count:>8.1%}  {name}")
+        return "\n".join(lines) + "\n"
+
+
+class Profiler:
+    """One profiling session at a time, stopped after at most `seconds`"""
+
+    def __init__(self, directory="profiles", slow_callback=0.1, max_seconds=600):
+        self.directory = directory
+        self.slow_callback = slow_callback
+        self.max_seconds = max_seconds
+        self.mode = None
+        self.started = None
+        self._profile = None
+        self._sampler = None
+        self._monitor = None
+        self._timer = None
+
+    @property
+    def running(self):
+        return self.mode is not None
+
+    def start(self, mode="sample", seconds=60):
+        """Start capturing on the running loop; stops by itself after `seconds`"""
+        if self.running:
+            raise RuntimeError(f"A {self.mode} profile is already running")
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode {mode!r}; use one of {', '.join(MODES)}")
+        seconds = min(seconds, self.max_seconds)
+
+        self._monitor = StallMonitor(threshold=self.slow_callback)
+        self._monitor.start()
+        if mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident())
+            self._sampler.start()
+        self.mode = mode
+        self.started = datetime.now()
+        self._timer = asyncio.create_task(self._stop_after(seconds))
+        return seconds
+
+    async def _stop_after(self, seconds):
+        await asyncio.sleep(seconds)
+        self._timer = None
+        paths = await self.stop()
+        print(f"Profile finished after {seconds:g}s: {', '.join(paths)}")
+
+    async def stop(self):
+        """Stop capturing and write the results; returns the paths written"""
+        if not self.running:
+            return []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        self._monitor.stop()
+        try:
+            return await self._dump(final=True)
+        finally:
+            self.mode = None
+            self._profile = self._sampler = self._monitor = None
+
+    async def dump(self):
+        """Write what's been captured so far, without stopping; returns the paths written"""
+        if not self.running:
+            return []
+        return await self._dump(final=False)
+
+    async def _dump(self, final):
+        prefix = os.path.join(self.directory, f"{self.started:%Y%m%d-%H%M%S}-{self.mode}")
+        files = {f"{prefix}-stalls.txt": self._monitor.report()}
+
+        if self._profile is not None:
+            text = io.StringIO()
+            # Building the stats turns the profiler off
+            stats = pstats.Stats(self._profile, stream=text)
+            if not final:
+                self._profile.enable()
+            stats.sort_stats("cumulative").print_stats(60)
+            files[f"{prefix}.txt"] = text.getvalue()
+            raw = stats.stats
+        else:
+            files[f"{prefix}.folded"] = self._sampler.folded()
+            files[f"{prefix}.txt"] = self._sampler.summary()
+            raw = None
+
+        await asyncio.to_thread(self._write, prefix, files, raw)
+        return sorted(files) + ([f"{prefix}.prof"] if raw is not None else [])
+
+    def _write(self, prefix, files, raw):
+        os.makedirs(self.directory, exist_ok=True)
+        for path, text in files.items():
+            with open(path, 'w') as f:
+                f.write(text)
+        if raw is not None:
+            # Same format as cProfile's dump_stats, for snakeviz and friends
+            with open(f"{prefix}.prof", 'wb') as f:
+                marshal.dump(raw, f)
@@ -0,0 +1,71 @@
+"""Elo ratings and an order-statistic index over them
+
+Ratings move a little after every rated game, by how surprising the
+result was, so beating strong players counts for more than piling up
+wins against weak ones. RankIndex keeps every rated player in a sorted
+list, so "you are #412 of 58,000" and the top of the leaderboard are
+O(log n) lookups instead of a sort over everyone.
+"""
+from sortedcontainers import SortedList
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 32  # most a rating can move in one game
+
+
+def expected_score(rating, opponent_rating):
+    """Chance of winning (draws count half) that the ratings predict"""
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def game_score(player1, player2, winner_id=None):
+    """player1's score for a finished game: 1 for a win, 0.5 for a draw, 0 for a loss"""
+    if winner_id is None:
+        return 0.5
+    return 1.0 if winner_id == player1 else 0.0
+
+
+def rate(rating1, rating2, score1, k=K_FACTOR):
+    """Both players' new ratings after a game where player1 scored `score1`"""
+    change = k * (score1 - expected_score(rating1, rating2))
+    return round(rating1 + change, 2), round(rating2 - change, 2)
+
+
+class RankIndex:
+    """Player ids ordered by rating, best first; ties go to the lower id"""
+
+    def __init__(self, ratings=()):
+        self.ratings = dict(ratings)  # {player_id: rating}
+        self._order = SortedList((-rating, player_id) for player_id, rating in self.ratings.items())
+
+    def __len__(self):
+        return len(self.ratings)
+
+    def __contains__(self, player_id):
+        return player_id in self.ratings
+
+    def get(self, player_id, default=INITIAL_RATING):
+        return self.ratings.get(player_id, default)
+
+    def set(self, player_id, rating):
+        """Place a player at `rating`; returns their (old position or None, new position)"""
+        old = self.ratings.get(player_id)
+        old_position = None
+        if old is not None:
+            old_position = self._order.bisect_left((-old, player_id))
+            del self._order[old_position]
+            old_position += 1
+        self.ratings[player_id] = rating
+        key = (-rating, player_id)
+        self._order.add(key)
+        return old_position, self._order.bisect_left(key) + 1
+
+    def rank(self, player_id):
+        """1-based position of a player, or None if they aren't rated"""
+        rating = self.ratings.get(player_id)
+        if rating is None:
+            return None
+        return self._order.index((-rating, player_id)) + 1
+
+    def top(self, limit, offset=0):
+        """[(player_id, rating)] for `limit` players starting at 0-based position `offset`"""
+        return [(player_id, -negated) for negated, player_id in self._order.islice(offset, offset + limit)]
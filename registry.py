@@ -0,0 +1,126 @@
+import time
+from collections import OrderedDict
+
+
+class GameRegistry:
+    """Running games keyed by the id of the message they're played in
+
+    Secondary indexes by channel and by player make "how many games are in
+    this channel" and "is this user already playing" O(1). Every game has a
+    last-activity time; `evict_idle` drops the ones nobody has touched for
+    `idle_ttl` seconds so abandoned games can't pile up.
+
+    Games restored from a snapshot stay in their packed form (whatever the
+    game's `pack()` returned) until something asks for them, then `unpack`
+    turns them back into game objects.
+    """
+
+    def __init__(self, max_per_channel=5, max_per_player=1, idle_ttl=900.0, unpack=None):
+        self.max_per_channel = max_per_channel
+        self.max_per_player = max_per_player
+        self.idle_ttl = idle_ttl
+        self.unpack = unpack
+        self.dirty = False  # changed since the last snapshot()
+        self.games = {}  # {message_id: game, or its packed list}
+        self.channels = {}  # {message_id: channel_id}
+        self.players = {}  # {message_id: tuple of indexed player ids}
+        self.by_channel = {}  # {channel_id: set of message_ids}
+        self.by_player = {}  # {player_id: set of message_ids}
+        self._last_active = OrderedDict()  # {message_id: monotonic time}, oldest first
+
+    def __len__(self):
+        return len(self.games)
+
+    def __contains__(self, message_id):
+        return message_id in self.games
+
+    def get(self, message_id):
+        game = self.games.get(message_id)
+        if isinstance(game, list):
+            game = self.games[message_id] = self.unpack(message_id, game)
+        return game
+
+    def in_channel(self, channel_id):
+        return [self.get(message_id) for message_id in self.by_channel.get(channel_id, ())]
+
+    def for_player(self, player_id):
+        return [self.get(message_id) for message_id in self.by_player.get(player_id, ())]
+
+    def is_playing(self, player_id):
+        return bool(self.by_player.get(player_id))
+
+    def check_limits(self, channel_id, player_ids):
+        """Return why a new game can't start, or None if it can; a channel_id of None checks only the players"""
+        if channel_id is not None and len(self.by_channel.get(channel_id, ())) >= self.max_per_channel:
+            return "This channel already has the most games it can run at once!"
+        for player_id in player_ids:
+            if len(self.by_player.get(player_id, ())) >= self.max_per_player:
+                return f"<@{player_id}> is already in a game!"
+        return None
+
+    def add(self, message_id, channel_id, game, player_ids):
+        """Register a game; player_ids are the players counted against the per-player cap"""
+        if message_id in self.games:
+            self.remove(message_id)
+
+        self.games[message_id] = game
+        self.channels[message_id] = channel_id
+        self.players[message_id] = tuple(player_ids)
+        self.by_channel.setdefault(channel_id, set()).add(message_id)
+        for player_id in player_ids:
+            self.by_player.setdefault(player_id, set()).add(message_id)
+        self.touch(message_id)
+
+    def restore(self, message_id, channel_id, packed, player_ids):
+        """Register a packed game from a snapshot without unpacking it"""
+        self.add(message_id, channel_id, packed, player_ids)
+
+    def snapshot(self):
+        """{message_id: packed game} for every registered game"""
+        self.dirty = False
+        return {
+            str(message_id): game if isinstance(game, list) else game.pack()
+            for message_id, game in self.games.items()
+        }
+
+    def touch(self, message_id):
+        """Mark a game as active just now"""
+        if message_id in self.games:
+            self._last_active[message_id] = time.monotonic()
+            self._last_active.move_to_end(message_id)
+            self.dirty = True
+
+    def remove(self, message_id):
+        """Unregister a game and return it (None if it wasn't registered)"""
+        game = self.get(message_id)
+        if game is None:
+            return None
+        del self.games[message_id]
+        self.dirty = True
+
+        channel_id = self.channels.pop(message_id)
+        _discard(self.by_channel, channel_id, message_id)
+        for player_id in self.players.pop(message_id):
+            _discard(self.by_player, player_id, message_id)
+        self._last_active.pop(message_id, None)
+        return game
+
+    def evict_idle(self, now=None):
+        """Remove and return the games idle for longer than idle_ttl"""
+        if now is None:
+            now = time.monotonic()
+        evicted = []
+        while self._last_active:
+            message_id, last_active = next(iter(self._last_active.items()))
+            if now - last_active < self.idle_ttl:
+                break
+            evicted.append(self.remove(message_id))
+        return evicted
+
+
+def _discard(index, key, message_id):
+    message_ids = index.get(key)
+    if message_ids is not None:
+        message_ids.discard(message_id)
+        if not message_ids:
+            del index[key]
@@ -0,0 +1,138 @@
+"""Alpha-beta search for boards too big to solve ahead of time
+
+Iterative deepening negamax with a transposition table and a wall-clock
+budget. Positions are (mover, opponent) bitboard pairs on an
+engine.Geometry. This is CPU-bound; the bot runs it in a process pool so
+a deep search never stalls the event loop.
+"""
+import time
+
+from engine import completing_cells, iter_cells
+
+WIN_SCORE = 1_000_000
+MAX_TABLE_SIZE = 1_000_000
+_CHECK_EVERY = 1024  # nodes between clock checks
+
+# Transposition tables live for the life of the worker process
+_tables = {}  # {(size, win_length): {(mover, opponent): (depth, value, flag, move)}}
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class _Timeout(Exception):
+    pass
+
+
+def evaluate(geo, mover, opponent):
+    """Score open lines: each mark on a line neither side has blocked counts"""
+    score = 0
+    for mask in geo.win_masks:
+        mine = mover & mask
+        theirs = opponent & mask
+        if mine and not theirs:
+            score += 1 << (2 * mine.bit_count())
+        elif theirs and not mine:
+            score -= 1 << (2 * theirs.bit_count())
+    return score
+
+
+class _Search:
+    def __init__(self, geo, deadline):
+        self.geo = geo
+        self.deadline = deadline
+        self.nodes = 0
+        self.table = _tables.setdefault((geo.size, geo.win_length), {})
+        if len(self.table) > MAX_TABLE_SIZE:
+            self.table.clear()
+
+    def ordered_moves(self, empty, first=None):
+        moves = [cell for cell in self.geo.move_order if empty >> cell & 1]
+        if first is not None and empty >> first & 1:
+            moves.remove(first)
+            moves.insert(0, first)
+        return moves
+
+    def negamax(self, mover, opponent, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes % _CHECK_EVERY == 0 and time.monotonic() > self.deadline:
+            raise _Timeout
+
+        geo = self.geo
+        empty = geo.full & ~(mover | opponent)
+        if not empty:
+            return 0
+        if depth == 0:
+            return evaluate(geo, mover, opponent)
+
+        key = (mover, opponent)
+        entry = self.table.get(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, value, flag, tt_move = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                elif flag == UPPER:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        # A move that completes a line ends the game; no need to search it
+        if completing_cells(mover, empty, geo.win_masks):
+            return WIN_SCORE - ply
+
+        original_alpha = alpha
+        best_value, best_move = -WIN_SCORE * 2, None
+        for cell in self.ordered_moves(empty, tt_move):
+            value = -self.negamax(opponent, mover | 1 << cell, depth - 1, -beta, -alpha, ply + 1)
+            if value > best_value:
+                best_value, best_move = value, cell
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if best_value <= original_alpha:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (depth, best_value, flag, best_move)
+        return best_value
+
+    def root(self, mover, opponent, depth, first):
+        alpha, beta = -WIN_SCORE * 2, WIN_SCORE * 2
+        empty = self.geo.full & ~(mover | opponent)
+        best_value, best_move = None, None
+        for cell in self.ordered_moves(empty, first):
+            value = -self.negamax(opponent, mover | 1 << cell, depth - 1, -beta, -alpha, 1)
+            if best_value is None or value > best_value:
+                best_value, best_move = value, cell
+            alpha = max(alpha, value)
+        return best_value, best_move
+
+
+def search_move(geo, mover, opponent, time_budget):
+    """Best cell for the side to move, found within `time_budget` seconds"""
+    empty = geo.full & ~(mover | opponent)
+
+    # Take a win, or block the opponent's, without searching
+    for bits in (mover, opponent):
+        cells = completing_cells(bits, empty, geo.win_masks)
+        if cells:
+            return next(iter_cells(cells))
+
+    search = _Search(geo, time.monotonic() + time_budget)
+    best_move = search.ordered_moves(empty)[0]
+    for depth in range(1, empty.bit_count() + 1):
+        try:
+            value, move = search.root(mover, opponent, depth, best_move)
+        except _Timeout:
+            break
+        best_move = move
+        if abs(value) >= WIN_SCORE - search.geo.cells:
+            # Forced result found; deeper searches can't change it
+            break
+    return best_move
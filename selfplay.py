@@ -0,0 +1,249 @@
+"""Headless self-play for tuning the bot's strategy on the classic board
+
+Plays games in batches. Every game in a batch is a pair of 9-bit boards
+in NumPy arrays, and a strategy picks the moves for the whole batch at
+once with table lookups and array ops, so millions of games take
+seconds. Needs numpy (`pip install numpy`); the bot itself doesn't.
+
+    python selfplay.py                        # every strategy against random, heuristic and perfect
+    python selfplay.py --games 1000000 --seed 7
+    python selfplay.py --sweep heuristic      # grid over the old heuristic's constants
+    python selfplay.py --sweep mistakes       # grid over the random-move rate behind DIFFICULTIES
+    python selfplay.py --json results.json
+
+Strategies:
+
+- random: any empty cell.
+- heuristic: the bot's original hand-written strategy. It wins if it can
+  and blocks if it must. Otherwise it picks from a pool holding the
+  center (with probability `center`), one random corner (with
+  probability `corner`) and `pool` random cells.
+- perfect: a random optimal move from ai's solved table.
+- easy/medium/hard: perfect, except for a random move at DIFFICULTIES'
+  rate.
+
+Results are win/draw/loss percentages for the strategy on the left.
+Half of each matchup's games have it moving first. A seed always gives
+the same numbers.
+"""
+import argparse
+import itertools
+import json
+import time
+
+import numpy as np
+
+from ai import DIFFICULTIES, best_moves
+from engine import CELLS, CENTER, CORNERS, FULL, has_win, iter_cells
+
+DEFAULT_GAMES = 200_000  # per matchup
+BATCH = 250_000  # games played at once; bounds memory
+
+
+def _tables():
+    won = np.zeros(FULL + 1, bool)
+    threats = np.zeros(FULL + 1, np.int32)  # cells that would complete a line for these bits
+    count = np.zeros(FULL + 1, np.int32)
+    nth = np.zeros((FULL + 1, CELLS), np.int32)  # nth[mask, k]: the k-th set cell of mask
+    for bits in range(FULL + 1):
+        won[bits] = has_win(bits)
+        cells = list(iter_cells(bits))
+        count[bits] = len(cells)
+        nth[bits, :len(cells)] = cells
+        for cell in range(CELLS):
+            if has_win(bits | 1 << cell):
+                threats[bits] |= 1 << cell
+    return won, threats, count, nth
+
+
+def _perfect_table():
+    """best_moves for every reachable position, indexed by mover | opponent << CELLS"""
+    table = np.zeros(1 << 2 * CELLS, np.int32)
+    seen = set()
+    stack = [(0, 0)]
+    while stack:
+        mover, opponent = stack.pop()
+        key = mover | opponent << CELLS
+        if key in seen or has_win(opponent) or mover | opponent == FULL:
+            continue
+        seen.add(key)
+        table[key] = best_moves(mover, opponent)
+        for cell in iter_cells(FULL & ~(mover | opponent)):
+            stack.append((opponent, mover | 1 << cell))
+    return table
+
+
+_WON, _THREATS, _COUNT, _NTH = _tables()
+_PERFECT = None  # built on first use
+
+
+def random_cells(masks, rng):
+    """A uniformly random set cell of each mask (anything for empty masks)"""
+    picks = (rng.random(len(masks)) * _COUNT[masks]).astype(np.int32)
+    return _NTH[masks, picks]
+
+
+def first_cells(masks):
+    """The lowest set cell of each mask, the one a row-by-row scan finds first"""
+    return _NTH[masks, 0]
+
+
+class Random:
+    name = "random"
+
+    def __call__(self, mover, opponent, rng):
+        return random_cells(FULL & ~(mover | opponent), rng)
+
+
+class Heuristic:
+    """The rule-based bot that shipped before the solved table"""
+
+    def __init__(self, center=0.6, pool=(2, 3), corner=1.0, name=None):
+        self.center = center
+        self.pool = pool
+        self.corner = corner
+        self.name = name or f"heuristic(center={center:g}, pool={pool[0]}-{pool[1]}, corner={corner:g})"
+
+    def __call__(self, mover, opponent, rng):
+        n = len(mover)
+        empty = FULL & ~(mover | opponent)
+        corners = empty & CORNERS
+
+        with_center = (empty >> CENTER & 1).astype(bool) & (rng.random(n) < self.center)
+        with_corner = (corners != 0) & (rng.random(n) < self.corner)
+        size = with_center.astype(np.int32) + with_corner + rng.integers(self.pool[0], self.pool[1] + 1, n)
+        # Pool order: center, corner, then the random cells; an empty pool plays a random cell
+        pick = (rng.random(n) * size).astype(np.int32)
+        cells = random_cells(empty, rng)
+        cells = np.where(with_corner & (pick == with_center), random_cells(corners, rng), cells)
+        cells = np.where(with_center & (pick == 0), CENTER, cells)
+
+        block = _THREATS[opponent] & empty
+        cells = np.where(block != 0, first_cells(block), cells)
+        win = _THREATS[mover] & empty
+        return np.where(win != 0, first_cells(win), cells)
+
+
+class Mistakes:
+    """Perfect play, except a random move with probability `rate`, as ai.choose_move does"""
+
+    def __init__(self, rate, name=None):
+        self.rate = rate
+        self.name = name or f"mistakes({rate:g})"
+
+    def __call__(self, mover, opponent, rng):
+        global _PERFECT
+        if _PERFECT is None:
+            _PERFECT = _perfect_table()
+        empty = FULL & ~(mover | opponent)
+        cells = random_cells(_PERFECT[mover | opponent << CELLS], rng)
+        if self.rate:
+            cells = np.where(rng.random(len(mover)) < self.rate, random_cells(empty, rng), cells)
+        return cells
+
+
+def opponents():
+    return [Random(), Heuristic(name="heuristic"), Mistakes(0.0, "perfect")]
+
+
+def play(first, second, games, rng):
+    """Play `games` games of `first` (moving first) against `second`; returns (first wins, second wins, draws)"""
+    players = (first, second)
+    bits = np.zeros((2, games), np.int32)
+    live = np.arange(games)
+    wins = [0, 0]
+    for ply in range(CELLS):
+        side = ply % 2
+        mover = bits[side, live] | 1 << players[side](bits[side, live], bits[1 - side, live], rng)
+        bits[side, live] = mover
+        won = _WON[mover]
+        wins[side] += int(won.sum())
+        live = live[~won]
+        if not len(live):
+            break
+    return wins[0], wins[1], games - wins[0] - wins[1]
+
+
+def match(strategy, opponent, games=DEFAULT_GAMES, seed=1, batch=BATCH):
+    """Win/draw/loss percentages for `strategy`, overall and by who moved first"""
+    rng = np.random.default_rng(seed)
+    first = np.zeros(3, np.int64)  # strategy moved first: wins, draws, losses
+    second = np.zeros(3, np.int64)
+    for start in range(0, games, batch):
+        n = min(batch, games - start)
+        won, lost, drawn = play(strategy, opponent, n // 2, rng)
+        first += (won, drawn, lost)
+        lost, won, drawn = play(opponent, strategy, n - n // 2, rng)
+        second += (won, drawn, lost)
+
+    def percentages(counts):
+        total = int(counts.sum())
+        return dict(zip(("win", "draw", "loss"), (round(100 * int(c) / total, 2) for c in counts)))
+
+    return {"games": games, **percentages(first + second), "first": percentages(first), "second": percentages(second)}
+
+
+def heuristic_grid():
+    return [
+        Heuristic(center, pool, corner)
+        for center, pool, corner in itertools.product(
+            (0.0, 0.2, 0.4, 0.6, 0.8, 1.0), ((0, 0), (1, 1), (2, 3), (4, 6)), (0.0, 0.5, 1.0)
+        )
+    ]
+
+
+def mistakes_grid():
+    return [Mistakes(rate / 20) for rate in range(21)]
+
+
+def default_strategies():
+    return [Random(), Heuristic(name="heuristic")] + [
+        Mistakes(rate, name) for name, rate in DIFFICULTIES.items()
+    ]
+
+
+def run(strategies, games, seed):
+    """{strategy name: {opponent name: match results}}, printing a row per strategy"""
+    against = opponents()
+    width = max(len(strategy.name) for strategy in strategies)
+    print(f"{'':<{width}}  " + "  ".join(f"{'vs ' + opponent.name:>20}" for opponent in against))
+    print(f"{'':<{width}}  " + "  ".join(f"{'win/draw/loss %':>20}" for _ in against))
+    results = {}
+    for strategy in strategies:
+        row = results[strategy.name] = {
+            opponent.name: match(strategy, opponent, games, seed) for opponent in against
+        }
+        cells = [f"{r['win']:6.2f}/{r['draw']:6.2f}/{r['loss']:6.2f}" for r in row.values()]
+        print(f"{strategy.name:<{width}}  " + "  ".join(f"{cell:>20}" for cell in cells))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk self-play to measure and tune the bot's strategies")
+    parser.add_argument("--games", type=int, default=DEFAULT_GAMES, help="games per matchup")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--sweep", choices=("heuristic", "mistakes"),
+                        help="play a grid of heuristic constants or random-move rates instead")
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    strategies = {
+        None: default_strategies,
+        "heuristic": heuristic_grid,
+        "mistakes": mistakes_grid,
+    }[args.sweep]()
+
+    start = time.perf_counter()
+    results = run(strategies, args.games, args.seed)
+    elapsed = time.perf_counter() - start
+    played = args.games * len(strategies) * len(opponents())
+    print(f"\n{played:,} games in {elapsed:.1f}s ({played / elapsed * 60:,.0f} games/min)")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"games": args.games, "seed": args.seed, "results": results}, f, indent=2)
+        print(f"Saved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
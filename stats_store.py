@@ -0,0 +1,745 @@
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from headtohead import HeadToHead, dump_pairs, pair_result, pairs_path_for, read_pairs
+from metrics import counter, histogram
+from periods import KEEP_DAYS, PeriodBoards, roll, today
+from ratings import INITIAL_RATING, RankIndex, game_score, rate
+
+IO_SECONDS = histogram("ttt_stats_io_seconds", "Time spent loading and saving player stats", ["backend", "op"])
+WRITE_ERRORS = counter("ttt_background_write_errors_total", "Background writes that failed", ["writer"])
+
+
+def new_player_stats():
+    """Return an empty stats record for a player who hasn't played yet"""
+    return {
+        'wins': 0,
+        'losses': 0,
+        'draws': 0,
+        'games_played': 0,
+        'last_played': None,
+        'rating': INITIAL_RATING,
+        'days': []
+    }
+
+
+def apply_result(player_stats, won=False, draw=False, when=None):
+    """Bump a single player's counters, all-time and for the day, for one finished game"""
+    when = when or datetime.now()
+    player_stats['games_played'] += 1
+    player_stats['last_played'] = when.isoformat()
+    player_stats['days'] = roll(player_stats.get('days', []), when.toordinal(), won=won, draw=draw)
+
+    if won:
+        player_stats['wins'] += 1
+    elif draw:
+        player_stats['draws'] += 1
+    else:
+        player_stats['losses'] += 1
+
+
+def win_rate(player_stats):
+    """Win rate percentage, as shown on the leaderboard"""
+    if player_stats['games_played'] == 0:
+        return 0.0
+    return (player_stats['wins'] / player_stats['games_played']) * 100
+
+
+def game_results(player1, player2, winner_id=None):
+    """Expand one finished game into (player_id, won, draw) rows"""
+    if winner_id is None:
+        return [(player1, False, True), (player2, False, True)]
+    loser_id = player2 if winner_id == player1 else player1
+    return [(winner_id, True, False), (loser_id, False, False)]
+
+
+def apply_game(stats, player1, player2, winner_id=None, when=None):
+    """Fold one finished game into a {player_id: stats} dict: both ratings, then the counters"""
+    records = []
+    for player_id in (player1, player2):
+        player_stats = stats.get(str(player_id))
+        if player_stats is None:
+            player_stats = stats[str(player_id)] = new_player_stats()
+        records.append(player_stats)
+    records[0]['rating'], records[1]['rating'] = rate(
+        records[0].get('rating', INITIAL_RATING), records[1].get('rating', INITIAL_RATING),
+        game_score(player1, player2, winner_id)
+    )
+    for player_id, won, draw in game_results(player1, player2, winner_id):
+        apply_result(stats[str(player_id)], won=won, draw=draw, when=when)
+
+
+def write_json_atomic(path, data, indent=2):
+    """Write data as JSON to a temp file next to path, then rename it into place"""
+    write_atomic(path, lambda f: json.dump(data, f, indent=indent))
+
+
+def write_atomic(path, write, binary=False):
+    """Call write(f) on a temp file next to path, then sync it and rename it into place"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb' if binary else 'w') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class BackgroundWriter:
+    """One worker thread running writes in the order they were submitted; failures are logged and counted"""
+
+    def __init__(self, name, what):
+        self.name = name
+        self.what = what  # finishes "Failed to ..." in the log
+        self.last = None  # future of the newest write
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    def submit(self, fn, *args):
+        """Queue fn(*args) behind every earlier write; returns its concurrent.futures.Future"""
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._report)
+        self.last = future
+        return future
+
+    def _report(self, future):
+        error = None if future.cancelled() else future.exception()
+        if error is not None:
+            WRITE_ERRORS.inc(writer=self.name)
+            print(f"Failed to {self.what}: {error}")
+
+    async def flush(self):
+        # Writes run in order, so waiting on the newest one covers the rest
+        if self.last is not None:
+            await asyncio.wrap_future(self.last)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+class StatsStore:
+    """Interface shared by the stats backends
+
+    `get`, `top` and `all` return dicts shaped like `new_player_stats()`;
+    player ids are accepted as ints or strings and returned as strings.
+    Every player who has played is kept in `ranks`, a RankIndex by rating,
+    and in `periods`, a PeriodBoards, while they have results this day,
+    week or month.
+    Functions in `listeners` are called with (old position, new position)
+    whenever a ranked player's row changes, or (None, None) when every
+    row may have.
+    """
+
+    def load(self):
+        """Prepare the backend; called once at startup"""
+
+    def start(self):
+        """Start any background work; called from the running event loop"""
+
+    async def flush(self):
+        """Make sure every recorded result is on disk"""
+
+    async def close(self):
+        """Flush and release resources"""
+        await self.flush()
+
+    def get(self, player_id):
+        """Return a player's stats, or None if they haven't played"""
+        raise NotImplementedError
+
+    def top(self, limit, offset=0):
+        """Return up to `limit` (player_id, stats) pairs in leaderboard order from 0-based `offset`"""
+        raise NotImplementedError
+
+    def head_to_head(self, player_id, opponent_id):
+        """Return (player's wins, opponent's wins, draws) in games between the two"""
+        raise NotImplementedError
+
+    def rank(self, player_id):
+        """Return (position, rated players) for a player, or None if they haven't played"""
+        position = self.ranks.rank(str(player_id))
+        return None if position is None else (position, len(self.ranks))
+
+    def all(self):
+        """Return every player's stats as a {player_id: stats} dict"""
+        raise NotImplementedError
+
+    def settled(self, player_ids):
+        """Whether reads already see every result recorded for these players"""
+        return True
+
+    def record_game(self, player1, player2, winner_id=None):
+        """Record both players' results for one game as a single write"""
+        raise NotImplementedError
+
+    def record_games(self, games):
+        """Record (player1, player2, winner_id) games in order, as one write where the backend can"""
+        for player1, player2, winner_id in games:
+            self.record_game(player1, player2, winner_id)
+
+    def replace(self, stats):
+        """Swap in a whole new {player_id: stats} dict"""
+        raise NotImplementedError
+
+    def _index(self, stats):
+        self.ranks = RankIndex(
+            (str(player_id), s.get('rating', INITIAL_RATING)) for player_id, s in stats.items() if s['games_played'] > 0
+        )
+        for listener in self.listeners:
+            listener(None, None)
+        self.periods.build((str(player_id), s.get('days', [])) for player_id, s in stats.items())
+
+    def _rerank(self, player_id, rating):
+        old_position, new_position = self.ranks.set(player_id, rating)
+        for listener in self.listeners:
+            listener(old_position, new_position)
+
+
+class JsonStatsStore(StatsStore):
+    """Player statistics kept in memory and written to disk in batches
+
+    The JSON file is parsed once by `load()`. After that every update only
+    touches the resident dict; the file is rewritten off the event loop once
+    `flush_every` updates are pending, every `flush_interval` seconds while
+    anything is pending, and on `close()`.
+
+    A corrupt file is moved aside rather than overwritten, and `recover`
+    (if given) supplies the stats to start from instead.
+
+    Head-to-head records are a HeadToHead kept beside the stats, updated
+    with them in `record_game` and saved to `pairs_path` by the same
+    flush. `recover_pairs` (if given) supplies them when that file is
+    missing or damaged.
+    """
+
+    def __init__(self, path, flush_every=50, flush_interval=30.0, recover=None, recover_pairs=None):
+        self.path = path
+        self.pairs_path = pairs_path_for(path)
+        self.recover = recover
+        self.recover_pairs = recover_pairs
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.stats = {}
+        self.pairs = HeadToHead()
+        self.ranks = RankIndex()
+        self.periods = PeriodBoards()
+        self.listeners = []
+        self._pending = 0
+        self._pairs_changed = False
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+        self._timer_task = None
+
+    def load(self):
+        self._pending = 0
+        # A missing file starts empty
+        try:
+            with IO_SECONDS.time(backend="json", op="load"), open(self.path, 'r') as f:
+                self.stats = json.load(f)
+        except FileNotFoundError:
+            self.stats = {}
+        except json.JSONDecodeError as e:
+            # Keep the damaged file for inspection; the next flush would overwrite it
+            broken = f"{self.path}.corrupt-{datetime.now():%Y%m%d-%H%M%S}"
+            os.replace(self.path, broken)
+            print(f"{self.path} is corrupt ({e}); moved it to {broken}")
+            self.stats = self.recover() if self.recover is not None else {}
+            if self.recover is not None:
+                print(f"Recovered stats for {len(self.stats)} players")
+                self._pending = 1
+        self._index(self.stats)
+        self._load_pairs()
+        return self.stats
+
+    def _load_pairs(self):
+        try:
+            with IO_SECONDS.time(backend="json", op="load_pairs"):
+                self.pairs = read_pairs(self.pairs_path)
+            missing = not self.pairs and self.stats and not os.path.exists(self.pairs_path)
+        except ValueError as e:
+            broken = f"{self.pairs_path}.corrupt-{datetime.now():%Y%m%d-%H%M%S}"
+            os.replace(self.pairs_path, broken)
+            print(f"{e}; moved it to {broken}")
+            missing = True
+        if missing and self.recover_pairs is not None:
+            self.pairs = self.recover_pairs()
+            print(f"Recovered head-to-head records for {len(self.pairs)} pairs")
+            self._pairs_changed = True
+            self._pending += 1
+
+    def get(self, player_id):
+        return self.stats.get(str(player_id))
+
+    def head_to_head(self, player_id, opponent_id):
+        return self.pairs.get(player_id, opponent_id)
+
+    def top(self, limit, offset=0):
+        return [(player_id, self.stats[player_id]) for player_id, _ in self.ranks.top(limit, offset)]
+
+    def all(self):
+        return self.stats
+
+    def _apply_game(self, player1, player2, winner_id, when):
+        apply_game(self.stats, player1, player2, winner_id, when)
+        for player_id in (str(player1), str(player2)):
+            self._rerank(player_id, self.stats[player_id]['rating'])
+            self.periods.update(player_id, self.stats[player_id]['days'], when.toordinal())
+        self.pairs.record(player1, player2, winner_id)
+        self._pairs_changed = True
+
+    def record_game(self, player1, player2, winner_id=None):
+        self._apply_game(player1, player2, winner_id, datetime.now())
+        self._mark_dirty()
+
+    def record_games(self, games):
+        when = datetime.now()
+        for player1, player2, winner_id in games:
+            self._apply_game(player1, player2, winner_id, when)
+        if games:
+            self._mark_dirty(len(games))
+
+    def replace(self, stats):
+        self.stats = stats
+        self._index(stats)
+        self._mark_dirty()
+
+    def _mark_dirty(self, changes=1):
+        self._pending += changes
+        if self._pending >= self.flush_every:
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._flush_task is not None and not self._flush_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (scripts, tests); the next flush() picks it up
+            return
+        self._flush_task = loop.create_task(self.flush())
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            # Copy on the loop so the writer thread never sees a dict mid-update
+            with IO_SECONDS.time(backend="json", op="snapshot"):
+                snapshot = {player_id: dict(s) for player_id, s in self.stats.items()}
+                pairs = HeadToHead(dict(self.pairs.pairs)) if self._pairs_changed else None
+            pending, self._pending = self._pending, 0
+            self._pairs_changed = False
+            try:
+                with IO_SECONDS.time(backend="json", op="save"):
+                    await asyncio.to_thread(self._save, snapshot, pairs)
+            except Exception:
+                self._pending += pending
+                self._pairs_changed = self._pairs_changed or pairs is not None
+                raise
+
+    def _save(self, snapshot, pairs):
+        write_json_atomic(self.path, snapshot)
+        if pairs is not None:
+            write_atomic(self.pairs_path, lambda f: dump_pairs(pairs, f), binary=True)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                # Keep flushing: the results stay pending for the next try
+                WRITE_ERRORS.inc(writer="stats-json")
+                print("Failed to save player stats:")
+                traceback.print_exc()
+
+    def start(self):
+        if self._timer_task is None:
+            self._timer_task = asyncio.get_running_loop().create_task(self._flush_periodically())
+
+    async def close(self):
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+            self._timer_task = None
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        await self.flush()
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS player_stats (
+    player_id INTEGER PRIMARY KEY,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    games_played INTEGER NOT NULL DEFAULT 0,
+    last_played TEXT,
+    rating REAL NOT NULL DEFAULT 1500,
+    days TEXT
+);
+DROP INDEX IF EXISTS player_stats_rank;
+CREATE TABLE IF NOT EXISTS head_to_head (
+    low INTEGER NOT NULL,
+    high INTEGER NOT NULL,
+    low_wins INTEGER NOT NULL DEFAULT 0,
+    high_wins INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (low, high)
+) WITHOUT ROWID;
+"""
+
+SQLITE_PAIR_UPSERT = """
+INSERT INTO head_to_head (low, high, low_wins, high_wins, draws) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (low, high) DO UPDATE SET
+    low_wins = low_wins + excluded.low_wins,
+    high_wins = high_wins + excluded.high_wins,
+    draws = draws + excluded.draws
+"""
+
+SQLITE_UPSERT = """
+INSERT INTO player_stats (player_id, wins, losses, draws, games_played, last_played, rating, days)
+VALUES (:player_id, :wins, :losses, :draws, 1, :last_played, :rating, :days)
+ON CONFLICT (player_id) DO UPDATE SET
+    wins = wins + excluded.wins,
+    losses = losses + excluded.losses,
+    draws = draws + excluded.draws,
+    games_played = games_played + 1,
+    last_played = excluded.last_played,
+    rating = excluded.rating,
+    days = excluded.days
+"""
+
+SQLITE_COLUMNS = "player_id, wins, losses, draws, games_played, last_played, rating, days"
+
+
+def _row_to_stats(row):
+    player_id, wins, losses, draws, games_played, last_played, rating, days = row
+    return str(player_id), {
+        'wins': wins,
+        'losses': losses,
+        'draws': draws,
+        'games_played': games_played,
+        'last_played': last_played,
+        'rating': rating,
+        'days': json.loads(days) if days else []
+    }
+
+
+class SqliteStatsStore(StatsStore):
+    """Player statistics in a SQLite database
+
+    Writes go through one connection owned by a single worker thread, so
+    results land in order and never block the event loop; each game is one
+    transaction. Reads use a second connection, which WAL mode lets run
+    alongside the writer. Ratings are also held in memory in `ranks`, so
+    new ratings need no read, and ranks and the leaderboard order never
+    touch the database. So are the day buckets of everyone who played in
+    the last KEEP_DAYS days, in `days`, which answer reads before the
+    writer catches up. New players are kept in `unwritten` until the
+    writer commits their first row, so they're never missing from a read.
+    Head-to-head records stay on disk only, in a table keyed by the
+    ordered pair and written in the game's transaction.
+    """
+
+    def __init__(self, path, import_from=None):
+        self.path = path
+        self.import_from = import_from
+        self._writer = None
+        self._reader = None
+        self._writes = BackgroundWriter("stats-sqlite", "save player stats")
+        self.days = {}  # {player_id: day buckets} for recent players
+        self._days_pruned = None
+        self.unwritten = {}  # {player_id: stats} for ranked players the writer hasn't created a row for yet
+        self._queued = 0  # writes submitted
+        self._committed = 0  # writes finished, set by the writer thread
+        self._queued_at = {}  # {player_id: number of the newest write with their results}
+        self.ranks = RankIndex()
+        self.periods = PeriodBoards()
+        self.listeners = []
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self):
+        with IO_SECONDS.time(backend="sqlite", op="load"):
+            self._load()
+
+    def _load(self):
+        self._writer = self._connect()
+        self._writer.executescript(SQLITE_SCHEMA)
+        columns = [row[1] for row in self._writer.execute("PRAGMA table_info(player_stats)")]
+        if 'rating' not in columns:
+            # Databases from before ratings: everyone starts at the initial rating
+            with self._writer:
+                self._writer.execute(f"ALTER TABLE player_stats ADD COLUMN rating REAL NOT NULL DEFAULT {INITIAL_RATING}")
+        if 'days' not in columns:
+            # Databases from before period stats: nobody has any yet
+            with self._writer:
+                self._writer.execute("ALTER TABLE player_stats ADD COLUMN days TEXT")
+        if 'win_rate' in columns:
+            # Databases from when the leaderboard sorted by wins; ratings rank players now
+            try:
+                with self._writer:
+                    self._writer.execute("ALTER TABLE player_stats DROP COLUMN win_rate")
+            except sqlite3.OperationalError:
+                pass  # SQLite before 3.35; the column has a default, so it can just sit there
+        self._reader = self._connect()
+
+        if self.import_from and os.path.exists(self.import_from):
+            empty = self._reader.execute("SELECT 1 FROM player_stats LIMIT 1").fetchone() is None
+            if empty:
+                count = self.import_json(self.import_from)
+                print(f"Imported {count} players from {self.import_from}")
+
+        self.ranks = RankIndex(
+            (str(player_id), rating) for player_id, rating in
+            self._reader.execute("SELECT player_id, rating FROM player_stats WHERE games_played > 0")
+        )
+        for listener in self.listeners:
+            listener(None, None)
+        self.days = {
+            str(player_id): json.loads(days) for player_id, days in
+            self._reader.execute("SELECT player_id, days FROM player_stats WHERE days IS NOT NULL")
+        }
+        self._prune_days(today())
+        self.periods.build(self.days.items())
+
+    def _prune_days(self, day):
+        """Forget the buckets of players who haven't played for KEEP_DAYS; at most once a day"""
+        if day != self._days_pruned:
+            self.days = {
+                player_id: days for player_id, days in self.days.items() if days and days[-1][0] > day - KEEP_DAYS
+            }
+            self._days_pruned = day
+            committed = self._committed
+            self._queued_at = {player_id: write for player_id, write in self._queued_at.items() if write > committed}
+
+    def import_json(self, json_path):
+        """Copy every player, and the head-to-head records beside them, from a player_stats.json file"""
+        with open(json_path, 'r') as f:
+            stats = json.load(f)
+        self._replace_all(stats, read_pairs(pairs_path_for(json_path)))
+        return len(stats)
+
+    def _with_days(self, player_id, player_stats):
+        # The database may not have the newest buckets yet
+        player_stats['days'] = self.days.get(player_id, player_stats['days'])
+        return player_stats
+
+    def _buffered(self, player_ids):
+        """Copies of the unwritten stats of any of player_ids
+
+        Taken before reading the database: the writer only forgets a player
+        here once their row is committed, so each player turns up in one
+        place or the other.
+        """
+        buffered = {}
+        for player_id in player_ids:
+            # One lookup: the writer may pop the entry at any moment
+            player_stats = self.unwritten.get(player_id)
+            if player_stats is not None:
+                buffered[player_id] = dict(player_stats)
+        return buffered
+
+    def get(self, player_id):
+        buffered = self._buffered([str(player_id)])
+        row = self._reader.execute(
+            f"SELECT {SQLITE_COLUMNS} FROM player_stats WHERE player_id = ?", (int(player_id),)
+        ).fetchone()
+        if row is None:
+            return buffered.get(str(player_id))
+        return self._with_days(*_row_to_stats(row))
+
+    def head_to_head(self, player_id, opponent_id):
+        player_id, opponent_id = int(player_id), int(opponent_id)
+        low, high = sorted((player_id, opponent_id))
+        row = self._reader.execute(
+            "SELECT low_wins, high_wins, draws FROM head_to_head WHERE low = ? AND high = ?", (low, high)
+        ).fetchone()
+        if row is None:
+            return 0, 0, 0
+        return row if player_id == low else (row[1], row[0], row[2])
+
+    def top(self, limit, offset=0):
+        player_ids = [player_id for player_id, _ in self.ranks.top(limit, offset)]
+        if not player_ids:
+            return []
+        buffered = self._buffered(player_ids)
+        rows = self._reader.execute(
+            f"SELECT {SQLITE_COLUMNS} FROM player_stats WHERE player_id IN ({','.join('?' * len(player_ids))})",
+            [int(player_id) for player_id in player_ids]
+        ).fetchall()
+        found = dict(_row_to_stats(row) for row in rows)
+        # A new player's first results may still be queued for the writer
+        return [
+            (player_id, self._with_days(player_id, found[player_id]) if player_id in found else buffered[player_id])
+            for player_id in player_ids
+        ]
+
+    def all(self):
+        rows = self._reader.execute(f"SELECT {SQLITE_COLUMNS} FROM player_stats").fetchall()
+        return dict(_row_to_stats(row) for row in rows)
+
+    def settled(self, player_ids):
+        committed = self._committed
+        return all(self._queued_at.get(player_id, 0) <= committed for player_id in player_ids)
+
+    def _upsert(self, results, when, ratings, days, pair=None):
+        last_played = when.isoformat()
+        if pair is not None:
+            self._writer.execute(SQLITE_PAIR_UPSERT, pair)
+        self._writer.executemany(SQLITE_UPSERT, [
+            {
+                'player_id': int(player_id),
+                'wins': int(won),
+                'losses': int(not won and not draw),
+                'draws': int(draw),
+                'last_played': last_played,
+                'rating': ratings[player_id],
+                'days': json.dumps(days[player_id])
+            }
+            for player_id, won, draw in results
+        ])
+
+    def _write_results(self, results, when, ratings, days, pair=None):
+        with IO_SECONDS.time(backend="sqlite", op="save"), self._writer:
+            self._upsert(results, when, ratings, days, pair)
+        self._written(results)
+
+    def _write_games(self, writes):
+        """Several games' _write_results arguments, in order, in one transaction"""
+        with IO_SECONDS.time(backend="sqlite", op="save"), self._writer:
+            for write in writes:
+                self._upsert(*write)
+        for write in writes:
+            self._written(write[0])
+
+    def _written(self, results):
+        # On the writer thread, once the rows are committed
+        for player_id, _, _ in results:
+            self.unwritten.pop(player_id, None)
+
+    def _buffer(self, results, when, ratings):
+        """Keep the stats of players with no row yet; call before they're ranked"""
+        for player_id, won, draw in results:
+            player_stats = self.unwritten.get(player_id)
+            if player_stats is None:
+                if player_id in self.ranks:
+                    continue
+                player_stats = self.unwritten[player_id] = new_player_stats()
+            apply_result(player_stats, won=won, draw=draw, when=when)
+            player_stats['rating'] = ratings[player_id]
+
+    def _replace_all(self, stats, pairs=None):
+        """Swap in every player's row, and every pair's if `pairs` is given, in one transaction"""
+        with self._writer:
+            if pairs is not None:
+                self._writer.execute("DELETE FROM head_to_head")
+                self._writer.executemany(SQLITE_PAIR_UPSERT, pairs.rows())
+            self._writer.execute("DELETE FROM player_stats")
+            self._writer.executemany(
+                "INSERT INTO player_stats (player_id, wins, losses, draws, games_played, last_played, rating, days) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (int(player_id), s['wins'], s['losses'], s['draws'], s['games_played'],
+                     s.get('last_played'), s.get('rating', INITIAL_RATING),
+                     json.dumps(s['days']) if s.get('days') else None)
+                    for player_id, s in stats.items()
+                ]
+            )
+
+    def _submit(self, fn, *args):
+        self._queued += 1
+        future = self._writes.submit(fn, *args)
+        future.add_done_callback(lambda _, write=self._queued: setattr(self, '_committed', write))
+
+    def _roll_days(self, results, day):
+        self._prune_days(day)
+        days = {}
+        for player_id, won, draw in results:
+            days[player_id] = self.days[player_id] = roll(self.days.get(player_id, []), day, won=won, draw=draw)
+            self.periods.update(player_id, days[player_id], day)
+        return days
+
+    def _game_write(self, player1, player2, winner_id, when):
+        """Rate and index one game; returns its _write_results arguments"""
+        player1, player2 = str(player1), str(player2)
+        if winner_id is not None:
+            winner_id = str(winner_id)
+        ratings = dict(zip((player1, player2), rate(
+            self.ranks.get(player1), self.ranks.get(player2), game_score(player1, player2, winner_id)
+        )))
+        results = game_results(player1, player2, winner_id)
+        self._buffer(results, when, ratings)
+        for player_id in ratings:
+            # Goes out with the next _submit
+            self._queued_at[player_id] = self._queued + 1
+        for player_id, rating in ratings.items():
+            self._rerank(player_id, rating)
+        return (
+            results, when, ratings, self._roll_days(results, when.toordinal()),
+            pair_result(player1, player2, winner_id)
+        )
+
+    def record_game(self, player1, player2, winner_id=None):
+        self._submit(self._write_results, *self._game_write(player1, player2, winner_id, datetime.now()))
+
+    def record_games(self, games):
+        when = datetime.now()
+        writes = [self._game_write(player1, player2, winner_id, when) for player1, player2, winner_id in games]
+        if writes:
+            self._submit(self._write_games, writes)
+
+    def replace(self, stats):
+        self.days = {str(player_id): s['days'] for player_id, s in stats.items() if s.get('days')}
+        self._days_pruned = None
+        self._prune_days(today())
+        self.unwritten = {}
+        self._index(stats)
+        self._submit(self._replace_all, {player_id: dict(s) for player_id, s in stats.items()})
+
+    async def flush(self):
+        await self._writes.flush()
+
+    async def close(self):
+        await asyncio.gather(self.flush(), return_exceptions=True)
+        self._writes.shutdown()
+        for conn in (self._reader, self._writer):
+            if conn is not None:
+                conn.close()
+
+
+def open_stats_store(backend, json_path, sqlite_path, recover=None, recover_pairs=None):
+    """Create the stats store named by `backend` ("json" or "sqlite")"""
+    if backend == "json":
+        return JsonStatsStore(json_path, recover=recover, recover_pairs=recover_pairs)
+    if backend == "sqlite":
+        return SqliteStatsStore(sqlite_path, import_from=json_path)
+    raise ValueError(f"Unknown stats backend: {backend!r}")
+
+
+if __name__ == "__main__":
+    # One-shot import: python stats_store.py player_stats.json player_stats.db
+    if len(sys.argv) != 3:
+        print("Usage: python stats_store.py <stats.json> <stats.db>")
+        sys.exit(1)
+
+    store = SqliteStatsStore(sys.argv[2])
+    store.load()
+    print(f"Imported {store.import_json(sys.argv[1])} players into {sys.argv[2]}")
+    asyncio.run(store.close())
@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from ai import best_moves, choose_move
+from engine import FULL, Board, has_win, iter_cells
+
+
+def worst_result(bot, opponent, bot_to_move):
+    """The bot's worst result (1 win, 0 draw, -1 loss) over every optimal move it has and every reply"""
+    empty = FULL & ~(bot | opponent)
+    if bot_to_move:
+        moves = best_moves(bot, opponent)
+        assert moves and moves & ~empty == 0
+        results = []
+        for cell in iter_cells(moves):
+            played = bot | 1 << cell
+            if has_win(played):
+                results.append(1)
+            else:
+                results.append(0 if played | opponent == FULL else worst_result(played, opponent, False))
+        return min(results)
+    results = []
+    for cell in iter_cells(empty):
+        played = opponent | 1 << cell
+        if has_win(played):
+            results.append(-1)
+        else:
+            results.append(0 if bot | played == FULL else worst_result(bot, played, True))
+    return min(results)
+
+
+@pytest.mark.parametrize("bot_first", [True, False])
+def test_perfect_play_never_loses(bot_first):
+    assert worst_result(0, 0, bot_first) == 0
+
+
+def test_perfect_difficulty_only_picks_table_moves():
+    rng = random.Random(1)
+    board = Board()
+    board.play(4, 0)
+    for _ in range(50):
+        assert best_moves(board.bits(1), board.bits(0)) >> choose_move(board, 1, "perfect", rng=rng) & 1
+
+
+def test_the_table_takes_a_win_and_blocks_a_loss():
+    # ⭕ to move against ❌ on 0 and 1: with 3 and 4 it wins on 5, with only 3 it must block 2
+    assert best_moves(0b000011000, 0b000000011) == 1 << 5
+    assert best_moves(0b000001000, 0b000000011) == 1 << 2
@@ -0,0 +1,42 @@
+import pytest
+
+from headtohead import MAGIC, HeadToHead, dump_pairs, pairs_path_for, read_pairs
+
+BIG = 2**63 + 5  # Discord ids use the full 64 bits
+
+
+def filled():
+    pairs = HeadToHead()
+    pairs.record(1, 2, 1)
+    pairs.record(2, 1, None)
+    pairs.record(2, 1, 2)
+    pairs.record(BIG, 3, BIG)
+    return pairs
+
+
+def test_records_read_from_either_side():
+    pairs = filled()
+    assert pairs.get(1, 2) == (1, 1, 1)
+    assert pairs.get(2, 1) == (1, 1, 1)
+    assert pairs.get(BIG, 3) == (1, 0, 0)
+    assert pairs.get(3, BIG) == (0, 1, 0)
+    assert pairs.get(1, 3) == (0, 0, 0)
+
+
+def test_pairs_survive_a_round_trip(tmp_path):
+    path = tmp_path / "stats.h2h"
+    with open(path, 'wb') as f:
+        dump_pairs(filled(), f)
+    assert read_pairs(str(path)).pairs == filled().pairs
+
+
+def test_a_missing_file_is_empty_and_a_damaged_one_raises(tmp_path):
+    assert len(read_pairs(str(tmp_path / "missing.h2h"))) == 0
+    path = tmp_path / "stats.h2h"
+    path.write_bytes(MAGIC + b"\0" * 7)
+    with pytest.raises(ValueError):
+        read_pairs(str(path))
+
+
+def test_pairs_sit_next_to_the_stats_file():
+    assert pairs_path_for("data/player_stats.json") == "data/player_stats.h2h"
@@ -0,0 +1,78 @@
+import asyncio
+import os
+from datetime import datetime
+
+from engine import Board
+from history import ACTIVE, GameLog, find_game, rebuild_head_to_head, rebuild_stats, replay, segments
+from stats_store import apply_game, new_player_stats
+
+ENDED = 1_700_000_000.0
+
+
+def entry(game, players, winner, how="won", moves="040008"):
+    return {
+        "game": game, "kind": "classic", "size": 3, "win_length": 3, "bot": False,
+        "players": players, "first": 0, "moves": moves, "winner": winner, "how": how,
+        "started": ENDED - 60, "ended": ENDED + game
+    }
+
+
+ENTRIES = [
+    entry(1, [1, 2], 1),
+    entry(2, [2, 3], None, "drawn"),
+    entry(3, [1, 3], None, "ended"),
+    entry(4, [3, 1], 3),
+    entry(5, [1, 2], 2, moves="0102"),
+]
+
+
+def write_log(directory, entries, compact_bytes=16 * 2**20, baseline=None):
+    log = GameLog(str(directory), flush_every=2, compact_bytes=compact_bytes)
+    log.open(baseline)
+    for logged in entries:
+        log.append(logged)
+    asyncio.run(log.close())
+    return log
+
+
+def expected(baseline=None):
+    stats = {player_id: dict(s) for player_id, s in (baseline or {}).items()}
+    for logged in ENTRIES:
+        if logged["how"] in ("won", "drawn"):
+            apply_game(stats, *logged["players"], logged["winner"], datetime.fromtimestamp(logged["ended"]))
+    return stats
+
+
+def test_rebuild_replays_counted_games_onto_the_baseline(tmp_path):
+    baseline = {"1": {**new_player_stats(), 'wins': 4, 'games_played': 4}}
+    write_log(tmp_path, ENTRIES, baseline=lambda: baseline)
+    assert rebuild_stats(str(tmp_path)) == expected(baseline)
+    assert rebuild_stats(str(tmp_path), from_scratch=True) == expected(baseline)
+
+
+def test_compaction_keeps_every_game(tmp_path):
+    # Small enough that every flush rolls the log into a segment
+    write_log(tmp_path, ENTRIES, compact_bytes=1)
+    assert [path.endswith(".gz") for _, path in segments(str(tmp_path))] == [True] * 3
+    assert rebuild_stats(str(tmp_path)) == expected()
+    assert rebuild_stats(str(tmp_path), from_scratch=True) == expected()
+    assert rebuild_head_to_head(str(tmp_path)).get(1, 2) == (1, 1, 0)
+    assert find_game(str(tmp_path), 4)["winner"] == 3
+
+
+def test_a_torn_last_line_is_trimmed(tmp_path):
+    write_log(tmp_path, ENTRIES[:2])
+    with open(os.path.join(tmp_path, ACTIVE), 'a') as f:
+        f.write('{"game": 9, "kind"')
+    log = write_log(tmp_path, ENTRIES[2:])
+    assert log.size == os.path.getsize(os.path.join(tmp_path, ACTIVE))
+    assert [logged["game"] for logged in (find_game(str(tmp_path), game) for game in range(1, 6))] == [1, 2, 3, 4, 5]
+    assert find_game(str(tmp_path), 9) is None
+
+
+def test_replay_follows_the_moves():
+    steps = list(replay(ENTRIES[0]))
+    assert [(player_id, move) for player_id, move, _ in steps] == [(1, 4), (2, 0), (1, 8)]
+    board = steps[-1][2]
+    assert isinstance(board, Board)
+    assert board.side_at(4) == board.side_at(8) == 0 and board.side_at(0) == 1
@@ -0,0 +1,42 @@
+from leaderboard import PageCache, page_count, page_of
+
+
+def filled(pages=5):
+    cache = PageCache(page_size=10)
+    for page in range(pages):
+        cache.put(page, f"page {page}", cache.generation)
+    return cache
+
+
+def test_page_math():
+    assert page_of(1) == 0
+    assert page_of(10) == 0
+    assert page_of(11) == 1
+    assert page_count(0) == 1
+    assert page_count(21) == 3
+
+
+def test_a_move_drops_only_the_pages_between_the_positions():
+    cache = filled()
+    cache.rows_changed(40, 12)
+    assert sorted(cache.pages) == [0, 4]
+
+
+def test_a_new_player_drops_their_page_and_everything_below():
+    cache = filled()
+    cache.rows_changed(None, 25)
+    assert sorted(cache.pages) == [0, 1]
+
+
+def test_a_rebuild_drops_everything():
+    cache = filled()
+    cache.rows_changed(None, None)
+    assert len(cache) == 0
+
+
+def test_a_page_rendered_across_a_change_is_not_kept():
+    cache = filled(0)
+    generation = cache.generation
+    cache.rows_changed(3, 2)
+    cache.put(0, "stale", generation)
+    assert cache.get(0) is None
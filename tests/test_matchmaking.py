@@ -0,0 +1,81 @@
+from matchmaking import MatchQueue
+
+
+def make():
+    return MatchQueue(bucket_width=50, base_tolerance=100, widen_per_second=5, max_tolerance=400, timeout=300)
+
+
+def test_tolerance_widens_with_waiting_up_to_the_cap():
+    queue = make()
+    queue.join(1, 1500, 10, now=0)
+    entry = queue.get(1)
+    assert queue.tolerance(entry, now=0) == 100
+    assert queue.tolerance(entry, now=10) == 150
+    assert queue.tolerance(entry, now=1000) == 400
+
+
+def test_close_ratings_match_on_join():
+    queue = make()
+    assert queue.join(1, 1500, 10, now=0) is None
+    opponent, entry = queue.join(2, 1580, 10, now=1)
+    assert (opponent.player_id, entry.player_id) == (1, 2)
+    assert len(queue) == 0
+
+
+def test_distant_ratings_wait_until_tolerance_widens():
+    queue = make()
+    queue.join(1, 1500, 10, now=0)
+    assert queue.join(2, 1700, 10, now=0) is None
+    assert queue.match_waiting(now=10) == []
+    # 100 + 5 * 20 reaches the 200 point gap
+    pairs = queue.match_waiting(now=20)
+    assert [(first.player_id, second.player_id) for first, second in pairs] == [(1, 2)]
+    assert len(queue) == 0
+
+
+def test_beyond_max_tolerance_never_matches():
+    queue = make()
+    queue.join(1, 1000, 10, now=0)
+    queue.join(2, 1500, 10, now=0)
+    assert queue.match_waiting(now=299) == []
+
+
+def test_closest_rating_is_preferred():
+    queue = make()
+    queue.join(1, 1400, 10, now=0)
+    queue.join(2, 1590, 10, now=0)
+    opponent, _ = queue.join(3, 1560, 10, now=1)
+    assert opponent.player_id == 2
+
+
+def test_allowed_can_veto_a_pair():
+    queue = make()
+    queue.join(1, 1500, 10, now=0)
+    assert queue.join(2, 1500, 10, now=0, allowed=lambda first, second: False) is None
+    assert len(queue) == 2
+
+
+def test_expire_takes_the_longest_waiting_first():
+    queue = make()
+    queue.join(1, 1000, 10, now=0)
+    queue.join(2, 2000, 10, now=100)
+    assert [entry.player_id for entry in queue.expire(now=350)] == [1]
+    assert 2 in queue
+
+
+def test_leave():
+    queue = make()
+    queue.join(1, 1500, 10, now=0)
+    assert queue.leave(1).player_id == 1
+    assert queue.leave(1) is None
+    assert len(queue) == 0
+
+
+def test_requeue_keeps_the_original_place_in_line():
+    queue = make()
+    queue.join(1, 1000, 10, now=0)
+    queue.join(2, 2000, 10, now=5)
+    entry = queue.leave(1)
+    queue.requeue(entry)
+    assert list(queue.waiting) == [1, 2]
+    assert [expired.player_id for expired in queue.expire(now=302)] == [1]
@@ -0,0 +1,94 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+from outbox import EditScheduler
+
+
+class Message:
+    """Records the edits it gets; `fail` holds errors to raise on the next edits"""
+
+    def __init__(self, fail=()):
+        self.edits = []
+        self.fail = list(fail)
+
+    async def edit(self, **kwargs):
+        await asyncio.sleep(0.01)
+        if self.fail:
+            raise self.fail.pop(0)
+        self.edits.append(kwargs["content"])
+
+
+def rate_limited(retry_after):
+    error = discord.HTTPException(SimpleNamespace(status=429, reason="Too Many Requests"), "slow down")
+    error.retry_after = retry_after
+    return error
+
+
+def run(test):
+    async def go():
+        outbox = EditScheduler(rate=5, per=1.0)
+        try:
+            await test(outbox)
+        finally:
+            await outbox.close()
+    asyncio.run(go())
+
+
+def test_renders_queued_behind_an_edit_in_flight_collapse_to_the_newest():
+    async def test(outbox):
+        message = Message()
+        waiters = [outbox.schedule(1, "channel", message.edit, content="render 0")]
+        await asyncio.sleep(0.001)
+        # The first is in flight; the rest replace each other while it's out
+        waiters += [outbox.schedule(1, "channel", message.edit, content=f"render {n}") for n in range(1, 5)]
+        assert await asyncio.gather(*waiters) == [True] * 5
+        assert message.edits == ["render 0", "render 4"]
+        assert (outbox.sent, outbox.coalesced) == (2, 3)
+    run(test)
+
+
+def test_a_429_blocks_the_route_and_retries_the_edit():
+    async def test(outbox):
+        message = Message(fail=[rate_limited(0.2)])
+        other = Message()
+        blocked = outbox.schedule(1, "channel", message.edit, content="board")
+        await asyncio.sleep(0.05)
+        elsewhere = outbox.schedule(2, "channel", other.edit, content="other board")
+        await asyncio.sleep(0.05)
+        assert not blocked.done() and not elsewhere.done()
+        assert await blocked and await elsewhere
+        assert message.edits == ["board"] and other.edits == ["other board"]
+        assert (outbox.sent, outbox.failed) == (2, 1)
+    run(test)
+
+
+def test_routes_are_paced_independently():
+    async def test(outbox):
+        busy, quiet = Message(), Message()
+        for n in range(8):
+            outbox.schedule(n, "busy", busy.edit, content=f"busy {n}")
+        done = outbox.schedule(99, "quiet", quiet.edit, content="quiet")
+        await asyncio.wait_for(done, 0.1)
+        # 5 edits per second on the busy route; the quiet one didn't wait behind it
+        assert len(busy.edits) <= 5
+    run(test)
+
+
+def test_a_failed_answer_hands_back_the_newest_render():
+    outbox = EditScheduler()
+    first = outbox.answering(1, {"content": "move 1"})
+    second = outbox.answering(1, {"content": "move 2"})
+    assert outbox.answered(1, second, landed=False) == {"content": "move 2"}
+    # The older answer landing can't have covered anything that showed
+    assert outbox.answered(1, first) is None
+    assert outbox.answers == {}
+
+
+def test_an_answer_overtaken_by_a_newer_one_hands_back_the_newest_render():
+    outbox = EditScheduler()
+    first = outbox.answering(1, {"content": "move 1"})
+    second = outbox.answering(1, {"content": "move 2"})
+    assert outbox.answered(1, second) is None
+    assert outbox.answered(1, first) == {"content": "move 2"}
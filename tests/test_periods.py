@@ -0,0 +1,49 @@
+from datetime import date
+
+from periods import KEEP_DAYS, PeriodBoards, roll, totals
+
+# A Wednesday in the middle of a month
+DAY = date(2026, 3, 18).toordinal()
+
+
+def test_roll_adds_to_the_days_bucket_and_drops_old_ones():
+    days = roll([], DAY - KEEP_DAYS, won=True)
+    days = roll(days, DAY - 1, draw=True)
+    days = roll(days, DAY)
+    days = roll(days, DAY, won=True)
+    assert days == [[DAY - 1, 0, 0, 1], [DAY, 1, 1, 0]]
+
+
+def test_roll_returns_a_new_list():
+    days = [[DAY, 1, 0, 0]]
+    rolled = roll(days, DAY, won=True)
+    assert days == [[DAY, 1, 0, 0]] and rolled == [[DAY, 2, 0, 0]]
+
+
+def test_totals_cover_only_the_period():
+    days = [[DAY - 20, 5, 0, 0], [DAY - 3, 1, 1, 0], [DAY - 2, 0, 2, 1], [DAY, 3, 0, 0]]
+    assert totals(days, "day", DAY) == (3, 0, 0)
+    # Monday the 16th onwards, and nothing after the day asked about
+    assert totals(days, "week", DAY) == (3, 2, 1)
+    assert totals(days, "week", DAY - 2) == (0, 2, 1)
+    assert totals(days, "month", DAY) == (4, 3, 1)
+
+
+def test_boards_rank_by_wins_then_fewest_losses():
+    boards = PeriodBoards()
+    boards.update("a", [[DAY, 2, 1, 0]], DAY)
+    boards.update("b", [[DAY, 2, 0, 0]], DAY)
+    boards.update("c", [[DAY, 3, 5, 0]], DAY)
+    assert [player_id for player_id, _ in boards.top("day", 10, day=DAY)] == ["c", "b", "a"]
+    assert boards.rank("week", "a", DAY) == 3
+    assert boards.rank("day", "d", DAY) is None
+
+
+def test_a_new_period_starts_empty():
+    changes = []
+    boards = PeriodBoards()
+    boards.listeners.append(lambda period, old, new: changes.append((period, old, new)))
+    boards.update("a", [[DAY, 1, 0, 0]], DAY)
+    assert boards.count("day", DAY + 1) == 0
+    assert boards.count("week", DAY + 1) == 1
+    assert ("day", None, None) in changes
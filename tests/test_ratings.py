@@ -0,0 +1,30 @@
+from ratings import INITIAL_RATING, RankIndex, expected_score, game_score, rate
+
+
+def test_a_win_moves_both_ratings_by_the_same_amount():
+    winner, loser = rate(INITIAL_RATING, INITIAL_RATING, 1.0)
+    assert winner == 1516 and loser == 1484
+
+
+def test_an_upset_moves_ratings_further():
+    upset, _ = rate(1400, 1600, 1.0)
+    expected, _ = rate(1600, 1400, 1.0)
+    assert upset - 1400 > expected - 1600 > 0
+
+
+def test_draws_between_equals_change_nothing():
+    assert rate(1500, 1500, game_score(1, 2)) == (1500, 1500)
+    assert expected_score(1500, 1500) == 0.5
+
+
+def test_rank_index_orders_by_rating_then_id():
+    ranks = RankIndex([("a", 1500), ("b", 1600), ("c", 1500)])
+    assert ranks.top(3) == [("b", 1600), ("a", 1500), ("c", 1500)]
+    assert ranks.rank("c") == 3 and ranks.rank("z") is None
+
+
+def test_rank_index_reports_moves():
+    ranks = RankIndex([("a", 1500), ("b", 1600), ("c", 1400)])
+    assert ranks.set("c", 1700) == (3, 1)
+    assert ranks.set("d", 1450) == (None, 4)
+    assert ranks.top(2, offset=1) == [("b", 1600), ("a", 1500)]
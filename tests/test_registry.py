@@ -0,0 +1,48 @@
+from registry import GameRegistry
+
+
+def registry(**kwargs):
+    games = GameRegistry(**kwargs)
+    games.add(1, 10, "game 1", [100, 101])
+    games.add(2, 10, "game 2", [102])
+    games.add(3, 20, "game 3", [103, 104])
+    return games
+
+
+def test_idle_games_are_evicted_oldest_first():
+    games = registry(idle_ttl=60)
+    games._last_active.update({1: 0.0, 2: 30.0, 3: 50.0})
+    assert games.evict_idle(now=95.0) == ["game 1", "game 2"]
+    assert list(games.games) == [3]
+
+
+def test_touching_a_game_keeps_it():
+    games = registry(idle_ttl=60)
+    games._last_active.update({1: 0.0, 2: 0.0, 3: 0.0})
+    games.touch(1)
+    assert games.evict_idle(now=games._last_active[1] + 30) == ["game 2", "game 3"]
+    assert len(games) == 1
+
+
+def test_eviction_clears_the_indexes():
+    games = registry(idle_ttl=60)
+    games.evict_idle(now=games._last_active[3] + 60)
+    assert len(games) == 0
+    assert games.by_channel == {} and games.by_player == {}
+    assert not games.is_playing(100)
+    assert games.check_limits(10, [100, 102]) is None
+
+
+def test_limits():
+    games = registry(max_per_channel=2)
+    assert games.check_limits(10, []) is not None
+    assert games.check_limits(20, [103]) == "<@103> is already in a game!"
+    assert games.check_limits(None, [105]) is None
+
+
+def test_packed_games_are_unpacked_once_asked_for():
+    games = GameRegistry(unpack=lambda message_id, packed: ("game", message_id, *packed))
+    games.restore(5, 10, ["x"], [100])
+    assert games.games[5] == ["x"]
+    assert games.get(5) == ("game", 5, "x")
+    assert games.for_player(100) == [("game", 5, "x")]
@@ -0,0 +1,68 @@
+from engine import geometry
+from search import search_move
+
+
+def bits(*cells):
+    mask = 0
+    for cell in cells:
+        mask |= 1 << cell
+    return mask
+
+
+def test_takes_a_win_before_blocking():
+    geo = geometry(4, 4)
+    # Both sides have three of a row; the mover finishes theirs
+    assert search_move(geo, bits(0, 1, 2), bits(4, 5, 6), 1.0) == 3
+
+
+def test_blocks_the_opponents_win():
+    geo = geometry(4, 4)
+    assert search_move(geo, bits(15, 10), bits(0, 1, 2), 1.0) == 3
+
+
+def test_always_returns_an_empty_cell_when_out_of_time():
+    geo = geometry(5, 4)
+    mover, opponent = bits(12), bits(6)
+    move = search_move(geo, mover, opponent, 0.01)
+    assert not (mover | opponent) >> move & 1
+
+
+def test_never_throws_away_a_classic_result():
+    geo = geometry(3, 3)
+    lines = geo.win_masks
+    values = {}
+
+    def won(mask):
+        return any(mask & line == line for line in lines)
+
+    def value(mover, opponent):
+        """1 if the side to move wins with best play, 0 for a draw, -1 if it loses"""
+        key = mover, opponent
+        if key not in values:
+            empty = geo.full & ~(mover | opponent)
+            results = [
+                1 if won(mover | 1 << cell) else 0 if empty == 1 << cell else -value(opponent, mover | 1 << cell)
+                for cell in range(9) if empty >> cell & 1
+            ]
+            values[key] = max(results)
+        return values[key]
+
+    def positions(x, o, x_to_move):
+        """Every position reachable with nobody having won, as (mover, opponent)"""
+        seen = set()
+        stack = [(x, o, x_to_move)]
+        while stack:
+            x, o, x_to_move = stack.pop()
+            if (x, o) in seen or won(x) or won(o) or x | o == geo.full:
+                continue
+            seen.add((x, o))
+            yield (x, o) if x_to_move else (o, x)
+            for cell in range(9):
+                if not (x | o) >> cell & 1:
+                    stack.append((x | 1 << cell, o, False) if x_to_move else (x, o | 1 << cell, True))
+
+    for mover, opponent in positions(0, 0, True):
+        move = search_move(geo, mover, opponent, 1.0)
+        played = mover | 1 << move
+        result = 1 if won(played) else 0 if played | opponent == geo.full else -value(opponent, played)
+        assert result == value(mover, opponent), (mover, opponent, move)
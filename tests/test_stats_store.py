@@ -0,0 +1,113 @@
+import asyncio
+import threading
+
+from stats_store import JsonStatsStore, SqliteStatsStore
+
+GAMES = [(1, 2, 1), (2, 3, None), (1, 3, 3), (1, 2, None), (3, 2, 2)]
+
+
+def json_store(tmp_path):
+    store = JsonStatsStore(str(tmp_path / "stats.json"))
+    store.load()
+    store.record_games(GAMES)
+    asyncio.run(store.flush())
+    return store
+
+
+def sqlite_import(tmp_path, json_path):
+    store = SqliteStatsStore(str(tmp_path / "stats.db"))
+    store.load()
+    store.import_json(json_path)
+    return store
+
+
+def test_importing_twice_matches_the_json_store(tmp_path):
+    source = json_store(tmp_path)
+    asyncio.run(sqlite_import(tmp_path, source.path).close())
+    store = sqlite_import(tmp_path, source.path)
+    try:
+        assert store.all() == source.all()
+        for player_id, opponent_id in [(1, 2), (2, 1), (2, 3), (1, 3), (1, 4)]:
+            assert store.head_to_head(player_id, opponent_id) == source.head_to_head(player_id, opponent_id)
+    finally:
+        asyncio.run(store.close())
+
+
+def test_sqlite_players_are_unsettled_until_the_writer_commits(tmp_path):
+    store = SqliteStatsStore(str(tmp_path / "stats.db"))
+    store.load()
+    gate = threading.Event()
+    store._writes.submit(gate.wait)
+    try:
+        store.record_game(1, 2, 1)
+        assert not store.settled(["1"])
+        assert store.settled(["3"])
+        assert [player_id for player_id, _ in store.top(10)] == ["1", "2"]
+    finally:
+        gate.set()
+        asyncio.run(store.close())
+    assert store.settled(["1", "2"])
+
+
+def summary(store):
+    """Everything but last_played, which is the time of recording"""
+    return {
+        player_id: (s['wins'], s['losses'], s['draws'], s['games_played'], s['rating'], s['days'])
+        for player_id, s in store.all().items()
+    }
+
+
+def test_sqlite_matches_the_json_store_game_by_game_and_batched(tmp_path):
+    source = json_store(tmp_path)
+    for batched in (False, True):
+        path = str(tmp_path / f"batched-{batched}.db")
+        store = SqliteStatsStore(path)
+        store.load()
+        if batched:
+            store.record_games(GAMES)
+        else:
+            for game in GAMES:
+                store.record_game(*game)
+        assert store.top(10) and [player_id for player_id, _ in store.top(10)] == [
+            player_id for player_id, _ in source.top(10)
+        ]
+        assert store.rank(1) == source.rank(1)
+        asyncio.run(store.close())
+
+        # And the same again from disk
+        store = SqliteStatsStore(path)
+        store.load()
+        try:
+            assert summary(store) == summary(source)
+            assert store.head_to_head(2, 1) == source.head_to_head(2, 1) == (0, 1, 1)
+            assert [player_id for player_id, _ in store.top(10)] == [player_id for player_id, _ in source.top(10)]
+        finally:
+            asyncio.run(store.close())
+
+
+def test_json_store_writes_once_enough_results_are_pending(tmp_path):
+    async def go():
+        store = JsonStatsStore(str(tmp_path / "stats.json"), flush_every=3)
+        store.load()
+        store.record_games(GAMES[:2])
+        await asyncio.sleep(0.01)
+        assert not (tmp_path / "stats.json").exists()
+        store.record_game(*GAMES[2])
+        await asyncio.sleep(0.05)
+        assert (tmp_path / "stats.json").exists()
+        await store.close()
+    asyncio.run(go())
+    reopened = JsonStatsStore(str(tmp_path / "stats.json"))
+    reopened.load()
+    assert reopened.get(1)['games_played'] == 2
+    assert reopened.head_to_head(1, 2) == (1, 0, 0)
+
+
+def test_a_corrupt_json_file_is_moved_aside_and_recovered(tmp_path):
+    path = tmp_path / "stats.json"
+    path.write_text('{"1": {"wins"')
+    recovered = {"1": {'wins': 1, 'losses': 0, 'draws': 0, 'games_played': 1, 'last_played': None, 'days': []}}
+    store = JsonStatsStore(str(path), recover=lambda: recovered)
+    assert store.load() == recovered
+    assert store.rank(1) == (1, 1)
+    assert [p.name.startswith("stats.json.corrupt-") for p in tmp_path.iterdir() if p.name != "stats.json"] == [True]
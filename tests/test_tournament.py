@@ -0,0 +1,186 @@
+import pytest
+
+from tournament import ELIMINATION, MAX_REPLAYS, SWISS, Tournament, seed_order
+
+
+def make(format=SWISS, players=8, rounds=None):
+    """Players 0..n-1, where a higher id is a higher rating"""
+    t = Tournament(1, 2, 3, format, rounds)
+    for player_id in range(players):
+        t.join(player_id, 1500 + player_id * 10)
+    return t
+
+
+def play_round(t, matches, winner=max):
+    """Settle every match, the higher id winning by default; returns the next round's matches"""
+    following = []
+    for match in matches:
+        following = t.report(match, winner(match.player1, match.player2))
+    return following
+
+
+def test_seed_order_keeps_top_seeds_apart():
+    assert seed_order(8) == [1, 8, 4, 5, 2, 7, 3, 6]
+    order = seed_order(16)
+    assert order.index(1) < 8 <= order.index(2)
+
+
+def test_start_needs_two_players():
+    with pytest.raises(ValueError):
+        make(players=1).start()
+
+
+def test_join_after_start_is_refused():
+    t = make()
+    t.start()
+    with pytest.raises(ValueError):
+        t.join(99, 1500)
+
+
+def test_swiss_rounds_default_to_log2_of_the_field():
+    t = make(players=20)
+    t.start()
+    assert t.rounds == 5
+
+
+def test_swiss_first_round_pairs_everyone_once():
+    t = make(players=8)
+    matches = t.start()
+    paired = [player_id for match in matches for player_id in (match.player1, match.player2)]
+    assert sorted(paired) == list(range(8))
+
+
+def test_swiss_pairs_players_on_the_same_score():
+    t = make(players=8)
+    matches = play_round(t, t.start())
+    for match in matches:
+        assert t.points[match.player1] == t.points[match.player2]
+
+
+def test_swiss_avoids_rematches():
+    t = make(players=8, rounds=3)
+    matches = t.start()
+    seen = set()
+    while matches:
+        for match in matches:
+            pair = frozenset((match.player1, match.player2))
+            assert pair not in seen
+            seen.add(pair)
+        matches = play_round(t, matches)
+    assert t.finished
+
+
+def test_swiss_bye_goes_to_the_lowest_ranked_and_only_once():
+    t = make(players=5, rounds=3)
+    matches = t.start()
+    assert t.byes == {0}
+    assert t.points[0] == 1
+    while matches:
+        matches = play_round(t, matches)
+    # Three rounds, three different players sat out
+    assert len(t.byes) == 3
+
+
+def test_swiss_draw_is_half_a_point_each():
+    t = make(players=2, rounds=1)
+    match, = t.start()
+    assert t.report(match, None) == []
+    assert t.points == {0: 0.5, 1: 0.5}
+    assert t.finished
+
+
+def test_swiss_standings_break_ties_on_buchholz():
+    t = make(players=4, rounds=2)
+    results = {frozenset((3, 2)): 3, frozenset((1, 0)): 0, frozenset((3, 0)): 3, frozenset((2, 1)): 1}
+    matches = t.start()
+    while matches:
+        matches = play_round(t, matches, winner=lambda first, second: results[frozenset((first, second))])
+    # 0 and 1 both have a point, but 0's opponents scored 3 to 1's 1
+    assert t.standings() == [(3, 2), (0, 1), (1, 1), (2, 0)]
+
+
+def test_report_twice_is_ignored():
+    t = make(players=4, rounds=2)
+    match = t.start()[0]
+    t.report(match, match.player1)
+    assert t.report(match, match.player2) == []
+    assert match.winner == match.player1
+
+
+def test_swiss_void_scores_nothing_and_allows_a_later_meeting():
+    t = make(players=4, rounds=1)
+    first, second = t.start()
+    t.void(first)
+    assert t.points[first.player1] == t.points[first.player2] == 0
+    assert first.player2 not in t.opponents[first.player1]
+
+
+def test_swiss_withdrawn_players_are_not_paired():
+    t = make(players=4, rounds=2)
+    matches = t.start()
+    t.leave(0)
+    matches = play_round(t, matches)
+    assert all(0 not in (match.player1, match.player2) for match in matches)
+    assert len(matches) == 1  # three left: one match and a bye
+
+
+def test_elimination_gives_byes_to_the_top_seeds():
+    t = make(ELIMINATION, players=6)
+    matches = t.start()
+    assert len(matches) == 2
+    playing = {player_id for match in matches for player_id in (match.player1, match.player2)}
+    assert playing.isdisjoint({5, 4})  # seeds 1 and 2
+
+
+def test_elimination_advances_winners_to_a_champion():
+    t = make(ELIMINATION, players=8)
+    matches = t.start()
+    rounds = 0
+    while matches:
+        rounds += 1
+        matches = play_round(t, matches)
+    assert rounds == 3
+    assert t.finished
+    assert t.champion() == 7
+    assert t.standings()[0] == (7, t.round + 1)
+    assert t.eliminated[0] == 1
+
+
+def test_elimination_replays_draws_then_the_higher_seed_goes_through():
+    t = make(ELIMINATION, players=2)
+    match, = t.start()
+    for replay in range(1, MAX_REPLAYS + 1):
+        assert t.report(match, None) == [match]
+        assert match.replays == replay
+    assert t.report(match, None) == []
+    assert match.winner == 1
+    assert t.champion() == 1
+
+
+def test_elimination_walkover_for_a_withdrawn_player():
+    t = make(ELIMINATION, players=4)
+    first, second = t.start()
+    t.report(first, first.player1)
+    t.leave(second.player1)
+    t.report(second, second.player1)  # they won, then withdrew before the final
+    final = t.matches[0]
+    assert final.done and final.winner == first.player1
+    assert t.finished and t.champion() == first.player1
+
+
+def test_elimination_void_sends_the_higher_seed_through_without_a_replay():
+    t = make(ELIMINATION, players=2)
+    match, = t.start()
+    assert t.void(match) == []
+    assert match.winner == 1 and match.replays == 0 and match.void
+
+
+def test_hundreds_of_entrants():
+    t = make(players=300)
+    matches = t.start()
+    games = 0
+    while matches:
+        games += len(matches)
+        matches = play_round(t, matches)
+    assert t.finished
+    assert games == 150 * t.rounds
@@ -0,0 +1,56 @@
+import ultimate
+from ultimate import FREE, UltimateState, mcts_move, replay
+
+
+def test_the_cell_played_picks_the_next_board():
+    state = play([4 * 9 + 2])
+    assert state.forced == 2
+    assert state.open_boards() == [2]
+    assert all(move // 9 == 2 for move in state.legal_moves())
+    assert not state.is_legal(4 * 9 + 3)
+
+
+def play(moves):
+    state = UltimateState()
+    for move in moves:
+        assert state.is_legal(move)
+        state.play(move)
+    return state
+
+
+def test_a_closed_board_frees_the_next_move():
+    # ❌ takes board 0 down its middle column; ⭕ answers with cell 0 each time, sending ❌ back
+    state = play([1, 9, 4, 4 * 9, 7])
+    assert state.board_winner(0) == 0
+    assert state.forced == 7
+    state.play(7 * 9)
+    # Sent to board 0, which is closed: any open board will do
+    assert state.forced == FREE
+    assert 0 not in state.open_boards() and len(state.open_boards()) == 8
+
+
+def test_three_boards_in_a_row_win_the_game():
+    state = UltimateState()
+    for board in (0, 1):
+        state.won[0] |= 1 << board
+        state.closed |= 1 << board
+    state.forced = 2
+    # Board 2 needs one more ❌ on cells 0 and 1
+    state.boards[2 * 2] = 0b011
+    state.play(2 * 9 + 2)
+    assert state.over and state.winner == 0
+    assert state.legal_moves() == []
+
+
+def test_the_bot_plays_legal_moves_and_reuses_its_tree():
+    moves = [40]
+    move, playouts = mcts_move("game", moves, 0.05)
+    assert playouts > 0
+    assert replay(moves).is_legal(move)
+    moves.append(move)
+    reply = next(iter(replay(moves).legal_moves()))
+    moves.append(reply)
+    move, _ = mcts_move("game", moves, 0.05)
+    assert replay(moves).is_legal(move)
+    ultimate.forget("game")
+    assert "game" not in ultimate._trees
@@ -0,0 +1,260 @@
+"""Swiss and single-elimination tournaments
+
+Only the bookkeeping lives here: who plays whom each round, results and
+standings. The bot starts the games and reports how each one ended;
+nothing here awaits or touches Discord. Pairing a round is a sort plus
+one pass over the players, so even a few hundred entrants pair in well
+under a millisecond, whatever is going on around it.
+
+Swiss: everyone plays every round against someone on the same score
+they haven't met yet. A win is worth 1 point and a draw ½. With an odd
+number of players, the lowest-ranked player who hasn't had a bye sits
+out for a point. Ties in the standings go to Buchholz (the sum of
+opponents' points), then rating.
+
+Single elimination: seeded by rating, with byes for the top seeds when
+the field isn't a power of two. A drawn match is replayed up to
+MAX_REPLAYS times; after that the higher seed goes through.
+
+A match whose game could never be set up is void: in Swiss nobody
+scores and the pair may still meet later; in elimination the higher
+seed goes through without it counting as a replay.
+"""
+import math
+
+SWISS = "swiss"
+ELIMINATION = "elimination"
+FORMATS = (SWISS, ELIMINATION)
+MAX_REPLAYS = 2
+
+
+def seed_order(size):
+    """Seeds in bracket order for a power-of-two bracket, so 1 and 2 can only meet in the final"""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for top in order for seed in (top, total - top)]
+    return order
+
+
+class Match:
+    """One pairing; `game_id` is the message its current game is played in"""
+
+    __slots__ = ("round", "player1", "player2", "winner", "done", "void", "replays", "game_id")
+
+    def __init__(self, round, player1, player2):
+        self.round = round
+        self.player1 = player1
+        self.player2 = player2
+        self.winner = None  # None with done set is a draw
+        self.done = False
+        self.void = False  # settled without being played
+        self.replays = 0
+        self.game_id = None
+
+    def opponent(self, player_id):
+        return self.player2 if player_id == self.player1 else self.player1
+
+
+class Tournament:
+    def __init__(self, tournament_id, channel_id, host_id, format=SWISS, rounds=None):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown tournament format {format!r}; use one of {', '.join(FORMATS)}")
+        self.tournament_id = tournament_id
+        self.channel_id = channel_id
+        self.host_id = host_id
+        self.format = format
+        self.rounds = rounds  # Swiss only; decided at start if not given
+        self.ratings = {}  # {player_id: rating when they joined}; also the seeding
+        self.points = {}
+        self.opponents = {}  # {player_id: set of player ids they've been paired with}
+        self.byes = set()
+        self.withdrawn = set()
+        self.eliminated = {}  # {player_id: round they went out in}
+        self.bracket = []  # elimination: who is still in, in bracket order; None is an empty slot
+        self.round = 0
+        self.matches = []  # this round's matches
+        self.results = []  # (player1, player2, winner_id) of counted games not yet written to the stats store
+        self.finished = False
+
+    def __len__(self):
+        return len(self.ratings)
+
+    @property
+    def started(self):
+        return self.round > 0
+
+    def join(self, player_id, rating):
+        if self.started:
+            raise ValueError("The tournament has already started!")
+        self.ratings[player_id] = rating
+        self.points[player_id] = 0.0
+        self.opponents[player_id] = set()
+
+    def leave(self, player_id):
+        """Drop out: before the start, leave the field; after it, forfeit the rest"""
+        if not self.started:
+            for table in (self.ratings, self.points, self.opponents):
+                table.pop(player_id, None)
+            return
+        self.withdrawn.add(player_id)
+
+    def _seeded(self, players):
+        return sorted(players, key=lambda player_id: (-self.ratings[player_id], player_id))
+
+    def start(self):
+        """Pair the first round; returns its matches"""
+        if self.started:
+            raise ValueError("The tournament has already started!")
+        if len(self.ratings) < 2:
+            raise ValueError("A tournament needs at least 2 players!")
+        if self.format == SWISS:
+            if self.rounds is None:
+                self.rounds = max(1, math.ceil(math.log2(len(self.ratings))))
+        else:
+            seeds = self._seeded(self.ratings)
+            size = 1 << (len(seeds) - 1).bit_length()
+            self.bracket = [seeds[seed - 1] if seed <= len(seeds) else None for seed in seed_order(size)]
+        return self._next_round()
+
+    def current(self, player_id):
+        """The unfinished match a player is in this round, if any"""
+        return next((match for match in self.matches if not match.done and player_id in (match.player1, match.player2)), None)
+
+    def report(self, match, winner_id):
+        """Settle a match (winner None for a draw); returns the matches to start now
+
+        That's a replay of a drawn elimination match, the next round once
+        this one is complete, or nothing.
+        """
+        if match.done:
+            return []
+        if winner_id is None and self.format == ELIMINATION:
+            if match.replays < MAX_REPLAYS:
+                match.replays += 1
+                match.game_id = None
+                return [match]
+            winner_id = self._seeded((match.player1, match.player2))[0]
+        match.winner = winner_id
+        match.done = True
+        if winner_id is None:
+            self.points[match.player1] += 0.5
+            self.points[match.player2] += 0.5
+        else:
+            self.points[winner_id] += 1
+            if self.format == ELIMINATION:
+                self.eliminated[match.opponent(winner_id)] = self.round
+        return self._settled()
+
+    def void(self, match):
+        """Settle a match that was never played; returns the matches to start now, like report()"""
+        if match.done:
+            return []
+        match.void = True
+        match.done = True
+        if self.format == ELIMINATION:
+            match.winner = self._seeded((match.player1, match.player2))[0]
+            self.eliminated[match.opponent(match.winner)] = self.round
+        else:
+            self.opponents[match.player1].discard(match.player2)
+            self.opponents[match.player2].discard(match.player1)
+        return self._settled()
+
+    def _settled(self):
+        if all(other.done for other in self.matches):
+            return self._next_round()
+        return []
+
+    def _next_round(self):
+        """Pair the next round, settling walkovers right away; returns the matches to play"""
+        while True:
+            if self.format == SWISS:
+                if self.round and (self.round >= self.rounds or self._active() < 2):
+                    self.finished = True
+                    return []
+                self.round += 1
+                self.matches = self._pair_swiss()
+            else:
+                if self.round:
+                    winners = {}
+                    for match in self.matches:
+                        winners[match.player1] = winners[match.player2] = match.winner
+                    self.bracket = [
+                        winners[first] if first is not None and second is not None else (first if second is None else second)
+                        for first, second in self._slots()
+                    ]
+                if sum(player_id is not None for player_id in self.bracket) <= 1:
+                    self.finished = True
+                    return []
+                self.round += 1
+                self.matches = self._pair_elimination()
+            pending = [match for match in self.matches if not match.done]
+            if pending:
+                return pending
+
+    def _active(self):
+        return len(self.ratings) - len(self.withdrawn)
+
+    def _pair_swiss(self):
+        order = sorted(
+            (player_id for player_id in self.ratings if player_id not in self.withdrawn),
+            key=lambda player_id: (-self.points[player_id], -self.ratings[player_id], player_id)
+        )
+        if len(order) % 2:
+            bye = next((player_id for player_id in reversed(order) if player_id not in self.byes), order[-1])
+            order.remove(bye)
+            self.byes.add(bye)
+            self.points[bye] += 1
+        matches = []
+        while order:
+            first = order.pop(0)
+            # The closest-ranked player they haven't met, or a rematch if everyone left is a rematch
+            partner = next((i for i, player_id in enumerate(order) if player_id not in self.opponents[first]), 0)
+            second = order.pop(partner)
+            self.opponents[first].add(second)
+            self.opponents[second].add(first)
+            matches.append(Match(self.round, first, second))
+        return matches
+
+    def _slots(self):
+        """(first, second) for each pairing of the bracket; None is an empty slot"""
+        return zip(self.bracket[::2], self.bracket[1::2])
+
+    def _pair_elimination(self):
+        matches = []
+        for first, second in self._slots():
+            if first is None or second is None:
+                continue  # a bye; they move on when the round is over
+            match = Match(self.round, first, second)
+            for player_id in (first, second):
+                self.opponents[player_id].add(match.opponent(player_id))
+            if first in self.withdrawn or second in self.withdrawn:
+                # Walkover; if both withdrew, the higher seed's slot goes on empty-handed
+                present = [player_id for player_id in (first, second) if player_id not in self.withdrawn]
+                match.winner = present[0] if present else None
+                match.done = True
+                if present:
+                    self.eliminated[match.opponent(present[0])] = self.round
+                else:
+                    self.eliminated[first] = self.eliminated[second] = self.round
+            matches.append(match)
+        return matches
+
+    def standings(self):
+        """[(player_id, score)] best first; score is points for Swiss, the round reached for elimination"""
+        if self.format == SWISS:
+            buchholz = {
+                player_id: sum(self.points[opponent] for opponent in self.opponents[player_id])
+                for player_id in self.ratings
+            }
+            order = sorted(
+                self.ratings,
+                key=lambda player_id: (-self.points[player_id], -buchholz[player_id], -self.ratings[player_id], player_id)
+            )
+            return [(player_id, self.points[player_id]) for player_id in order]
+        reached = {player_id: self.eliminated.get(player_id, self.round + 1) for player_id in self.ratings}
+        order = sorted(self.ratings, key=lambda player_id: (-reached[player_id], -self.ratings[player_id], player_id))
+        return [(player_id, reached[player_id]) for player_id in order]
+
+    def champion(self):
+        return self.standings()[0][0] if self.finished and self.ratings else None
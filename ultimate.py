@@ -0,0 +1,232 @@
+"""Ultimate Tic Tac Toe state and Monte Carlo tree search bot
+
+The 9×9 board is nine classic boards. A move is `board * 9 + cell`; the
+cell you play decides which board your opponent must play in next, unless
+that board is already closed, in which case they may play anywhere.
+
+State is array-backed: one 9-bit bitboard per (board, side) in an
+array('H'), plus 9-bit masks of boards won by each side and boards that
+are closed. Copying a state for a playout is a couple of small memcpys.
+"""
+import math
+import random
+import time
+from array import array
+from collections import OrderedDict
+
+from engine import FULL, wins_through
+
+BOARDS = 9
+MOVES = BOARDS * 9
+FREE = -1  # `forced` value when the player may pick any open board
+
+
+class UltimateState:
+    __slots__ = ("boards", "won", "closed", "forced", "side", "winner", "over")
+
+    def __init__(self):
+        self.boards = array('H', [0]) * (BOARDS * 2)  # boards[board * 2 + side]
+        self.won = [0, 0]  # meta-board bitboards per side
+        self.closed = 0  # boards that are won or full
+        self.forced = FREE
+        self.side = 0  # side to move; 0 plays ❌
+        self.winner = None
+        self.over = False
+
+    def copy(self):
+        state = UltimateState.__new__(UltimateState)
+        state.boards = array('H', self.boards)
+        state.won = self.won[:]
+        state.closed = self.closed
+        state.forced = self.forced
+        state.side = self.side
+        state.winner = self.winner
+        state.over = self.over
+        return state
+
+    def board_empty(self, board):
+        return FULL & ~(self.boards[board * 2] | self.boards[board * 2 + 1])
+
+    def open_boards(self):
+        """Boards the side to move may play in"""
+        if self.over:
+            return []
+        if self.forced != FREE:
+            return [self.forced]
+        return [board for board in range(BOARDS) if not self.closed >> board & 1]
+
+    def legal_moves(self):
+        moves = []
+        for board in self.open_boards():
+            empty = self.board_empty(board)
+            while empty:
+                low = empty & -empty
+                moves.append(board * 9 + low.bit_length() - 1)
+                empty ^= low
+        return moves
+
+    def is_legal(self, move):
+        board, cell = divmod(move, 9)
+        return board in self.open_boards() and self.board_empty(board) >> cell & 1
+
+    def side_at(self, move):
+        board, cell = divmod(move, 9)
+        if self.boards[board * 2] >> cell & 1:
+            return 0
+        if self.boards[board * 2 + 1] >> cell & 1:
+            return 1
+        return None
+
+    def board_winner(self, board):
+        if self.won[0] >> board & 1:
+            return 0
+        if self.won[1] >> board & 1:
+            return 1
+        return None
+
+    def play(self, move):
+        """Play a legal move for the side to move"""
+        board, cell = divmod(move, 9)
+        side = self.side
+        index = board * 2 + side
+        bits = self.boards[index] | 1 << cell
+        self.boards[index] = bits
+
+        if wins_through(bits, cell):
+            self.won[side] |= 1 << board
+            self.closed |= 1 << board
+            if wins_through(self.won[side], board):
+                self.winner = side
+                self.over = True
+        elif not self.board_empty(board):
+            self.closed |= 1 << board
+
+        if not self.over and self.closed == FULL:
+            self.over = True  # every board closed without a meta line
+
+        self.forced = FREE if self.closed >> cell & 1 else cell
+        self.side = 1 - side
+
+
+def replay(moves):
+    """Build the state reached by playing `moves` from the start"""
+    state = UltimateState()
+    for move in moves:
+        state.play(move)
+    return state
+
+
+class Node:
+    __slots__ = ("move", "mover", "parent", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, parent, state):
+        self.move = move
+        self.mover = 1 - state.side  # the side that played `move`
+        self.parent = parent
+        self.children = {}
+        self.untried = state.legal_moves()
+        self.visits = 0
+        self.wins = 0.0  # from the mover's point of view
+
+
+def _playout(state, rng):
+    """Random game to the end; returns the winning side or None"""
+    while not state.over:
+        state.play(rng.choice(state.legal_moves()))
+    return state.winner
+
+
+def mcts(root, state, budget, rng=random, exploration=1.4):
+    """Grow the tree under `root` for `budget` seconds; returns playouts run"""
+    deadline = time.monotonic() + budget
+    playouts = 0
+    while True:
+        node = root
+        sim = state.copy()
+
+        # Selection
+        while not node.untried and node.children:
+            log_visits = math.log(node.visits)
+            node = max(
+                node.children.values(),
+                key=lambda child: child.wins / child.visits
+                + exploration * math.sqrt(log_visits / child.visits)
+            )
+            sim.play(node.move)
+
+        # Expansion
+        if node.untried:
+            move = node.untried.pop(rng.randrange(len(node.untried)))
+            sim.play(move)
+            child = Node(move, node, sim)
+            node.children[move] = child
+            node = child
+
+        winner = _playout(sim, rng)
+        playouts += 1
+        # Reading the clock costs about as much as a few tree steps
+        done = playouts % 16 == 0 and time.monotonic() > deadline
+
+        # Backpropagation
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner == node.mover:
+                node.wins += 1.0
+            node = node.parent
+
+        if done:
+            return playouts
+
+
+# Trees kept between turns inside a worker process, least recently used last
+_trees = OrderedDict()  # {game_id: (moves played, root, state)}
+MAX_TREES = 64
+
+
+def _reroot(root, state, moves):
+    """Walk the tree down by the given moves, keeping the matching subtree"""
+    for move in moves:
+        state.play(move)
+        root = root.children.get(move) if root is not None else None
+        if root is not None:
+            # Detach so the rest of the old tree can be freed
+            root.parent = None
+    return root
+
+
+def mcts_move(game_id, moves, budget):
+    """Pick the bot's move in game `game_id` after `moves`
+
+    Meant to run in a worker process: the search tree is kept in the
+    worker between calls, so the part of it under the moves played since
+    last time is reused instead of searched again. Returns
+    (move, playouts).
+    """
+    moves = list(moves)
+    entry = _trees.pop(game_id, None)
+    root = state = None
+    if entry is not None:
+        played, old_root, old_state = entry
+        if moves[:len(played)] == played:
+            state = old_state
+            root = _reroot(old_root, state, moves[len(played):])
+    if state is None:
+        state = replay(moves)
+    if root is None:
+        root = Node(None, None, state)
+
+    playouts = mcts(root, state, budget)
+    best = max(root.children.values(), key=lambda child: child.visits)
+
+    root = _reroot(root, state, [best.move])
+    _trees[game_id] = (moves + [best.move], root, state)
+    while len(_trees) > MAX_TREES:
+        _trees.popitem(last=False)
+    return best.move, playouts
+
+
+def forget(game_id):
+    """Drop a finished game's search tree"""
+    _trees.pop(game_id, None)